@@ -1,100 +1,257 @@
-def validate_age(age, messages):
-    age = int(age)
-    if age <= 0:
-        messages.append(("danger", "Age must be positive."))
-    elif age < 1 or age > 120:
-        messages.append(("danger", "Age must be between 1 and 120."))
-
-    return age, messages
-
-def validate_gender(gender, messages):
-    genders = ['male', 'female', 'other']
-
-    if not gender:
-        messages.append(("danger", "Gender is required."))
-    else:
-        if gender.lower() not in genders:
-            messages.append(("danger", "Invalid gender. Choose 'Male', 'Female', or 'Other'."))
-    
-    return messages
-
-def validate_weight(weight, messages):
-    weight = float(weight)
-    if weight <= 0:
-        messages.append(("danger", "Weight must be positive."))
-    
-    return weight, messages
-
-def validate_height(height, messages):
-    height = float(height)
-    if height <= 0:
-        messages.append(("danger", "Height must be positive."))
-    
-    return height, messages
-
-def validate_activity_type(activity_type, messages):
-    activities_type = ['running', 'cycling', 'swimming', 'yoga', 'step', 'combat', 'bodybuilding']
-    
-    if not activity_type:
-        messages.append(("danger", "Activity Type is required."))
-    else:
-        if activity_type.lower() not in activities_type:
-            messages.append(("danger", "Invalid activity type. Choose one of the options provided."))
-
-    return messages
-
-def validate_duration(duration, messages):
-    duration = int(duration)
-    if duration <= 0:
-        messages.append(("danger", "Duration must be positive."))
-    
-    return duration, messages
-
-def validate_intensity(intensity, messages):
-    intensities = ['low', 'moderate', 'high']
-
-    if not intensity:
-        messages.append(("danger", "Intensity is required."))
-    else:
-        if intensity.lower() not in intensities:
-            messages.append(("danger", "Invalid intensity. Choose one of the options provided."))
-    
-    return messages
-
-def validate_resting_heart_rate(resting_heart_rate, messages):
-    resting_heart_rate = int(resting_heart_rate)
-    if resting_heart_rate <= 0:
-        messages.append(("danger", "Resting Heart Rate must be positive."))
-    elif resting_heart_rate < 30 or resting_heart_rate > 120:
-        messages.append(("danger", "Age must be between 30 and 120."))
-    
-    return resting_heart_rate, messages
-
-def validate_exercise_heart_rate(exercise_heart_rate, messages):
-    exercise_heart_rate = int(exercise_heart_rate)
-    if exercise_heart_rate <= 0:
-        messages.append(("danger", "Exercise Heart Rate must be positive."))
-    elif exercise_heart_rate < 50 or exercise_heart_rate > 220:
-        messages.append(("danger", "Age must be between 50 and 220."))
-    
-    return exercise_heart_rate, messages
-
-def validate_body_fat_percentage(body_fat_percentage, messages):
-    body_fat_percentage = float(body_fat_percentage)
-    if body_fat_percentage <= 0:
-        messages.append(("danger", "Body Fat Percentage must be positive."))
-    return body_fat_percentage, messages
-
-def validate_muscle_mass(muscle_mass, messages):
-    muscle_mass = float(muscle_mass)
-    if muscle_mass <= 0:
-            messages.append(("danger", "Muscle Mass must be positive."))
-    
-    return muscle_mass, messages
-
-def validate_water_intake(water_intake, messages):
-    water_intake = float(water_intake)
-    if water_intake <= 0:
-        messages.append(("danger", "Water Intake must be positive."))
-    
-    return water_intake, messages
\ No newline at end of file
+import math
+
+import numpy as np
+
+from enums import ActivityType, Gender, Intensity
+
+
+class Field:
+    """Validation rules for one activity form field."""
+
+    __slots__ = (
+        "name", "form_key", "label", "kind", "positive", "minimum", "maximum", "choices",
+        "required_message", "type_message", "positive_message", "range_message", "choice_message"
+    )
+
+    def __init__(
+        self, name, form_key, label, kind, positive=False,
+        minimum=None, maximum=None, choices=None, choice_message=None
+    ):
+        self.name = name
+        self.form_key = form_key
+        self.label = label
+        self.kind = kind
+        self.positive = positive
+        self.minimum = minimum
+        self.maximum = maximum
+        # Lowercase value -> enum member, for fields restricted to one of the enums in enums.py
+        self.choices = {member.value: member for member in choices} if choices else None
+
+        # Messages are built once here rather than on every request
+        self.required_message = f"{label} is required."
+        self.type_message = f"{label} must be {'a whole number' if kind is int else 'a number'}."
+        self.positive_message = f"{label} must be positive."
+        self.range_message = f"{label} must be between {minimum} and {maximum}."
+        self.choice_message = choice_message
+
+
+# Integers are checked as floats in batches; anything larger is out of every range anyway
+INT_CLAMP = 10 ** 300
+
+GENDERS = Gender.values()
+ACTIVITY_TYPES = ActivityType.values()
+INTENSITIES = Intensity.values()
+
+ACTIVITY_FIELDS = (
+    Field("age", "age", "Age", int, positive=True, minimum=1, maximum=120),
+    Field(
+        "gender", "gender", "Gender", str, choices=Gender,
+        choice_message="Invalid gender. Choose 'Male', 'Female', or 'Other'."
+    ),
+    # Weight and muscle mass in kg, height in cm, duration in minutes, water intake in litres a day
+    Field("weight", "weight", "Weight", float, positive=True, minimum=20, maximum=400),
+    Field("height", "height", "Height", float, positive=True, minimum=50, maximum=250),
+    Field(
+        "activity_type", "activityType", "Activity Type", str, choices=ActivityType,
+        choice_message="Invalid activity type. Choose one of the options provided."
+    ),
+    Field("duration", "duration", "Duration", int, positive=True, minimum=1, maximum=1440),
+    Field(
+        "intensity", "intensity", "Intensity", str, choices=Intensity,
+        choice_message="Invalid intensity. Choose one of the options provided."
+    ),
+    Field("resting_heart_rate", "restingHeartRate", "Resting Heart Rate", int, positive=True, minimum=30, maximum=120),
+    Field("exercise_heart_rate", "exerciseHeartRate", "Exercise Heart Rate", int, positive=True, minimum=50, maximum=220),
+    Field(
+        "body_fat_percentage", "bodyFatPercentage", "Body Fat Percentage", float, positive=True, minimum=2, maximum=70
+    ),
+    Field("muscle_mass", "muscleMass", "Muscle Mass", float, positive=True, minimum=5, maximum=150),
+    Field("water_intake", "waterIntake", "Water Intake", float, positive=True, minimum=0.1, maximum=20),
+)
+
+
+def compile_field(field):
+    """Build a checker for one field containing only the branches its rules need."""
+    required_message = field.required_message
+    type_message = field.type_message
+    positive_message = field.positive_message
+    range_message = field.range_message
+    minimum = field.minimum
+    maximum = field.maximum
+
+    if field.kind is str:
+        choices = field.choices
+        choice_message = field.choice_message
+
+        def check_choice(raw):
+            if not raw:
+                return raw, required_message
+            # Any casing is accepted, but the lowercase enum member is what gets stored
+            member = choices.get(raw)
+            if member is None:
+                member = choices.get(raw.lower())
+                if member is None:
+                    return raw, choice_message
+            return member, None
+        return check_choice
+
+    if field.kind is float:
+        isfinite = math.isfinite
+
+        def check_float(raw):
+            if not raw:
+                return raw, required_message
+            try:
+                value = float(raw)
+            except (TypeError, ValueError):
+                return raw, type_message
+            # Reject NaN and infinity, which float() accepts
+            if not isfinite(value):
+                return raw, type_message
+            if value <= 0:
+                return value, positive_message
+            if not minimum <= value <= maximum:
+                return value, range_message
+            return value, None
+        return check_float
+
+    def check_int(raw):
+        if not raw:
+            return raw, required_message
+        try:
+            value = int(raw)
+        except (TypeError, ValueError):
+            return raw, type_message
+        if value <= 0:
+            return value, positive_message
+        if not minimum <= value <= maximum:
+            return value, range_message
+        return value, None
+    return check_int
+
+
+# (field name, form key, checker) compiled once at import
+COMPILED_FIELDS = tuple((field.name, field.form_key, compile_field(field)) for field in ACTIVITY_FIELDS)
+
+
+def validate_activity(form):
+    """
+    Validate one activity submission.
+
+    `form` maps form keys (e.g. "restingHeartRate") to raw strings, such as request.form.
+    Returns (values, errors): values by field name, converted where valid, and
+    an error message per invalid field name, in form order.
+    """
+    # MultiDict.get is slow; flattening request.form once is cheaper than twelve lookups
+    if hasattr(form, "to_dict"):
+        form = form.to_dict()
+
+    get = form.get
+    values = {}
+    errors = {}
+    for name, form_key, check in COMPILED_FIELDS:
+        value, error = check(get(form_key))
+        values[name] = value
+        if error is not None:
+            errors[name] = error
+    return values, errors
+
+
+def error_messages(errors):
+    """Convert validation errors to the ("danger", message) tuples flashed by the views."""
+    return [("danger", message) for message in errors.values()]
+
+
+def parse_numbers(raw):
+    """Convert a column to floats, with NaN wherever a value cannot be parsed."""
+    try:
+        # numpy parses a whole column of numeric strings in one call
+        return np.array(raw, dtype=float)
+    except (TypeError, ValueError):
+        pass
+
+    numbers = np.empty(len(raw))
+    for row, item in enumerate(raw):
+        try:
+            numbers[row] = float(item)
+        except (TypeError, ValueError):
+            numbers[row] = np.nan
+    return numbers
+
+
+def parse_integers(raw):
+    """Convert a column of whole numbers to floats with int()'s rules, so "5.0" and "1e2" are NaN."""
+    try:
+        # numpy parses integer strings with int() itself, for the whole column in one call
+        return np.array(raw, dtype=np.int64).astype(float)
+    except (TypeError, ValueError, OverflowError):
+        pass
+
+    numbers = np.empty(len(raw))
+    for row, item in enumerate(raw):
+        try:
+            # Beyond float range is out of range, not unparseable; clamp so the range check reports it
+            numbers[row] = max(min(int(item), INT_CLAMP), -INT_CLAMP)
+        except (TypeError, ValueError):
+            numbers[row] = np.nan
+    return numbers
+
+
+def validate_activity_batch(columns):
+    """
+    Validate many activity records at once.
+
+    `columns` maps field names to equal-length sequences of raw values.
+    Returns (values, errors, valid): values maps field names to numpy arrays (NaN where a
+    numeric value is missing or invalid), errors maps field names to {row index: message},
+    and valid is a boolean array marking rows with no errors. Values and messages match validate_activity.
+    """
+    size = len(next(iter(columns.values()))) if columns else 0
+    values = {}
+    errors = {}
+    valid = np.ones(size, dtype=bool)
+
+    for field in ACTIVITY_FIELDS:
+        raw = columns.get(field.name)
+        if raw is None:
+            raw = [None] * size
+        field_errors = {}
+
+        if field.kind is str:
+            choices = field.choices
+            get = choices.get
+            members = [get(item) for item in raw]
+            # Exact matches are the common case; only the rest need lowering and messages
+            for row in [row for row, member in enumerate(members) if member is None]:
+                item = raw[row]
+                members[row] = item
+                if not item:
+                    field_errors[row] = field.required_message
+                elif item.lower() not in choices:
+                    field_errors[row] = field.choice_message
+                else:
+                    members[row] = choices[item.lower()]
+            values[field.name] = np.array(members, dtype=object)
+        else:
+            numbers = parse_integers(raw) if field.kind is int else parse_numbers(raw)
+            unparsed = ~np.isfinite(numbers)
+            numbers[unparsed] = np.nan
+
+            for row in np.flatnonzero(unparsed):
+                field_errors[int(row)] = field.type_message if raw[row] else field.required_message
+
+            # Vectorized range checks; NaN compares false, so unparsed rows never match
+            with np.errstate(invalid="ignore"):
+                not_positive = numbers <= 0
+                for row in np.flatnonzero(not_positive):
+                    field_errors[int(row)] = field.positive_message
+                out_of_range = ~not_positive & ((numbers < field.minimum) | (numbers > field.maximum))
+                for row in np.flatnonzero(out_of_range):
+                    field_errors[int(row)] = field.range_message
+            values[field.name] = numbers
+
+        if field_errors:
+            errors[field.name] = field_errors
+            valid[list(field_errors)] = False
+
+    return values, errors, valid
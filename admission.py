@@ -0,0 +1,258 @@
+"""
+Admission control, load shedding and per-user rate limits.
+
+Endpoints are assigned cost classes (ADMISSION_ENDPOINTS). Each class admits at most `limit`
+concurrent requests per worker process; up to `queue` more wait for `timeout` seconds, and the
+rest are shed at once instead of tying up worker threads that cheap pages need. A shed request
+gets the endpoint's fallback when it has one (e.g. the user's last stats page, marked as stale)
+and otherwise `503 Service Unavailable` with `Retry-After`.
+
+RATE_LIMITS caps POSTs with token buckets, answering `429 Too Many Requests`: /activity per user,
+and /login both per account and address (so nobody can lock an account out from elsewhere) and
+per address (so one client cannot spray many usernames). Limits and buckets are per worker process.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Response, g, request, session
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from request_metrics import registry
+
+DEFAULT_CLASSES = {
+    # Chart rendering; a couple at a time per worker leaves threads for everything else
+    "heavy": {"limit": 2, "queue": 2, "timeout": 1.0},
+    "write": {"limit": 3, "queue": 4, "timeout": 2.0},
+}
+DEFAULT_ENDPOINTS = {
+    "stats": "heavy",
+    "activity": "write",
+    "register": "write",
+    "contact": "write",
+    "change_password": "write",
+}
+# {endpoint: {key scope: (requests, per seconds)}} for POSTs; a POST must pass every bucket of its endpoint
+DEFAULT_RATE_LIMITS = {
+    "login": {"account": (5, 60), "address": (30, 60)},
+    "activity": {"user": (20, 60)},
+}
+
+
+class ConcurrencyLimiter:
+    """A counting semaphore with a bounded, time-limited wait queue."""
+
+    def __init__(self, name, limit, queue, timeout):
+        self.name = name
+        self.limit = limit
+        self.queue = queue
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """Take a slot. Returns the seconds spent waiting (0.0 when admitted at once), or None when shed."""
+        with self._condition:
+            # Newcomers do not overtake requests that are already waiting
+            if self.active < self.limit and not self.waiting:
+                self.active += 1
+                return 0.0
+            if self.waiting >= self.queue:
+                return None
+
+            self.waiting += 1
+            start = time.monotonic()
+            deadline = start + self.timeout
+            try:
+                while self.active >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                    self._condition.wait(remaining)
+                self.active += 1
+                return time.monotonic() - start
+            finally:
+                self.waiting -= 1
+
+    def release(self):
+        with self._condition:
+            self.active -= 1
+            self._condition.notify_all()
+
+    def snapshot(self):
+        return {"active": self.active, "waiting": self.waiting, "limit": self.limit}
+
+
+class RateLimiter:
+    """Token buckets allowing `rate` requests per `period` seconds per key, in bursts of up to `rate`."""
+
+    def __init__(self, rate, period, max_keys=10_000):
+        self.rate = rate
+        self.period = period
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key):
+        """Spend a token for `key`. Returns 0 when allowed, else the seconds until a token is available."""
+        refill = self.rate / self.period
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.rate, now))
+            tokens = min(self.rate, tokens + (now - updated) * refill)
+            if tokens >= 1:
+                tokens -= 1
+                retry_after = 0
+            else:
+                retry_after = (1 - tokens) / refill
+            self._buckets[key] = (tokens, now)
+            # Least recently seen keys go first; they have had the most time to refill anyway
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+
+class StaleCache:
+    """The last rendered page per key, up to `max_bytes` in total, kept so a shed request can be answered from it."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, key, body):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= len(previous[0])
+            if len(body) > self.max_bytes:
+                return
+            self._entries[key] = (body, time.time())
+            self.bytes += len(body)
+            # Least recently rendered pages go first
+            while self.bytes > self.max_bytes:
+                evicted, _ = self._entries.popitem(last=False)[1]
+                self.bytes -= len(evicted)
+
+    def get(self, key):
+        """(body, stored at) or None."""
+        with self._lock:
+            return self._entries.get(key)
+
+    def snapshot(self):
+        with self._lock:
+            return {"stale_cache_entries": len(self._entries), "stale_cache_bytes": self.bytes}
+
+
+class AdmissionControl:
+    def __init__(self, classes, endpoints, rate_limits, retry_after, stale_cache_bytes):
+        self.limiters = {name: ConcurrencyLimiter(name, **options) for name, options in classes.items()}
+        self.endpoints = {endpoint: self.limiters[name] for endpoint, name in endpoints.items()}
+        # {endpoint: [(key scope, limiter)]}
+        self.rate_limiters = {
+            endpoint: [(scope, RateLimiter(rate, period)) for scope, (rate, period) in scopes.items()]
+            for endpoint, scopes in rate_limits.items()
+        }
+        self.retry_after = retry_after
+        self.stale = StaleCache(stale_cache_bytes)
+        # {endpoint: function returning a response for a shed request, or None}
+        self.fallbacks = {}
+
+    def snapshot(self):
+        data = {
+            f"{name}_{key}": value
+            for name, limiter in self.limiters.items()
+            for key, value in limiter.snapshot().items()
+        }
+        data.update(self.stale.snapshot())
+        return data
+
+
+def account_key():
+    # Per address too, so failed attempts from elsewhere cannot lock the account's owner out
+    return f"{(request.form.get('username') or '').lower()}|{request.remote_addr}"
+
+
+def address_key():
+    return request.remote_addr
+
+
+def user_key():
+    user_id = session.get("user_id")
+    return f"user:{user_id}" if user_id else f"address:{request.remote_addr}"
+
+
+RATE_LIMIT_KEYS = {"account": account_key, "address": address_key, "user": user_key}
+
+
+def init_admission(app):
+    app.config.setdefault("ADMISSION_CONTROL", True)
+    app.config.setdefault("ADMISSION_CLASSES", DEFAULT_CLASSES)
+    app.config.setdefault("ADMISSION_ENDPOINTS", DEFAULT_ENDPOINTS)
+    app.config.setdefault("ADMISSION_RETRY_AFTER", 2)
+    app.config.setdefault("ADMISSION_STALE_CACHE_BYTES", 16 * 1024 * 1024)
+    app.config.setdefault("RATE_LIMITS", DEFAULT_RATE_LIMITS)
+    app.config.setdefault("RATE_LIMITS_ENABLED", True)
+    app.config.setdefault("TRUSTED_PROXIES", 0)
+
+    if not app.config["ADMISSION_CONTROL"]:
+        return None
+
+    if app.config["TRUSTED_PROXIES"]:
+        # Behind a reverse proxy every request would otherwise share the proxy's address bucket
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config["TRUSTED_PROXIES"])
+
+    admission = AdmissionControl(
+        app.config["ADMISSION_CLASSES"],
+        app.config["ADMISSION_ENDPOINTS"],
+        app.config["RATE_LIMITS"] if app.config["RATE_LIMITS_ENABLED"] else {},
+        app.config["ADMISSION_RETRY_AFTER"],
+        app.config["ADMISSION_STALE_CACHE_BYTES"]
+    )
+    app.extensions["admission"] = admission
+
+    @app.before_request
+    def admit_request():
+        endpoint = request.endpoint
+        if request.method == "POST":
+            for scope, rate_limiter in admission.rate_limiters.get(endpoint, ()):
+                retry_after = rate_limiter.hit(RATE_LIMIT_KEYS[scope]())
+                if retry_after:
+                    registry.increment("fitfam_rate_limited_total", (("endpoint", endpoint), ("scope", scope)))
+                    response = Response("Too many requests. Please try again shortly.\n", 429, mimetype="text/plain")
+                    response.headers["Retry-After"] = str(int(retry_after) + 1)
+                    return response
+
+        limiter = admission.endpoints.get(endpoint)
+        if limiter is None:
+            return None
+        waited = limiter.acquire()
+        if waited is not None:
+            g.admission_limiter = limiter
+            if waited:
+                registry.observe("fitfam_admission_wait_seconds", (("cost_class", limiter.name),), waited)
+            registry.increment(
+                "fitfam_admission_total", (("endpoint", endpoint), ("result", "queued" if waited else "admitted"))
+            )
+            return None
+
+        fallback = admission.fallbacks.get(endpoint)
+        response = fallback() if fallback is not None else None
+        if response is not None:
+            registry.increment("fitfam_admission_total", (("endpoint", endpoint), ("result", "stale")))
+            return response
+
+        registry.increment("fitfam_admission_total", (("endpoint", endpoint), ("result", "shed")))
+        response = Response("The service is busy. Please try again shortly.\n", 503, mimetype="text/plain")
+        response.headers["Retry-After"] = str(admission.retry_after)
+        return response
+
+    @app.teardown_request
+    def release_admission(exception=None):
+        limiter = g.pop("admission_limiter", None)
+        if limiter is not None:
+            limiter.release()
+
+    return admission
@@ -0,0 +1,292 @@
+"""
+Partitioning and archival for the activity table.
+
+Cold rows are moved to the compressed activity_archive table by `flask archive-activities`;
+`activity_history` reads both tables, so the stats page still sees a user's full history.
+
+On MySQL the activity table can also be RANGE-partitioned by month on registered_at:
+
+    flask activity-partitions init        # one-off conversion of the existing table
+    flask activity-partitions maintain    # run daily: add future months, drop archived ones
+    flask activity-partitions remove      # back to a plain table
+
+Partitioning needs registered_at in the primary key and does not allow foreign keys, so `init`
+changes the primary key to (id, registered_at) and drops the user_id foreign key. Partitioning
+is an operational choice per MySQL deployment rather than part of the schema, so these are
+maintenance commands instead of migrations; `init` and `remove` are idempotent.
+"""
+import logging
+from datetime import date, datetime, timedelta
+
+import click
+from sqlalchemy import delete, func, insert, select, text
+
+from db import db
+from models import Activity, ActivityArchive
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY_COLUMNS = [column.name for column in Activity.__table__.columns]
+
+# Catch-all partition for rows beyond the newest monthly partition
+MAXVALUE_PARTITION = "pmax"
+
+
+def activity_history(user_id):
+    """Every activity of a user from the hot and archive tables, newest first."""
+    hot = (
+        db.session.query(Activity)
+        .filter_by(user_id=user_id)
+        .order_by(Activity.registered_at.desc())
+        .all()
+    )
+    archived = (
+        db.session.query(ActivityArchive)
+        .filter_by(user_id=user_id)
+        .order_by(ActivityArchive.registered_at.desc())
+        .all()
+    )
+    if not archived:
+        return hot
+    # Archived rows are normally all older, but a replayed or backdated row may not be
+    return sorted(hot + archived, key=lambda activity: activity.registered_at or datetime.min, reverse=True)
+
+
+def archive_activities(cutoff, batch_size=1000):
+    """Move activities registered before `cutoff` to the archive table in batches. Returns the row count."""
+    table = Activity.__table__
+    # Both come from idx_activity_registered_at; the batches below are primary-key range scans
+    first_id, last_id = db.session.query(
+        func.min(Activity.id), func.max(Activity.id)
+    ).filter(Activity.registered_at < cutoff).one()
+    if first_id is None:
+        return 0
+
+    moved = 0
+    start = first_id
+    while start <= last_id:
+        end = start + batch_size
+        # The registered_at condition also lets MySQL prune partitions
+        condition = (table.c.id >= start) & (table.c.id < end) & (table.c.registered_at < cutoff)
+        # Copy and delete in one short transaction per batch
+        db.session.execute(
+            insert(ActivityArchive.__table__).from_select(ACTIVITY_COLUMNS, select(*table.c).where(condition))
+        )
+        moved += db.session.execute(delete(table).where(condition)).rowcount
+        db.session.commit()
+        start = end
+    return moved
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def next_month(day):
+    return (month_start(day) + timedelta(days=32)).replace(day=1)
+
+
+def partition_name(month):
+    return f"p{month:%Y_%m}"
+
+
+def partition_definition(month):
+    """A partition holding the month that starts at `month`."""
+    return f"PARTITION {partition_name(month)} VALUES LESS THAN (TO_DAYS('{next_month(month):%Y-%m-%d}'))"
+
+
+def monthly_partitions(first, last):
+    months = []
+    month = month_start(first)
+    while month <= last:
+        months.append(month)
+        month = next_month(month)
+    return months
+
+
+def existing_partitions(connection):
+    """{partition name: exclusive upper bound date, or None for MAXVALUE}, oldest first."""
+    rows = connection.execute(text(
+        "SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND PARTITION_NAME IS NOT NULL "
+        "ORDER BY PARTITION_ORDINAL_POSITION"
+    ), {"table": Activity.__tablename__}).all()
+
+    partitions = {}
+    for name, description in rows:
+        if description == "MAXVALUE":
+            partitions[name] = None
+        else:
+            # TO_DAYS counts from year 0; date.fromordinal counts from year 1
+            partitions[name] = date.fromordinal(int(description) - 365)
+    return partitions
+
+
+def activity_foreign_keys(connection):
+    return connection.execute(text(
+        "SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS "
+        "WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = 'activity'"
+    )).scalars().all()
+
+
+def activity_primary_key(connection):
+    return connection.execute(text(
+        "SELECT COLUMN_NAME FROM information_schema.KEY_COLUMN_USAGE "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'activity' AND CONSTRAINT_NAME = 'PRIMARY' "
+        "ORDER BY ORDINAL_POSITION"
+    )).scalars().all()
+
+
+def init_partitions(connection, months_ahead):
+    """
+    Convert the activity table to monthly RANGE partitions. Returns the partition names.
+
+    Each step checks the current schema first, so running it again (also after a failure part-way,
+    since MySQL DDL is not transactional) only does what is left. `remove_partitions` undoes it.
+    """
+    partitions = existing_partitions(connection)
+    if partitions:
+        return list(partitions)
+
+    missing = connection.execute(text("SELECT COUNT(*) FROM activity WHERE registered_at IS NULL")).scalar()
+    if missing:
+        raise click.ClickException(f"{missing} activities have no registered_at; set it before partitioning.")
+
+    for name in activity_foreign_keys(connection):
+        connection.execute(text(f"ALTER TABLE activity DROP FOREIGN KEY `{name}`"))
+
+    if activity_primary_key(connection) != ["id", "registered_at"]:
+        connection.execute(text(
+            "ALTER TABLE activity MODIFY registered_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP, "
+            "DROP PRIMARY KEY, ADD PRIMARY KEY (id, registered_at)"
+        ))
+
+    oldest = connection.execute(text("SELECT MIN(registered_at) FROM activity")).scalar()
+    today = date.today()
+    months = monthly_partitions((oldest.date() if oldest else today), _months_after(today, months_ahead))
+    definitions = [partition_definition(month) for month in months]
+    definitions.append(f"PARTITION {MAXVALUE_PARTITION} VALUES LESS THAN MAXVALUE")
+    connection.execute(text(
+        "ALTER TABLE activity PARTITION BY RANGE (TO_DAYS(registered_at)) (" + ", ".join(definitions) + ")"
+    ))
+    return [partition_name(month) for month in months] + [MAXVALUE_PARTITION]
+
+
+def remove_partitions(connection):
+    """Undo init_partitions: merge the partitions, restore the id primary key and the user foreign key."""
+    if existing_partitions(connection):
+        connection.execute(text("ALTER TABLE activity REMOVE PARTITIONING"))
+
+    if activity_primary_key(connection) != ["id"]:
+        connection.execute(text(
+            "ALTER TABLE activity DROP PRIMARY KEY, ADD PRIMARY KEY (id), MODIFY registered_at DATETIME NULL"
+        ))
+
+    if not activity_foreign_keys(connection):
+        connection.execute(text(
+            "ALTER TABLE activity ADD CONSTRAINT activity_ibfk_1 FOREIGN KEY (user_id) REFERENCES `user` (id)"
+        ))
+
+
+def _months_after(day, count):
+    month = month_start(day)
+    for _ in range(count):
+        month = next_month(month)
+    return month
+
+
+def add_future_partitions(connection, months_ahead):
+    """Split the MAXVALUE partition so monthly partitions exist `months_ahead` months out."""
+    partitions = existing_partitions(connection)
+    bounds = [bound for bound in partitions.values() if bound is not None]
+    first = max(bounds) if bounds else month_start(date.today())
+    months = monthly_partitions(first, _months_after(date.today(), months_ahead))
+    if not months:
+        return []
+
+    definitions = [partition_definition(month) for month in months]
+    definitions.append(f"PARTITION {MAXVALUE_PARTITION} VALUES LESS THAN MAXVALUE")
+    # Reorganizing an empty MAXVALUE partition copies no rows
+    connection.execute(text(
+        f"ALTER TABLE activity REORGANIZE PARTITION {MAXVALUE_PARTITION} INTO (" + ", ".join(definitions) + ")"
+    ))
+    return [partition_name(month) for month in months]
+
+
+def drop_archived_partitions(connection, cutoff):
+    """Drop partitions wholly older than `cutoff` once archiving has emptied them."""
+    dropped = []
+    for name, bound in existing_partitions(connection).items():
+        if bound is None or bound > cutoff.date():
+            continue
+        if connection.execute(text(f"SELECT 1 FROM activity PARTITION ({name}) LIMIT 1")).first():
+            logger.warning("Partition %s is past the archive horizon but still has rows; run archive-activities", name)
+            continue
+        connection.execute(text(f"ALTER TABLE activity DROP PARTITION {name}"))
+        dropped.append(name)
+    return dropped
+
+
+def require_mysql():
+    if db.engine.dialect.name != "mysql":
+        raise click.ClickException("Partitioning is only supported on MySQL.")
+
+
+def archive_cutoff(app):
+    return datetime.now() - timedelta(days=app.config["ACTIVITY_ARCHIVE_AFTER_DAYS"])
+
+
+def init_archival(app):
+    app.config.setdefault("ACTIVITY_ARCHIVE_AFTER_DAYS", 365)
+    app.config.setdefault("ACTIVITY_ARCHIVE_BATCH_SIZE", 1000)
+    app.config.setdefault("ACTIVITY_PARTITIONS_AHEAD", 3)
+
+    @app.cli.command("archive-activities")
+    @click.option("--older-than-days", type=int, help="Archive horizon (defaults to ACTIVITY_ARCHIVE_AFTER_DAYS).")
+    def archive_activities_command(older_than_days):
+        """Move activities older than the archive horizon to the archive table."""
+        if older_than_days is None:
+            cutoff = archive_cutoff(app)
+        else:
+            cutoff = datetime.now() - timedelta(days=older_than_days)
+        moved = archive_activities(cutoff, app.config["ACTIVITY_ARCHIVE_BATCH_SIZE"])
+        click.echo(f"Archived {moved} activities registered before {cutoff:%Y-%m-%d %H:%M}.")
+
+    @app.cli.group("activity-partitions")
+    def activity_partitions():
+        """Manage monthly RANGE partitions of the activity table (MySQL only)."""
+
+    @activity_partitions.command("init")
+    @click.option("--months-ahead", type=int, help="Future months to create (defaults to ACTIVITY_PARTITIONS_AHEAD).")
+    def init_command(months_ahead):
+        """Partition the activity table by month of registered_at."""
+        require_mysql()
+        with db.engine.begin() as connection:
+            if existing_partitions(connection):
+                click.echo("The activity table is already partitioned.")
+                return
+            names = init_partitions(connection, months_ahead or app.config["ACTIVITY_PARTITIONS_AHEAD"])
+        click.echo(f"Created {len(names)} partitions: {', '.join(names)}")
+
+    @activity_partitions.command("remove")
+    def remove_command():
+        """Merge the partitions back into a plain table with its original primary and foreign keys."""
+        require_mysql()
+        with db.engine.begin() as connection:
+            remove_partitions(connection)
+        click.echo("The activity table is no longer partitioned.")
+
+    @activity_partitions.command("maintain")
+    @click.option("--months-ahead", type=int, help="Future months to keep (defaults to ACTIVITY_PARTITIONS_AHEAD).")
+    @click.option("--drop-archived/--keep-archived", default=True, help="Drop empty partitions past the archive horizon.")
+    def maintain_command(months_ahead, drop_archived):
+        """Add partitions for upcoming months and drop the ones archiving has emptied."""
+        require_mysql()
+        with db.engine.begin() as connection:
+            if not existing_partitions(connection):
+                raise click.ClickException("The activity table is not partitioned; run `activity-partitions init`.")
+            added = add_future_partitions(connection, months_ahead or app.config["ACTIVITY_PARTITIONS_AHEAD"])
+            dropped = drop_archived_partitions(connection, archive_cutoff(app)) if drop_archived else []
+        click.echo(f"Added {len(added)} partitions, dropped {len(dropped)}.")
+        for name in dropped:
+            click.echo(f"  dropped {name}")
@@ -0,0 +1,127 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+
+import click
+from flask import request, send_from_directory
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Source assets (relative to static/) that the build step fingerprints
+ASSET_SOURCES = ["css/styles.css", "js/script.js"]
+
+# Fingerprinted files are written under static/dist/
+DIST_DIR = "dist"
+MANIFEST_NAME = "manifest.json"
+
+ASSET_MIMETYPES = {".css": "text/css", ".js": "text/javascript"}
+
+# (Accept-Encoding token, file suffix), in order of preference
+PRECOMPRESSED = [("br", ".br"), ("gzip", ".gz")]
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def minify_css(source):
+    source = re.sub(r"/\*.*?\*/", "", source, flags=re.S)
+    source = re.sub(r"\s+", " ", source)
+    # Spaces around ":" are left alone since "a :hover" and "a:hover" are different selectors
+    source = re.sub(r"\s*([{};,>])\s*", r"\1", source)
+    return source.replace(";}", "}").strip()
+
+
+def minify_js(source):
+    """Drop comment-only lines, indentation and blank lines; code inside lines is left untouched."""
+    lines = []
+    for line in source.splitlines():
+        line = line.strip()
+        if line and not line.startswith("//"):
+            lines.append(line)
+    return "\n".join(lines) + "\n"
+
+
+MINIFIERS = {".css": minify_css, ".js": minify_js}
+
+
+def build_assets(static_folder):
+    """Minify, fingerprint and precompress ASSET_SOURCES, then write the manifest. Returns the manifest."""
+    manifest = {}
+    for source_name in ASSET_SOURCES:
+        with open(os.path.join(static_folder, source_name), encoding="utf-8") as source_file:
+            source = source_file.read()
+
+        root, extension = os.path.splitext(source_name)
+        content = MINIFIERS[extension](source).encode("utf-8")
+        digest = hashlib.sha256(content).hexdigest()[:12]
+        dist_name = f"{DIST_DIR}/{root}.{digest}{extension}"
+
+        dist_path = os.path.join(static_folder, dist_name)
+        os.makedirs(os.path.dirname(dist_path), exist_ok=True)
+        with open(dist_path, "wb") as dist_file:
+            dist_file.write(content)
+        with open(dist_path + ".gz", "wb") as gzip_file:
+            gzip_file.write(gzip.compress(content, compresslevel=9, mtime=0))
+        if brotli is not None:
+            with open(dist_path + ".br", "wb") as brotli_file:
+                brotli_file.write(brotli.compress(content, quality=11))
+
+        manifest[source_name] = dist_name
+
+    with open(os.path.join(static_folder, DIST_DIR, MANIFEST_NAME), "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    return manifest
+
+
+def load_manifest(static_folder):
+    path = os.path.join(static_folder, DIST_DIR, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as manifest_file:
+        return json.load(manifest_file)
+
+
+def serve_dist_asset(static_folder, filename):
+    """Send a fingerprinted asset, preferring a precompressed variant the client accepts."""
+    directory = os.path.join(static_folder, DIST_DIR)
+    mimetype = ASSET_MIMETYPES.get(os.path.splitext(filename)[1])
+
+    for encoding, suffix in PRECOMPRESSED:
+        if request.accept_encodings[encoding] and os.path.exists(os.path.join(directory, filename + suffix)):
+            response = send_from_directory(directory, filename + suffix, mimetype=mimetype)
+            response.headers["Content-Encoding"] = encoding
+            break
+    else:
+        response = send_from_directory(directory, filename, mimetype=mimetype)
+
+    response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def init_assets(app):
+    """Point url_for('static', ...) at fingerprinted assets when a build manifest exists."""
+    manifest = load_manifest(app.static_folder)
+    app.extensions["asset_manifest"] = manifest
+
+    @app.url_defaults
+    def fingerprint_static_urls(endpoint, values):
+        if endpoint == "static" and values.get("filename") in manifest:
+            values["filename"] = manifest[values["filename"]]
+
+    @app.route(f"/static/{DIST_DIR}/<path:filename>")
+    def dist_asset(filename):
+        return serve_dist_asset(app.static_folder, filename)
+
+    @app.cli.command("build-assets")
+    def build_assets_command():
+        """Minify, fingerprint and precompress the static CSS and JS."""
+        built = build_assets(app.static_folder)
+        for source_name, dist_name in built.items():
+            click.echo(f"{source_name} -> {dist_name}")
+        if brotli is None:
+            click.echo("brotli is not installed; only gzip variants were written.")
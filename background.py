@@ -0,0 +1,101 @@
+"""
+Background threads owned by the app's subsystems (outbox, replicas, ingestion, aggregates, ...).
+
+Threads do not survive fork, so every worker process needs its own. A subsystem subclasses
+BackgroundWorker and hands the instance to `start_in_worker`; `init_background` then starts every
+registered worker before the first request a process serves, and gunicorn's post_fork calls
+`start_workers` so they are running before the worker takes traffic.
+"""
+import atexit
+import logging
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundWorker:
+    """One daemon thread per process running `_run` until `stop` sets `_stopping`."""
+
+    thread_name = "background-worker"
+
+    def __init__(self):
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._lifecycle = threading.Lock()
+
+    @property
+    def running(self):
+        return self._pid == os.getpid() and self._thread is not None and self._thread.is_alive()
+
+    def ensure_started(self):
+        """Start the thread unless it is already running in this process; cheap enough to call per request."""
+        if not self.running:
+            self.start()
+
+    def start(self):
+        with self._lifecycle:
+            if self.running:
+                return
+            forked = self._pid != os.getpid()
+            if forked:
+                self._pid = os.getpid()
+                atexit.register(self.stop)
+            elif self._thread is not None and not self._stopping.is_set():
+                logger.error("Background thread %s died; restarting it", self.thread_name)
+            self._stopping.clear()
+            self.on_start(forked)
+            self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+            self._thread.start()
+
+    def on_start(self, forked):
+        """Prepare state before the thread starts; `forked` is true the first time in a process."""
+
+    def wake(self):
+        """Interrupt the thread's wait so it notices `_stopping` promptly."""
+
+    def stop(self, timeout=10):
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._stopping.set()
+        self.wake()
+        self._thread.join(timeout)
+
+    def _run(self):
+        raise NotImplementedError
+
+
+def lock_file(open_file):
+    """Take an exclusive lock, or return False when another live process holds it."""
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(open_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+def start_in_worker(app, worker):
+    """Have `worker` started in every process that serves `app`."""
+    app.extensions.setdefault("background_workers", []).append(worker)
+    return worker
+
+
+def start_workers(app):
+    for worker in app.extensions.get("background_workers", ()):
+        worker.ensure_started()
+
+
+def init_background(app):
+    app.extensions.setdefault("background_workers", [])
+
+    @app.before_request
+    def start_background_workers():
+        start_workers(app)
@@ -0,0 +1,104 @@
+"""
+Measure how admission control protects cheap pages while /stats is overloaded.
+
+A burst of logged-in /stats clients runs alongside clients browsing /articles, once with
+admission control off and once with it on, against the same database. Latency of both routes is
+reported, with how many /stats requests were admitted at once, queued, answered from the stale
+cache or shed with 503.
+
+    python -m benchmarks.admission --stats-clients 16 --page-clients 4 --requests 20
+"""
+import argparse
+import os
+import tempfile
+import threading
+
+from benchmarks.run import ROUTES, TestClientSession, bench_route, load_app, login
+from request_metrics import registry
+
+STATS_ROUTE = next(route for route in ROUTES if route[0] == "stats")
+ARTICLES_ROUTE = next(route for route in ROUTES if route[0] == "articles")
+
+
+def admission_counts():
+    return {
+        dict(labels)["result"]: value
+        for (name, labels), value in registry.collect().items()
+        if name == "fitfam_admission_total"
+    }
+
+
+def warm_up(app, users):
+    """Render every user's stats page once, one at a time, so template caches and the stale cache are filled."""
+    from benchmarks.seed import BENCH_PASSWORD, bench_username
+
+    for index in range(users):
+        session = TestClientSession(app)
+        login(session, bench_username(index), BENCH_PASSWORD)
+        session.request("GET", "/stats")
+
+
+def run_mixed(app, volumes, args):
+    """Run the /stats and /articles clients at the same time; returns both summaries."""
+    results = {}
+
+    def run(route, clients):
+        results[route[0]] = bench_route(
+            route, lambda: TestClientSession(app), volumes, clients, args.requests, args.seed
+        )
+
+    threads = [
+        threading.Thread(target=run, args=(STATS_ROUTE, args.stats_clients)),
+        threading.Thread(target=run, args=(ARTICLES_ROUTE, args.page_clients)),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Database URL to reseed (defaults to a temporary SQLite file)")
+    parser.add_argument("--stats-clients", type=int, default=16)
+    parser.add_argument("--page-clients", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=20, help="Requests per client")
+    parser.add_argument("--activities", type=int, default=200, help="Activities per user")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    limited_app = load_app(args.url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "admission.db"))
+
+    from app import create_app
+    from benchmarks.seed import seed
+    from config import Config
+
+    class UnlimitedConfig(Config):
+        ADMISSION_CONTROL = False
+
+    unlimited_app = create_app(UnlimitedConfig)
+
+    with limited_app.app_context():
+        volumes = seed(
+            users=args.stats_clients, activities_per_user=args.activities, articles=60, workouts=1,
+            random_seed=args.seed
+        )
+
+    for label, app in (("off", unlimited_app), ("on", limited_app)):
+        warm_up(app, volumes["users"])
+        before = admission_counts()
+        results = run_mixed(app, volumes, args)
+        counts = {result: value - before.get(result, 0) for result, value in admission_counts().items()}
+
+        for route, summary in results.items():
+            print(
+                f"{label:>4} {route:>9} {summary['throughput']:>9.1f} req/s  p50 {summary['p50_ms']:>8.2f} ms  "
+                f"p95 {summary['p95_ms']:>8.2f} ms  p99 {summary['p99_ms']:>8.2f} ms  {summary['statuses']}"
+            )
+        if counts:
+            print("     " + "  ".join(f"{result} {count}" for result, count in sorted(counts.items())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Measure the community aggregates: full build, snapshot save/load, incremental refresh and lookups.
+
+Activities are bulk-inserted with random values spread over the last 400 days, then the
+aggregates are built from scratch, saved, loaded and brought up to date after --increment more
+rows. For reference, one GROUP BY over the whole table, the query a per-page-view approach
+would run, is timed as well. Only point --url at a scratch database; its tables are recreated.
+
+    python -m benchmarks.community --activities 10000000 --users 100000
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from benchmarks.run import load_app
+
+INSERT_CHUNK = 50_000
+
+
+def insert_activities(count, user_ids, rng, newest):
+    from sqlalchemy import insert
+
+    from db import db
+    from enums import ActivityType, Intensity
+    from models import Activity
+
+    activity_types = ActivityType.values()
+    intensities = Intensity.values()
+    for offset in range(0, count, INSERT_CHUNK):
+        size = min(INSERT_CHUNK, count - offset)
+        seconds = rng.integers(0, 400 * 86400, size)
+        columns = {
+            "user_id": rng.choice(user_ids, size),
+            "weight": np.round(rng.normal(75, 12, size).clip(40, 180), 1),
+            "height": np.round(rng.normal(172, 9, size).clip(140, 210), 1),
+            "activity_type": rng.choice(activity_types, size),
+            "duration": rng.integers(10, 180, size),
+            "intensity": rng.choice(intensities, size),
+            "resting_heart_rate": rng.integers(45, 95, size),
+            "exercise_heart_rate": rng.integers(100, 190, size),
+            "body_fat_percentage": np.round(rng.uniform(8, 40, size), 1),
+            "muscle_mass": np.round(rng.uniform(20, 60, size), 1),
+            "water_intake": np.round(rng.uniform(1, 4, size), 1),
+        }
+        rows = [
+            dict(zip(columns, values), registered_at=newest - timedelta(seconds=int(second)))
+            for *values, second in zip(*(column.tolist() for column in columns.values()), seconds.tolist())
+        ]
+        db.session.execute(insert(Activity), rows)
+        db.session.commit()
+
+
+def insert_users(count, rng):
+    """Users and profiles in bulk; nobody logs in, so they share a placeholder password hash."""
+    from sqlalchemy import insert
+
+    from benchmarks.seed import bench_username
+    from db import db
+    from enums import Gender
+    from models import User, UserProfile
+
+    db.drop_all()
+    db.create_all()
+    for offset in range(0, count, INSERT_CHUNK):
+        indexes = range(offset, min(offset + INSERT_CHUNK, count))
+        db.session.execute(insert(User), [
+            {"username": bench_username(index), "email": f"{bench_username(index)}@example.com", "password_hash": "-"}
+            for index in indexes
+        ])
+    user_ids = [user_id for (user_id,) in db.session.query(User.id)]
+    ages = rng.integers(16, 80, len(user_ids)).tolist()
+    genders = rng.choice(Gender.values(), len(user_ids)).tolist()
+    db.session.execute(insert(UserProfile), [
+        {"user_id": user_id, "age": age, "gender": gender}
+        for user_id, age, gender in zip(user_ids, ages, genders)
+    ])
+    db.session.commit()
+    return np.array(user_ids)
+
+
+def timed(label, function):
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    print(f"{label:>28} {elapsed:>9.3f} s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Database URL to reseed (defaults to a temporary SQLite file)")
+    parser.add_argument("--activities", type=int, default=10_000_000)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--increment", type=int, default=10_000, help="Rows added before the incremental refresh")
+    parser.add_argument("--lookups", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    app = load_app(args.url or "sqlite:///" + os.path.join(directory, "community.db"))
+
+    from sqlalchemy import func
+
+    from community import CommunityAggregates
+    from db import db
+    from models import Activity, UserProfile
+
+    rng = np.random.default_rng(args.seed)
+    aggregates = CommunityAggregates(app, snapshot_path=os.path.join(directory, "community.npz"))
+
+    with app.app_context():
+        user_ids = timed(f"insert {args.users} users", lambda: insert_users(args.users, rng))
+        now = datetime.now()
+        timed(f"insert {args.activities} rows", lambda: insert_activities(args.activities, user_ids, rng, now))
+
+        timed("GROUP BY per page view", lambda: db.session.query(
+            UserProfile.age, UserProfile.gender, Activity.activity_type,
+            func.count(), func.avg(Activity.duration), func.avg(Activity.resting_heart_rate)
+        ).join(UserProfile, UserProfile.user_id == Activity.user_id).group_by(
+            UserProfile.age, UserProfile.gender, Activity.activity_type
+        ).all())
+
+        timed("full build", lambda: aggregates.refresh(full=True))
+        timed("save snapshot", aggregates.save)
+        print(f"{'snapshot size':>28} {os.path.getsize(aggregates.snapshot_path) / 1024:>9.1f} KiB")
+
+        fresh = CommunityAggregates(app, snapshot_path=aggregates.snapshot_path)
+        timed("load snapshot", fresh.load)
+        insert_activities(args.increment, user_ids, rng, datetime.now())
+        rows = timed(f"incremental (+{args.increment} rows)", fresh.refresh)
+        print(f"{'rows folded in':>28} {rows:>9}")
+
+        profile = db.session.get(UserProfile, int(user_ids[0]))
+        activity = db.session.query(Activity).filter_by(user_id=profile.user_id).first()
+
+    start = time.perf_counter()
+    for _ in range(args.lookups):
+        fresh.compare(profile, activity)
+        fresh.leaderboard()
+    elapsed = time.perf_counter() - start
+    print(f"{'compare + leaderboard':>28} {elapsed / args.lookups * 1e6:>9.2f} us")
+    print(f"{'samples':>28} {fresh.samples:>9}")
+
+
+if __name__ == "__main__":
+    main()
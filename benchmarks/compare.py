@@ -0,0 +1,45 @@
+"""
+Compare two benchmark result files route by route.
+
+    python -m benchmarks.compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+import argparse
+import json
+
+METRICS = ["throughput", "p50_ms", "p95_ms", "p99_ms"]
+
+
+def change(old, new):
+    if not old or new is None:
+        return "n/a"
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    args = parser.parse_args()
+
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    with open(args.candidate) as candidate_file:
+        candidate = json.load(candidate_file)
+
+    print(f"baseline:  {baseline['meta'].get('git_revision')} {baseline['meta']['timestamp']}")
+    print(f"candidate: {candidate['meta'].get('git_revision')} {candidate['meta']['timestamp']}")
+
+    for mode, routes in candidate["results"].items():
+        for route, summary in routes.items():
+            old_summary = baseline["results"].get(mode, {}).get(route)
+            if old_summary is None:
+                continue
+            changes = "  ".join(
+                f"{metric} {old_summary[metric]} -> {summary[metric]} ({change(old_summary[metric], summary[metric])})"
+                for metric in METRICS
+            )
+            print(f"{mode:>7} {route:>14}  {changes}")
+
+
+if __name__ == "__main__":
+    main()
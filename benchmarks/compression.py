@@ -0,0 +1,87 @@
+"""
+Measure bytes saved and CPU cost of response compression per route and encoding.
+
+Each GET route is requested in-process with Accept-Encoding set to one encoding at a time;
+CPU time is compared against uncompressed ("identity") requests for the same paths.
+
+    python -m benchmarks.compression --requests 200
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.run import ROUTES, login, load_app
+
+ENCODINGS = ["identity", "gzip", "br", "zstd"]
+
+
+class EncodingSession:
+    def __init__(self, app, encoding):
+        self.client = app.test_client()
+        self.encoding = encoding
+
+    def request(self, method, path, data=None):
+        response = self.client.open(path, method=method, data=data, headers={"Accept-Encoding": self.encoding})
+        return response.status_code, response
+
+
+def measure(session, paths):
+    total_bytes = 0
+    encodings = set()
+    start = time.process_time()
+    for path in paths:
+        _, response = session.request("GET", path)
+        total_bytes += len(response.get_data())
+        encodings.add(response.headers.get("Content-Encoding", "identity"))
+    cpu = time.process_time() - start
+    return total_bytes / len(paths), cpu / len(paths), encodings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Database URL to reseed (defaults to a temporary SQLite file)")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per route and encoding")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    app = load_app(args.url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "compression.db"))
+
+    from benchmarks.seed import BENCH_PASSWORD, bench_username, seed
+
+    with app.app_context():
+        volumes = seed(random_seed=args.seed)
+
+    print(f"{'route':>10} {'encoding':>9} {'bytes':>9} {'saved':>7} {'cpu ms':>8} {'extra cpu ms':>13}")
+    for name, method, make_path, _, needs_login in ROUTES:
+        if method != "GET":
+            continue
+
+        rng = random.Random(args.seed)
+        paths = [make_path(rng, volumes) for _ in range(args.requests)]
+
+        baseline = None
+        for encoding in ENCODINGS:
+            session = EncodingSession(app, encoding)
+            if needs_login:
+                login(session, bench_username(0), BENCH_PASSWORD)
+            # Warm up outside the measurement
+            measure(session, paths[:5])
+
+            size, cpu, used = measure(session, paths)
+            if baseline is None:
+                baseline = (size, cpu)
+            if encoding not in used:
+                print(f"{name:>10} {encoding:>9} {'not applied (' + ', '.join(sorted(used)) + ')':>40}")
+                continue
+
+            saved = 1 - size / baseline[0] if baseline[0] else 0
+            print(
+                f"{name:>10} {encoding:>9} {size:>9.0f} {saved:>6.1%} {cpu * 1000:>8.3f} "
+                f"{(cpu - baseline[1]) * 1000:>13.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Compare direct commits with write-behind ingestion for a burst of /activity submissions.
+
+Both modes run against the same database through the Flask test client. The write-behind run
+reports the time until every buffered row is committed as well as the request latencies.
+
+    python -m benchmarks.ingestion --concurrency 16 --requests 50
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.run import ROUTES, TestClientSession, bench_route, load_app
+
+ACTIVITY_ROUTE = next(route for route in ROUTES if route[0] == "activity_post")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Database URL to reseed (defaults to a temporary SQLite file)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=50, help="Submissions per client")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--flush-interval", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    app = load_app(args.url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "ingestion.db"))
+
+    from app import create_app
+    from benchmarks.seed import seed
+    from config import Config
+    from models import Activity
+
+    class WriteBehindConfig(Config):
+        ACTIVITY_WRITE_BEHIND = True
+        ACTIVITY_BATCH_SIZE = args.batch_size
+        ACTIVITY_FLUSH_INTERVAL = args.flush_interval
+        ACTIVITY_BUFFER_SIZE = args.concurrency * args.requests
+        ACTIVITY_JOURNAL_DIR = tempfile.mkdtemp()
+
+    buffered_app = create_app(WriteBehindConfig)
+    ingestor = buffered_app.extensions["activity_ingestor"]
+    ingestor.start()
+
+    with app.app_context():
+        volumes = seed(users=args.concurrency, activities_per_user=1, articles=1, workouts=1, random_seed=args.seed)
+
+    for label, target in (("direct", app), ("buffered", buffered_app)):
+        with target.app_context():
+            before = Activity.query.count()
+
+        start = time.perf_counter()
+        summary = bench_route(
+            ACTIVITY_ROUTE, lambda: TestClientSession(target), volumes,
+            args.concurrency, args.requests, args.seed
+        )
+        accepted = time.perf_counter() - start
+        if target is buffered_app:
+            ingestor.wait_for(ingestor.snapshot()["last_sequence"], timeout=60)
+        committed = time.perf_counter() - start
+
+        with target.app_context():
+            inserted = Activity.query.count() - before
+        print(
+            f"{label:>9} {summary['throughput']:>9.1f} req/s  p50 {summary['p50_ms']:>8.2f} ms  "
+            f"p95 {summary['p95_ms']:>8.2f} ms  p99 {summary['p99_ms']:>8.2f} ms  "
+            f"accepted in {accepted:.2f} s, committed in {committed:.2f} s  ({inserted} rows)"
+        )
+
+    ingestor.stop()
+
+
+if __name__ == "__main__":
+    main()
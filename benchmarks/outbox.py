@@ -0,0 +1,136 @@
+"""
+Measure outbox dispatch throughput and queue-to-send lag against a local SMTP server.
+
+An aiosmtpd server on localhost stands in for the mail relay; --smtp-latency adds a delay to
+every accepted message to mimic a remote one. The baseline opens a new SMTP connection per
+message, as a view sending mail inline would. Each outbox run queues --messages messages and
+times the dispatcher draining them in batches over one persistent connection.
+
+    python -m benchmarks.outbox --messages 2000 --batch-sizes 1,10,50,200
+"""
+import argparse
+import asyncio
+import os
+import socket
+import tempfile
+import time
+
+from aiosmtpd.controller import Controller
+
+from benchmarks.run import load_app, percentile
+
+RECIPIENT = "staff@example.com"
+
+
+class CountingHandler:
+    def __init__(self, latency):
+        self.latency = latency
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.received += 1
+        return "250 Message accepted for delivery"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def queue_messages(count):
+    from db import db
+    from models import Contact
+    from outbox import queue_contact_notification
+
+    for index in range(count):
+        contact = Contact(
+            name=f"Bench {index}", email=f"bench{index}@example.com", phone="0123456789",
+            subject="Benchmark", message="Benchmark message body."
+        )
+        db.session.add(contact)
+        queue_contact_notification(contact, RECIPIENT)
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Database URL to use (defaults to a temporary SQLite file)")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--batch-sizes", default="1,10,50,200")
+    parser.add_argument("--smtp-latency", type=float, default=0.0, help="Seconds the SMTP server spends per message")
+    args = parser.parse_args()
+
+    handler = CountingHandler(args.smtp_latency)
+    port = free_port()
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+
+    load_app(args.url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "outbox.db"))
+
+    from flask_mail import Message
+
+    from app import create_app
+    from config import Config
+    from db import db
+    from models import OutboxMessage
+    from outbox import mail
+
+    class OutboxConfig(Config):
+        MAIL_SERVER = "127.0.0.1"
+        MAIL_PORT = port
+        MAIL_USE_TLS = False
+        MAIL_USE_SSL = False
+        MAIL_USERNAME = None
+        MAIL_PASSWORD = None
+        CONTACT_NOTIFICATION_RECIPIENT = RECIPIENT
+
+    app = create_app(OutboxConfig)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+        # Baseline: one connection per message, as a view sending mail inline would
+        count = min(args.messages, 500)
+        start = time.perf_counter()
+        for index in range(count):
+            mail.send(Message("Benchmark", recipients=[RECIPIENT], body=f"Message {index}"))
+        elapsed = time.perf_counter() - start
+        print(f"{'inline':>12} {count / elapsed:>9.1f} msg/s  {elapsed / count * 1000:>8.2f} ms/msg  ({count} messages)")
+
+    for batch_size in [int(size) for size in args.batch_sizes.split(",")]:
+        with app.app_context():
+            db.session.query(OutboxMessage).delete()
+            db.session.commit()
+            queue_messages(args.messages)
+
+        dispatcher = app.extensions["outbox_dispatcher"]
+        dispatcher.batch_size = batch_size
+        received = handler.received
+        start = time.perf_counter()
+        dispatcher.start()
+        dispatcher.notify()
+        while handler.received - received < args.messages:
+            time.sleep(0.01)
+        elapsed = time.perf_counter() - start
+        dispatcher.stop()
+
+        with app.app_context():
+            lags = sorted(
+                (sent_at - created_at).total_seconds()
+                for created_at, sent_at in db.session.query(OutboxMessage.created_at, OutboxMessage.sent_at)
+                if sent_at is not None
+            )
+        print(
+            f"{'batch ' + str(batch_size):>12} {args.messages / elapsed:>9.1f} msg/s  "
+            f"lag p50 {percentile(lags, 50):>7.2f} s  p95 {percentile(lags, 95):>7.2f} s  "
+            f"drained in {elapsed:.2f} s"
+        )
+
+    controller.stop()
+
+
+if __name__ == "__main__":
+    main()
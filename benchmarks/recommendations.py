@@ -0,0 +1,118 @@
+"""
+Measure the recommendation batch build and the cached lookup.
+
+A synthetic catalog and activity history are generated in memory, so the build cost is the
+feature extraction and the vectorized scoring alone. For comparison, scoring a sample of users
+one at a time (one user vector against every workout) is timed and extrapolated.
+
+    python -m benchmarks.recommendations --users 100000 --activities 20 --workouts 500
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+
+CATEGORY_WORDS = {
+    "strength": "strength muscle weights squat deadlift press bodybuilding power",
+    "cardio": "cardio running cycling endurance hiit intervals aerobics boxing",
+    "flexibility": "flexibility yoga stretching mobility recovery gentle",
+    "balance": "balance stability core yoga pilates control",
+}
+LEVEL_WORDS = ("beginner low impact", "intermediate moderate", "advanced high intensity")
+
+
+def synthetic_workouts(count, rng):
+    workouts = []
+    for index in range(count):
+        category = rng.choice(list(CATEGORY_WORDS))
+        words = CATEGORY_WORDS[category].split()
+        level = rng.choice(LEVEL_WORDS)
+        description = " ".join(rng.sample(words, 4)) + f" workout for {level} athletes."
+        workouts.append(SimpleNamespace(
+            id=index + 1, name=f"{level.split()[0].title()} {words[0]} {index}", description=description,
+            image_path=f"images/workout-{index % 10}.jpg", category=category
+        ))
+    return workouts
+
+
+def synthetic_rows(users, activities_per_user, rng, now):
+    from enums import ActivityType, Intensity
+
+    activity_types = ActivityType.values()
+    intensities = Intensity.values()
+    rows = []
+    for user_id in range(1, users + 1):
+        # Most users stick to one or two activity types
+        favourites = rng.sample(activity_types, 2)
+        age = rng.randint(18, 70)
+        for _ in range(activities_per_user):
+            rows.append((
+                user_id, rng.choice(favourites), rng.choice(intensities), rng.randint(90, 185), age,
+                now - timedelta(days=rng.uniform(0, 90))
+            ))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--activities", type=int, default=20, help="Recent activities per user")
+    parser.add_argument("--workouts", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    from recommendations import (
+        INTENSITY_INDEX, TYPE_INDEX, RecommendationIndex, WorkoutFeatures, build_recommendations,
+        combination_index, heart_rate_zone, workout_card
+    )
+
+    rng = random.Random(args.seed)
+    now = datetime.now()
+    workouts = synthetic_workouts(args.workouts, rng)
+    rows = synthetic_rows(args.users, args.activities, rng, now)
+
+    start = time.perf_counter()
+    recommendations = build_recommendations(workouts, rows, now, args.top_k, 14.0)
+    elapsed = time.perf_counter() - start
+    print(f"{'vectorized build':>22} {elapsed:>9.2f} s  ({len(recommendations)} users, {len(rows)} activities)")
+
+    # One user at a time: sum the user's activity vectors, then score and sort every workout
+    features = WorkoutFeatures(workouts)
+    combination_vectors = features.combination_vectors()
+    sample = rows[:min(len(rows), 1000 * args.activities)]
+    start = time.perf_counter()
+    for offset in range(0, len(sample), args.activities):
+        vector = np.zeros(features.matrix.shape[1])
+        for _, activity_type, intensity, heart_rate, age, registered_at in sample[offset:offset + args.activities]:
+            zone = heart_rate_zone(heart_rate, age)
+            row = combination_index(TYPE_INDEX[activity_type], INTENSITY_INDEX[intensity], zone)
+            vector += combination_vectors[row] * 0.5 ** ((now - registered_at).total_seconds() / 86400 / 14)
+        scores = features.matrix @ vector / (np.linalg.norm(vector) or 1)
+        np.argsort(-scores)[:args.top_k]
+    per_user = (time.perf_counter() - start) / (len(sample) / args.activities)
+    print(f"{'per-user loop':>22} {per_user * args.users:>9.2f} s  (extrapolated from {len(sample) // args.activities} users)")
+
+    index = RecommendationIndex(None, top_k=args.top_k)
+    index._recommendations = recommendations
+    index._workouts = {workout.id: workout_card(workout) for workout in workouts}
+    user_ids = [rng.randint(1, args.users) for _ in range(args.lookups)]
+    start = time.perf_counter()
+    for user_id in user_ids:
+        index.recommend(user_id)
+    elapsed = time.perf_counter() - start
+    print(f"{'cached lookup':>22} {elapsed / args.lookups * 1e6:>9.2f} us")
+
+    start = time.perf_counter()
+    for user_id in user_ids:
+        index.recommend(user_id, category="balance")
+    elapsed = time.perf_counter() - start
+    print(f"{'lookup with category':>22} {elapsed / args.lookups * 1e6:>9.2f} us")
+
+
+if __name__ == "__main__":
+    main()
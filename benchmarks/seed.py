@@ -0,0 +1,96 @@
+"""Seed a database with deterministic fake users, activities, articles and workouts."""
+import random
+from datetime import datetime, timedelta
+
+from werkzeug.security import generate_password_hash
+
+from db import db
+from enums import ActivityType, Gender, Intensity
+from models import User, UserProfile, Workout, Article, Activity
+
+BENCH_PASSWORD = "Bench-Passw0rd!"
+
+GENDERS = list(Gender)
+ACTIVITY_TYPES = list(ActivityType)
+INTENSITIES = list(Intensity)
+CATEGORIES = ["strength", "cardio", "flexibility", "balance"]
+
+
+def bench_username(index):
+    return f"benchuser{index}"
+
+
+def random_activity(rng, user_id, registered_at, height):
+    return Activity(
+        user_id=user_id,
+        weight=round(rng.uniform(50, 110), 1),
+        height=height,
+        activity_type=rng.choice(ACTIVITY_TYPES),
+        duration=rng.randint(10, 120),
+        intensity=rng.choice(INTENSITIES),
+        resting_heart_rate=rng.randint(45, 90),
+        exercise_heart_rate=rng.randint(100, 190),
+        body_fat_percentage=round(rng.uniform(8, 35), 1),
+        muscle_mass=round(rng.uniform(25, 60), 1),
+        water_intake=round(rng.uniform(1, 4), 1),
+        registered_at=registered_at
+    )
+
+
+def seed(users=20, activities_per_user=50, articles=60, workouts=80, random_seed=42):
+    """Drop and recreate all tables, then insert the requested volumes. Call inside an app context."""
+    rng = random.Random(random_seed)
+    db.drop_all()
+    db.create_all()
+
+    # Hashing is deliberately slow, so every benchmark user shares one password hash
+    password_hash = generate_password_hash(BENCH_PASSWORD)
+    db.session.add_all([
+        User(username=bench_username(index), email=f"{bench_username(index)}@example.com", password_hash=password_hash)
+        for index in range(users)
+    ])
+    db.session.commit()
+
+    start = datetime(2024, 1, 1)
+    user_ids = [user_id for (user_id,) in db.session.query(User.id).order_by(User.id)]
+    for user_id in user_ids:
+        db.session.add(UserProfile(
+            user_id=user_id,
+            age=rng.randint(18, 70),
+            gender=rng.choice(GENDERS)
+        ))
+        height = round(rng.uniform(150, 200), 1)
+        db.session.add_all([
+            random_activity(rng, user_id, start + timedelta(days=day), height)
+            for day in range(activities_per_user)
+        ])
+        db.session.commit()
+
+    db.session.add_all([
+        Workout(
+            name=f"Workout {index}",
+            description=f"Description for workout {index}. " * 5,
+            image_path=f"images/workout-{index % 10}.jpg",
+            category=CATEGORIES[index % len(CATEGORIES)]
+        )
+        for index in range(workouts)
+    ])
+    db.session.add_all([
+        Article(
+            title=f"Article {index}",
+            content="|".join(f"Paragraph {paragraph} of article {index}." for paragraph in range(6)),
+            category=CATEGORIES[index % len(CATEGORIES)],
+            image_path=f"images/article-{index % 10}.jpg",
+            created_at=start + timedelta(hours=index)
+        )
+        for index in range(articles)
+    ])
+    db.session.commit()
+
+    return {
+        "users": users,
+        "activities_per_user": activities_per_user,
+        "articles": articles,
+        "workouts": workouts,
+        "random_seed": random_seed
+    }
@@ -0,0 +1,99 @@
+"""
+Measure app startup time and first-request latency, with and without warm-up.
+
+Each measurement runs in a fresh Python process so that import, template compilation and
+matplotlib font caches start cold.
+
+    python -m benchmarks.startup
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+FIRST_REQUESTS = [
+    ("index", "GET", "/", None),
+    ("login", "GET", "/login", None),
+    ("workouts", "GET", "/workouts", None),
+    ("articles", "GET", "/articles", None),
+    ("article", "GET", "/article/1", None),
+    ("login_post", "POST", "/login", "credentials"),
+    ("stats", "GET", "/stats", None),
+]
+
+
+def child(warm):
+    """Runs inside the fresh process; prints timings as JSON."""
+    from benchmarks.seed import BENCH_PASSWORD, bench_username
+
+    timings = {}
+    start = time.perf_counter()
+    from app import create_app
+    app = create_app()
+    timings["create_app"] = time.perf_counter() - start
+
+    if warm:
+        from warmup import warm_up
+
+        start = time.perf_counter()
+        warm_up(app)
+        timings["warm_up"] = time.perf_counter() - start
+
+    client = app.test_client()
+    credentials = {"username": bench_username(0), "password": BENCH_PASSWORD}
+    for name, method, path, data in FIRST_REQUESTS:
+        start = time.perf_counter()
+        client.open(path, method=method, data=credentials if data else None)
+        timings[name] = time.perf_counter() - start
+
+    print(json.dumps(timings))
+
+
+def run_child(url, warm):
+    env = dict(os.environ, DATABASE_URL=url)
+    env.setdefault("SECRET_KEY", "benchmark-secret-key")
+    output = subprocess.check_output(
+        [sys.executable, "-m", "benchmarks.startup", "--child"] + (["--warm"] if warm else []),
+        env=env, text=True
+    )
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Database URL to reseed (defaults to a temporary SQLite file)")
+    parser.add_argument("--output", help="Optional JSON output path")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--warm", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.warm)
+        return
+
+    from benchmarks.run import load_app
+    from benchmarks.seed import seed
+
+    url = args.url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "startup.db")
+    app = load_app(url)
+    with app.app_context():
+        seed(users=2, activities_per_user=20, articles=12, workouts=16)
+
+    results = {"cold": run_child(url, warm=False), "warm": run_child(url, warm=True)}
+
+    print(f"{'step':>12} {'cold ms':>10} {'warm ms':>10}")
+    for step in results["warm"]:
+        cold = results["cold"].get(step)
+        cold_ms = f"{cold * 1000:.1f}" if cold is not None else "-"
+        print(f"{step:>12} {cold_ms:>10} {results['warm'][step] * 1000:>10.1f}")
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
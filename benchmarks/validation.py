@@ -0,0 +1,48 @@
+"""
+Compare per-record and batch activity validation throughput.
+
+    python -m benchmarks.validation --records 10000
+"""
+import argparse
+import random
+import time
+
+from activity_validations import ACTIVITY_FIELDS, validate_activity, validate_activity_batch
+from benchmarks.run import activity_form
+
+
+def make_forms(count, invalid_ratio, random_seed):
+    rng = random.Random(random_seed)
+    forms = []
+    for _ in range(count):
+        form = activity_form(rng)
+        if rng.random() < invalid_ratio:
+            form[rng.choice(list(form))] = rng.choice(["", "abc", "-5", "9999"])
+        forms.append(form)
+    return forms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=10000)
+    parser.add_argument("--invalid-ratio", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    forms = make_forms(args.records, args.invalid_ratio, args.seed)
+
+    start = time.perf_counter()
+    single_invalid = sum(1 for form in forms if validate_activity(form)[1])
+    single_elapsed = time.perf_counter() - start
+
+    columns = {field.name: [form.get(field.form_key) for form in forms] for field in ACTIVITY_FIELDS}
+    start = time.perf_counter()
+    _, _, valid = validate_activity_batch(columns)
+    batch_elapsed = time.perf_counter() - start
+
+    print(f"single: {single_elapsed / args.records * 1e6:8.2f} us/record  ({single_invalid} invalid)")
+    print(f"batch:  {batch_elapsed / args.records * 1e6:8.2f} us/record  ({int((~valid).sum())} invalid)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,430 @@
+"""
+Community benchmarks and weekly leaderboards.
+
+The stats page shows where a user's BMI, session length and resting heart rate fall among
+peers of the same age bracket and gender, plus this week's top users by training minutes.
+None of it is computed per page view; every worker keeps the aggregates in memory:
+
+- PercentileSketch keeps a fixed-width histogram per (age bracket, gender, activity type)
+  bucket. Histograms only ever gain counts, so new activity rows are folded in as they arrive,
+  and a value's percentile is one lookup in a precomputed rank table.
+- Per-user minute totals are kept for the current and previous week; the top
+  COMMUNITY_LEADERBOARD_SIZE per activity type are materialized after every refresh.
+
+A background thread folds in activities with ids above the last one seen every
+COMMUNITY_REFRESH_INTERVAL seconds. `flask community refresh` (run from cron) saves a snapshot to
+COMMUNITY_SNAPSHOT_PATH, which workers load at start instead of scanning the whole table.
+Every activity is one sample, so frequent trainers weigh more than occasional ones. A full build
+also scans activity_archive, so archiving old activities does not shrink the peer groups.
+"""
+import heapq
+import logging
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_right
+from collections import Counter
+from datetime import date, datetime, timedelta
+from operator import itemgetter
+
+import click
+import numpy as np
+from sqlalchemy import String, case, or_, select, true, type_coerce
+
+from background import BackgroundWorker, start_in_worker
+from db import db
+from enums import ActivityType, Gender
+from models import Activity, ActivityArchive, User, UserProfile
+from request_metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Lower bounds of the age brackets after the first
+AGE_BRACKETS = (18, 25, 35, 45, 55, 65)
+AGE_LABELS = ("under 18", "18-24", "25-34", "35-44", "45-54", "55-64", "65+")
+
+GENDERS = list(Gender)
+ACTIVITY_TYPES = list(ActivityType)
+GENDER_INDEX = {gender.value: index for index, gender in enumerate(GENDERS)}
+TYPE_INDEX = {activity_type.value: index for index, activity_type in enumerate(ACTIVITY_TYPES)}
+# The extra type slot aggregates every activity type
+ALL_TYPES = len(ACTIVITY_TYPES)
+TYPE_SLOTS = ALL_TYPES + 1
+BUCKETS = len(AGE_LABELS) * len(GENDERS) * TYPE_SLOTS
+
+# (lowest value, bin width, bins); values outside the range land in the first or last bin
+SKETCH_RANGES = {
+    "bmi": (10.0, 0.25, 200),
+    "duration": (0.0, 5.0, 120),
+    "resting_heart_rate": (30.0, 1.0, 91),
+}
+
+SCAN_CHUNK = 100_000
+# Ids skipped by a refresh are looked for again this long, in case their transaction commits late
+GAP_TTL = 600.0
+MAX_GAPS = 10_000
+
+
+def age_bracket(age):
+    return bisect_right(AGE_BRACKETS, age)
+
+
+def peer_bucket(age, gender, type_slot=ALL_TYPES):
+    return (age_bracket(age) * len(GENDERS) + GENDER_INDEX[str(gender)]) * TYPE_SLOTS + type_slot
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+class PercentileSketch:
+    """Fixed-width histograms of one metric, one row per peer bucket."""
+
+    def __init__(self, low, width, bins, counts=None):
+        self.low = low
+        self.width = width
+        self.bins = bins
+        self.counts = np.zeros((BUCKETS, bins), dtype=np.int64) if counts is None else counts
+        self.publish()
+
+    def bin_of(self, values):
+        bins = np.floor((values - self.low) / self.width)
+        return np.clip(bins, 0, self.bins - 1).astype(np.int64)
+
+    def add(self, buckets, values):
+        flat = buckets * self.bins + self.bin_of(values)
+        self.counts += np.bincount(flat, minlength=self.counts.size).reshape(self.counts.shape)
+
+    def publish(self):
+        """Rebuild the rank table lookups read; it is swapped in whole, so readers never see a partial update."""
+        totals = self.counts.sum(axis=1)
+        # Midpoint rank: every sample below the value's bin plus half of the bin itself
+        below = np.cumsum(self.counts, axis=1) - self.counts / 2
+        with np.errstate(invalid="ignore", divide="ignore"):
+            ranks = below * 100 / totals[:, None]
+        self._table = (ranks, totals)
+
+    def percentile(self, bucket, value):
+        """(percentage of the bucket's samples below `value`, sample count) in O(1)."""
+        ranks, totals = self._table
+        index = min(max(int((value - self.low) // self.width), 0), self.bins - 1)
+        return float(ranks[bucket, index]), int(totals[bucket])
+
+
+def activity_rows(condition, since, model=Activity):
+    """The columns the aggregates read for rows of `model` (Activity or ActivityArchive) matching `condition`."""
+    return (
+        select(
+            model.id,
+            model.user_id,
+            # Plain strings: converting every row to an enum member dominates a full scan
+            type_coerce(model.activity_type, String),
+            model.duration,
+            model.resting_heart_rate,
+            model.weight,
+            UserProfile.age,
+            type_coerce(UserProfile.gender, String),
+            model.height,
+            # Only recent rows feed the leaderboards, so older dates are not fetched
+            case((model.registered_at >= since, model.registered_at)),
+        )
+        .join(UserProfile, UserProfile.user_id == model.user_id)
+        .where(condition)
+    )
+
+
+class CommunityAggregates(BackgroundWorker):
+    """Peer percentiles and weekly leaderboards, refreshed incrementally from a background thread."""
+
+    thread_name = "community-aggregates"
+
+    def __init__(self, app, refresh_interval=60.0, leaderboard_size=10, min_samples=20, snapshot_path=None):
+        super().__init__()
+        self.app = app
+        self.refresh_interval = refresh_interval
+        self.leaderboard_size = leaderboard_size
+        self.min_samples = min_samples
+        self.snapshot_path = snapshot_path
+
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.sketches = {metric: PercentileSketch(*spec) for metric, spec in SKETCH_RANGES.items()}
+        # {week start: [Counter({user_id: minutes}) per type slot]}
+        self.week_minutes = {}
+        self.watermark = 0
+        self._gaps = {}
+        self._leaderboards = {}
+        self.refreshed_at = None
+        self.samples = 0
+
+    @property
+    def ready(self):
+        return self.refreshed_at is not None
+
+    def _run(self):
+        """Load or build the aggregates, then keep them fresh."""
+        with self.app.app_context():
+            try:
+                if not self.load():
+                    logger.info("No community snapshot at %s; scanning the activity table", self.snapshot_path)
+            except Exception:
+                logger.exception("Could not load the community snapshot")
+                self.reset()
+        while True:
+            try:
+                with self.app.app_context():
+                    self.refresh()
+            except Exception:
+                logger.exception("Community aggregate refresh failed")
+            if self._stopping.wait(self.refresh_interval):
+                return
+
+    def _window_start(self):
+        """Rows older than the start of last week no longer affect any leaderboard."""
+        return datetime.combine(week_start(date.today()) - timedelta(days=7), datetime.min.time())
+
+    def refresh(self, full=False):
+        """
+        Fold in activities added since the last refresh (every activity with `full`). Returns the row count.
+
+        Archived rows keep ids below the watermark and never return to the hot table, so only a
+        full build reads them.
+        """
+        with self._lock:
+            start = time.perf_counter()
+            if full:
+                self.reset()
+            since = self._window_start()
+
+            condition = Activity.id > self.watermark if self.watermark else true()
+            if self._gaps:
+                condition = or_(condition, Activity.id.in_(list(self._gaps)))
+            previous = self.watermark
+            queries = [activity_rows(condition, since)]
+            if not previous:
+                queries.insert(0, activity_rows(true(), since, ActivityArchive))
+
+            seen = []
+            with db.engine.connect() as connection:
+                for query in queries:
+                    result = connection.execution_options(stream_results=True, yield_per=SCAN_CHUNK).execute(query)
+                    for rows in result.partitions():
+                        ids = self._add_rows(rows)
+                        # Gaps only matter for increments; a full scan already saw everything committed
+                        if previous:
+                            seen.extend(ids)
+
+            if previous:
+                self._track_gaps(previous, seen)
+            self._publish()
+
+            elapsed = time.perf_counter() - start
+            registry.observe("fitfam_span_duration_seconds", (("span", "community_refresh"),), elapsed)
+            return len(seen) if previous else self.samples
+
+    def _add_rows(self, rows):
+        (ids, user_ids, activity_types, durations, resting_rates, weights,
+         ages, genders, heights, dates) = zip(*rows)
+        count = len(ids)
+        type_index = np.fromiter((TYPE_INDEX.get(value, -1) for value in activity_types), np.int64, count)
+        gender_index = np.fromiter((GENDER_INDEX.get(value, -1) for value in genders), np.int64, count)
+        age = np.array(ages, dtype=np.float64)
+        height = np.array(heights, dtype=np.float64)
+        weight = np.array(weights, dtype=np.float64)
+
+        valid = (type_index >= 0) & (gender_index >= 0) & ~np.isnan(age)
+        base = (np.searchsorted(AGE_BRACKETS, np.nan_to_num(age), side="right") * len(GENDERS) + gender_index) * TYPE_SLOTS
+        # Each row counts towards its own activity type and towards "every type"
+        buckets = np.concatenate([(base + type_index)[valid], (base + ALL_TYPES)[valid]])
+
+        def twice(values):
+            values = values[valid]
+            return np.concatenate([values, values])
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            bmi = twice(weight / (height / 100) ** 2)
+        has_bmi = np.isfinite(bmi)
+        self.sketches["bmi"].add(buckets[has_bmi], bmi[has_bmi])
+        self.sketches["duration"].add(buckets, twice(np.array(durations, dtype=np.float64)))
+        self.sketches["resting_heart_rate"].add(buckets, twice(np.array(resting_rates, dtype=np.float64)))
+        self.samples += int(valid.sum())
+
+        for position in (index for index, registered_at in enumerate(dates) if registered_at is not None):
+            slot = TYPE_INDEX.get(activity_types[position])
+            if slot is None:
+                continue
+            week = week_start(dates[position].date())
+            slots = self.week_minutes.get(week)
+            if slots is None:
+                slots = self.week_minutes[week] = [Counter() for _ in range(TYPE_SLOTS)]
+            user_id = user_ids[position]
+            slots[slot][user_id] += durations[position]
+            slots[ALL_TYPES][user_id] += durations[position]
+
+        self.watermark = max(self.watermark, max(ids))
+        return ids
+
+    def _track_gaps(self, previous, seen):
+        """Remember ids skipped below the new watermark: an earlier id can commit after a later one."""
+        now = time.monotonic()
+        seen = set(seen)
+        gaps = {activity_id: first_missed for activity_id, first_missed in self._gaps.items()
+                if activity_id not in seen and now - first_missed < GAP_TTL}
+        if self.watermark - previous <= MAX_GAPS:
+            for activity_id in range(previous + 1, self.watermark):
+                if activity_id not in seen:
+                    gaps.setdefault(activity_id, now)
+        self._gaps = gaps
+
+    def _publish(self):
+        for sketch in self.sketches.values():
+            sketch.publish()
+
+        current = week_start(date.today())
+        self.week_minutes = {
+            week: slots for week, slots in self.week_minutes.items() if week >= current - timedelta(days=7)
+        }
+        top = {
+            slot: heapq.nlargest(self.leaderboard_size, minutes.items(), key=itemgetter(1))
+            for slot, minutes in enumerate(self.week_minutes.get(current, []))
+        }
+        user_ids = {user_id for entries in top.values() for user_id, _ in entries}
+        usernames = dict(db.session.query(User.id, User.username).filter(User.id.in_(user_ids))) if user_ids else {}
+        db.session.commit()
+        self._leaderboards = {
+            slot: [{"username": usernames.get(user_id), "minutes": minutes} for user_id, minutes in entries]
+            for slot, entries in top.items()
+        }
+        self.refreshed_at = datetime.now()
+
+    def compare(self, profile, activity):
+        """Where the user's latest values fall among peers, or None until the aggregates are ready."""
+        if not self.ready or profile is None or activity is None:
+            return None
+        peers = peer_bucket(profile.age, profile.gender)
+        values = [
+            ("BMI", "bmi", peers, round(activity.weight / (activity.height / 100) ** 2, 1)),
+            (
+                f"{str(activity.activity_type).capitalize()} session (minutes)", "duration",
+                peer_bucket(profile.age, profile.gender, TYPE_INDEX[str(activity.activity_type)]), activity.duration
+            ),
+            ("Resting heart rate (bpm)", "resting_heart_rate", peers, activity.resting_heart_rate),
+        ]
+
+        metrics = []
+        for label, metric, bucket, value in values:
+            if value is None:
+                continue
+            percentile, samples = self.sketches[metric].percentile(bucket, value)
+            # Too few peers give a meaningless (and revealing) percentile
+            if samples < self.min_samples:
+                continue
+            metrics.append({"label": label, "value": value, "percentile": round(percentile), "samples": samples})
+        if not metrics:
+            return None
+        return {"group": f"{str(profile.gender).capitalize()}, {AGE_LABELS[age_bracket(profile.age)]}", "metrics": metrics}
+
+    def leaderboard(self, activity_type=None):
+        """This week's top users by training minutes, overall or for one activity type."""
+        slot = ALL_TYPES if activity_type is None else TYPE_INDEX[str(activity_type)]
+        return self._leaderboards.get(slot, [])
+
+    def save(self):
+        """Write the aggregates to the snapshot file, replacing it atomically."""
+        directory = os.path.dirname(self.snapshot_path)
+        os.makedirs(directory, exist_ok=True)
+        weeks = [
+            (week.toordinal(), slot, user_id, minutes)
+            for week, slots in self.week_minutes.items()
+            for slot, totals in enumerate(slots)
+            for user_id, minutes in totals.items()
+        ]
+        handle, temporary_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as snapshot_file:
+                np.savez(
+                    snapshot_file,
+                    watermark=self.watermark,
+                    samples=self.samples,
+                    weeks=np.array(weeks, dtype=np.int64).reshape(-1, 4),
+                    **{metric: sketch.counts for metric, sketch in self.sketches.items()}
+                )
+            os.replace(temporary_path, self.snapshot_path)
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+
+    def load(self):
+        """Replace the aggregates with the snapshot file. Returns False when there is no usable snapshot."""
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return False
+        with np.load(self.snapshot_path) as snapshot:
+            sketches = {}
+            for metric, spec in SKETCH_RANGES.items():
+                counts = snapshot[metric]
+                # Saved with different buckets or bins (e.g. a new activity type); rebuild instead
+                if counts.shape != (BUCKETS, spec[2]):
+                    return False
+                sketches[metric] = PercentileSketch(*spec, counts=counts)
+            week_minutes = {}
+            for week, slot, user_id, minutes in snapshot["weeks"].tolist():
+                slots = week_minutes.setdefault(date.fromordinal(week), [Counter() for _ in range(TYPE_SLOTS)])
+                slots[slot][user_id] = minutes
+            with self._lock:
+                self.reset()
+                self.sketches = sketches
+                self.week_minutes = week_minutes
+                self.watermark = int(snapshot["watermark"])
+                self.samples = int(snapshot["samples"])
+        return True
+
+    def snapshot(self):
+        return {
+            "samples": self.samples,
+            "watermark": self.watermark,
+            "pending_gaps": len(self._gaps),
+            "age_seconds": round((datetime.now() - self.refreshed_at).total_seconds(), 3) if self.refreshed_at else 0.0,
+        }
+
+
+def init_community(app):
+    app.config.setdefault("COMMUNITY_AGGREGATES", True)
+    app.config.setdefault("COMMUNITY_REFRESH_INTERVAL", 60.0)
+    app.config.setdefault("COMMUNITY_LEADERBOARD_SIZE", 10)
+    app.config.setdefault("COMMUNITY_MIN_SAMPLES", 20)
+    app.config.setdefault("COMMUNITY_SNAPSHOT_PATH", os.path.join(app.instance_path, "community.npz"))
+
+    aggregates = CommunityAggregates(
+        app,
+        refresh_interval=app.config["COMMUNITY_REFRESH_INTERVAL"],
+        leaderboard_size=app.config["COMMUNITY_LEADERBOARD_SIZE"],
+        min_samples=app.config["COMMUNITY_MIN_SAMPLES"],
+        snapshot_path=app.config["COMMUNITY_SNAPSHOT_PATH"]
+    )
+
+    @app.cli.group("community")
+    def community():
+        """Maintain the community benchmark and leaderboard aggregates."""
+
+    @community.command("refresh")
+    @click.option("--full", is_flag=True, help="Rebuild from every activity instead of updating the snapshot.")
+    def refresh_command(full):
+        """Bring the aggregate snapshot up to date (run periodically, e.g. from cron)."""
+        start = time.perf_counter()
+        loaded = not full and aggregates.load()
+        rows = aggregates.refresh(full=not loaded)
+        aggregates.save()
+        click.echo(
+            f"{'Updated' if loaded else 'Built'} community aggregates from {rows} activities "
+            f"in {time.perf_counter() - start:.1f} s ({aggregates.samples} samples, up to id {aggregates.watermark})."
+        )
+
+    if not app.config["COMMUNITY_AGGREGATES"]:
+        return None
+    app.extensions["community_aggregates"] = aggregates
+    start_in_worker(app, aggregates)
+
+    return aggregates
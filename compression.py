@@ -0,0 +1,217 @@
+import threading
+import zlib
+
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
+from werkzeug.wsgi import ClosingIterator
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DEFAULT_MIMETYPES = (
+    "text/html", "text/css", "text/plain", "text/javascript",
+    "application/javascript", "application/json", "image/svg+xml",
+)
+
+
+class GzipStream:
+    def __init__(self, level):
+        # wbits=31 writes a gzip header and trailer
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliStream:
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class ZstdStream:
+    # ZstdCompressor holds the expensive context; each thread keeps one and reuses it for every response
+    _local = threading.local()
+
+    def __init__(self, level):
+        compressors = getattr(self._local, "compressors", None)
+        if compressors is None:
+            compressors = self._local.compressors = {}
+        compressor = compressors.get(level)
+        if compressor is None:
+            compressor = compressors[level] = zstandard.ZstdCompressor(level=level)
+        self._compressor = compressor.compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+def available_encodings(levels):
+    """Return [(encoding, stream factory)] in order of preference for the installed libraries."""
+    encodings = []
+    if zstandard is not None:
+        encodings.append(("zstd", lambda: ZstdStream(levels["zstd"])))
+    if brotli is not None:
+        encodings.append(("br", lambda: BrotliStream(levels["br"])))
+    encodings.append(("gzip", lambda: GzipStream(levels["gzip"])))
+    return encodings
+
+
+def encoded_etag(etag, encoding):
+    """Give the compressed representation its own validator, e.g. "abc" -> "abc-gzip"."""
+    if not etag.endswith('"'):
+        return etag
+    return etag[:-1] + "-" + encoding + '"'
+
+
+def strip_etag_suffix(header, encoding):
+    """Undo encoded_etag in an If-None-Match header so the application compares its own ETags."""
+    return header.replace("-" + encoding + '"', '"')
+
+
+def compress_body(stream, chunks, flush_each_chunk):
+    for chunk in chunks:
+        if not chunk:
+            continue
+        data = stream.compress(chunk)
+        # Streamed responses flush every chunk so the client is not kept waiting for a full block
+        if flush_each_chunk:
+            data += stream.flush()
+        if data:
+            yield data
+    yield stream.finish()
+
+
+class CompressionMiddleware:
+    """
+    WSGI middleware that compresses responses with zstd, brotli or gzip.
+
+    Only responses with an allowlisted content type, no existing Content-Encoding and (when the
+    length is known) at least `min_size` bytes are compressed. Responses without a Content-Length
+    are compressed chunk by chunk as they are produced.
+    """
+
+    def __init__(self, wsgi_app, min_size=500, mimetypes=DEFAULT_MIMETYPES, levels=None):
+        self.wsgi_app = wsgi_app
+        self.min_size = min_size
+        self.mimetypes = frozenset(mimetypes)
+        self.encodings = available_encodings(levels or {"zstd": 3, "br": 4, "gzip": 6})
+
+    def choose_encoding(self, environ):
+        accept = parse_accept_header(environ.get("HTTP_ACCEPT_ENCODING", ""))
+        for encoding, factory in self.encodings:
+            if accept[encoding]:
+                return encoding, factory
+        return None, None
+
+    def should_compress(self, status, headers):
+        if not status.startswith("200") or "Content-Encoding" in headers:
+            return False
+        if "no-transform" in headers.get("Cache-Control", ""):
+            return False
+        length = headers.get("Content-Length")
+        return length is None or int(length) >= self.min_size
+
+    def is_compressible_type(self, headers):
+        mimetype = headers.get("Content-Type", "").split(";", 1)[0].strip().lower()
+        return mimetype in self.mimetypes
+
+    def __call__(self, environ, start_response):
+        encoding, factory = self.choose_encoding(environ)
+        if encoding is None or environ.get("REQUEST_METHOD") == "HEAD":
+            return self.wsgi_app(environ, start_response)
+
+        if_none_match = environ.get("HTTP_IF_NONE_MATCH")
+        if if_none_match:
+            environ["HTTP_IF_NONE_MATCH"] = strip_etag_suffix(if_none_match, encoding)
+        state = {}
+
+        def compressing_start_response(status, response_headers, exc_info=None):
+            headers = Headers(response_headers)
+            # A 304 must repeat the validator the client sent, which named the compressed body
+            if status.startswith("304") and "ETag" in headers and if_none_match != environ["HTTP_IF_NONE_MATCH"]:
+                headers["ETag"] = encoded_etag(headers["ETag"], encoding)
+            if self.is_compressible_type(headers):
+                # Caches must key compressible responses on Accept-Encoding even when left uncompressed
+                vary = headers.get("Vary")
+                if not vary:
+                    headers["Vary"] = "Accept-Encoding"
+                elif "accept-encoding" not in vary.lower():
+                    headers["Vary"] = vary + ", Accept-Encoding"
+
+                if self.should_compress(status, headers):
+                    state["streamed"] = "Content-Length" not in headers
+                    headers.remove("Content-Length")
+                    headers["Content-Encoding"] = encoding
+                    # Byte ranges and validators of the identity body do not apply to the compressed one
+                    headers.remove("Accept-Ranges")
+                    if "ETag" in headers:
+                        headers["ETag"] = encoded_etag(headers["ETag"], encoding)
+            return start_response(status, headers.to_wsgi_list(), exc_info)
+
+        app_iter = self.wsgi_app(environ, compressing_start_response)
+        return ClosingIterator(self.iterate(app_iter, state, factory), getattr(app_iter, "close", None))
+
+    def iterate(self, app_iter, state, factory):
+        iterator = iter(app_iter)
+        # start_response may only run when the first chunk is produced, so peek before deciding
+        try:
+            first = next(iterator)
+        except StopIteration:
+            first = None
+
+        if "streamed" not in state:
+            if first is not None:
+                yield first
+            yield from iterator
+            return
+
+        chunks = iterator if first is None else _prepend(first, iterator)
+        yield from compress_body(factory(), chunks, flush_each_chunk=state["streamed"])
+
+
+def _prepend(first, iterator):
+    yield first
+    yield from iterator
+
+
+def init_compression(app):
+    app.config.setdefault("COMPRESSION_ENABLED", True)
+    app.config.setdefault("COMPRESSION_MIN_SIZE", 500)
+    app.config.setdefault("COMPRESSION_MIMETYPES", DEFAULT_MIMETYPES)
+    app.config.setdefault("COMPRESSION_LEVELS", {"zstd": 3, "br": 4, "gzip": 6})
+
+    if app.config["COMPRESSION_ENABLED"]:
+        app.wsgi_app = CompressionMiddleware(
+            app.wsgi_app,
+            min_size=app.config["COMPRESSION_MIN_SIZE"],
+            mimetypes=app.config["COMPRESSION_MIMETYPES"],
+            levels=app.config["COMPRESSION_LEVELS"]
+        )
@@ -1,6 +1,101 @@
 import os
 
+
+def env_int(name, default=None):
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    return int(value)
+
+
+def env_bool(name, default=False):
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+def engine_options_from_env():
+    """Build SQLALCHEMY_ENGINE_OPTIONS from DB_POOL_* environment variables."""
+    options = {
+        # Test connections on checkout so MySQL "gone away" errors never reach a route
+        "pool_pre_ping": env_bool("DB_POOL_PRE_PING", True),
+        # Recycle connections before MySQL's wait_timeout closes them server-side
+        "pool_recycle": env_int("DB_POOL_RECYCLE", 280),
+    }
+
+    # Only pass sizing options that were set, so SQLite's pools keep their own defaults
+    for option, env_name in (
+        ("pool_size", "DB_POOL_SIZE"),
+        ("max_overflow", "DB_MAX_OVERFLOW"),
+        ("pool_timeout", "DB_POOL_TIMEOUT"),
+    ):
+        value = env_int(env_name)
+        if value is not None:
+            options[option] = value
+
+    return options
+
+
+def replica_binds_from_env():
+    """SQLALCHEMY_BINDS entries (replica_0, replica_1, ...) for the comma-separated DATABASE_REPLICA_URLS."""
+    urls = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+    return {f"replica_{index}": url for index, url in enumerate(urls)}
+
+
 class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    SECRET_KEY = os.getenv("SECRET_KEY")
\ No newline at end of file
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options_from_env()
+    # Read replicas for GET requests (see replicas.py)
+    SQLALCHEMY_BINDS = replica_binds_from_env()
+    REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG") or 5.0)
+    REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL") or 5.0)
+    SECRET_KEY = os.getenv("SECRET_KEY")
+
+    # Per-request SQL instrumentation
+    SQL_SERVER_TIMING = env_bool("SQL_SERVER_TIMING", True)
+    SQL_DEBUG_PANEL = env_bool("SQL_DEBUG_PANEL", False)
+    SQL_SLOW_QUERY_COUNT = env_int("SQL_SLOW_QUERY_COUNT", 5)
+    SQL_N_PLUS_ONE_THRESHOLD = env_int("SQL_N_PLUS_ONE_THRESHOLD", 5)
+
+    # Request profiling (see `flask profile-token`)
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE") or 0)
+    PROFILE_MAX_FILES = env_int("PROFILE_MAX_FILES", 50)
+
+    # Write-behind ingestion for /activity submissions (see ingestion.py)
+    ACTIVITY_WRITE_BEHIND = env_bool("ACTIVITY_WRITE_BEHIND", False)
+    ACTIVITY_BATCH_SIZE = env_int("ACTIVITY_BATCH_SIZE", 200)
+    ACTIVITY_FLUSH_INTERVAL = float(os.getenv("ACTIVITY_FLUSH_INTERVAL") or 0.5)
+    ACTIVITY_BUFFER_SIZE = env_int("ACTIVITY_BUFFER_SIZE", 5000)
+    ACTIVITY_JOURNAL_FSYNC = env_bool("ACTIVITY_JOURNAL_FSYNC", False)
+
+    # Activities older than this many days are moved to activity_archive by `flask archive-activities`
+    ACTIVITY_ARCHIVE_AFTER_DAYS = env_int("ACTIVITY_ARCHIVE_AFTER_DAYS", 365)
+
+    # In-memory peer percentiles and weekly leaderboards (see community.py)
+    COMMUNITY_AGGREGATES = env_bool("COMMUNITY_AGGREGATES", True)
+    COMMUNITY_REFRESH_INTERVAL = float(os.getenv("COMMUNITY_REFRESH_INTERVAL") or 60.0)
+    COMMUNITY_MIN_SAMPLES = env_int("COMMUNITY_MIN_SAMPLES", 20)
+
+    # Precomputed workout recommendations (see recommendations.py)
+    RECOMMENDATIONS_ENABLED = env_bool("RECOMMENDATIONS_ENABLED", True)
+    RECOMMENDATION_REFRESH_INTERVAL = float(os.getenv("RECOMMENDATION_REFRESH_INTERVAL") or 86400.0)
+
+    # Per-endpoint concurrency limits, load shedding and per-user rate limits (see admission.py)
+    ADMISSION_CONTROL = env_bool("ADMISSION_CONTROL", True)
+    ADMISSION_RETRY_AFTER = env_int("ADMISSION_RETRY_AFTER", 2)
+    RATE_LIMITS_ENABLED = env_bool("RATE_LIMITS_ENABLED", True)
+    # Reverse proxies in front of the app whose X-Forwarded-For is trusted for client addresses
+    TRUSTED_PROXIES = env_int("TRUSTED_PROXIES", 0)
+
+    # Outgoing mail (Flask-Mail) and the contact-form notification outbox (see outbox.py)
+    MAIL_SERVER = os.getenv("MAIL_SERVER", "localhost")
+    MAIL_PORT = env_int("MAIL_PORT", 25)
+    MAIL_USE_TLS = env_bool("MAIL_USE_TLS", False)
+    MAIL_USE_SSL = env_bool("MAIL_USE_SSL", False)
+    MAIL_USERNAME = os.getenv("MAIL_USERNAME")
+    MAIL_PASSWORD = os.getenv("MAIL_PASSWORD")
+    MAIL_DEFAULT_SENDER = os.getenv("MAIL_DEFAULT_SENDER", "no-reply@localhost")
+    CONTACT_NOTIFICATION_RECIPIENT = os.getenv("CONTACT_NOTIFICATION_RECIPIENT")
+    OUTBOX_DISPATCH_IN_APP = env_bool("OUTBOX_DISPATCH_IN_APP", True)
@@ -1,3 +1,24 @@
+from flask import current_app, has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Select
 
-db = SQLAlchemy()
\ No newline at end of file
+
+class RoutingSession(Session):
+    """Session that sends plain SELECTs to a read replica when the replica router allows it (see replicas.py)."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context():
+            router = current_app.extensions.get("replica_router")
+            if router is not None:
+                # SELECT ... FOR UPDATE and anything issued while flushing belong on the primary
+                if isinstance(clause, Select) and clause._for_update_arg is None and not self._flushing:
+                    engine = router.read_engine()
+                    if engine is not None:
+                        return engine
+                else:
+                    router.mark_write()
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
@@ -0,0 +1,41 @@
+"""Closed value sets shared by the models, the activity validation and the analytics code."""
+import enum
+
+
+class Choice(str, enum.Enum):
+    """A str-valued enum that renders as its value, so templates and JSON see plain strings."""
+
+    def __str__(self):
+        return self.value
+
+    @classmethod
+    def values(cls):
+        return tuple(member.value for member in cls)
+
+
+class Gender(Choice):
+    MALE = "male"
+    FEMALE = "female"
+    OTHER = "other"
+
+
+class ActivityType(Choice):
+    RUNNING = "running"
+    CYCLING = "cycling"
+    SWIMMING = "swimming"
+    YOGA = "yoga"
+    STEP = "step"
+    COMBAT = "combat"
+    BODYBUILDING = "bodybuilding"
+
+
+class Intensity(Choice):
+    LOW = "low"
+    MODERATE = "moderate"
+    HIGH = "high"
+
+
+class OutboxStatus(Choice):
+    PENDING = "pending"
+    SENT = "sent"
+    DEAD = "dead"
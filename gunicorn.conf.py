@@ -0,0 +1,34 @@
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv("GUNICORN_THREADS", 4))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+
+# Recycle workers periodically to bound memory growth; jitter avoids restarting all at once
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 200))
+
+# Import and warm the app once in the master, then fork workers from it
+preload_app = True
+raw_env = ["WARMUP_DATABASE=false"]
+
+
+def post_fork(server, worker):
+    from background import start_workers
+    from db import db
+    from warmup import open_db_pool
+    from wsgi import app
+
+    # Drop any connections inherited from the master before opening this worker's own pool
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    open_db_pool(app)
+
+    # Start every subsystem's background thread (outbox, replica health, ingestion, aggregates, ...) before
+    # this worker takes traffic; the ingestor replays journals left behind by dead workers on the way. Pool
+    # metrics need no step here: they follow the engines through the dispose above (pool_metrics.py).
+    start_workers(app)
@@ -9,6 +9,9 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 import io
+from concurrent.futures import ThreadPoolExecutor
+
+from request_metrics import timed
 
 # Constant for converting cm to meters
 CM_TO_METERS = 100
@@ -16,6 +19,9 @@ CM_TO_METERS = 100
 # Constant for physically active water intake (40-45 ml per kg)
 AVG_WATER_ML_PER_KG = 40
 
+# Pyplot keeps global state and is not thread-safe, so all charts render on one dedicated thread
+chart_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="charts")
+
 def login_required(f):
     """
     Decorate routes to require login.
@@ -187,6 +193,7 @@ def create_dataframe(weight_data, registered_at_data):
     })
     return df
 
+@timed("weight_plot")
 def generate_weight_plot(df):
     sns.set(style='ticks', font_scale=0.6, rc={'axes.facecolor': '#E6E6FA'})
     plt.figure(figsize=(6, 4))
@@ -236,6 +243,7 @@ def create_bmi_dataframe(bmi_data, registered_at_data):
     })
     return df
 
+@timed("bmi_plot")
 def generate_bmi_plot(df):
     sns.set(style='ticks', font_scale=0.6, rc={'axes.facecolor': '#E6E6FA'})
 
@@ -285,6 +293,13 @@ def create_bmi_plot(user_data):
     return plot_data
 
 
+def render_charts(user_data):
+    """Render the weight and BMI charts on the chart thread and return (weight_plot, bmi_plot)."""
+    weight_plot = chart_executor.submit(create_weight_plot, user_data)
+    bmi_plot = chart_executor.submit(create_bmi_plot, user_data)
+    return weight_plot.result(), bmi_plot.result()
+
+
 def get_latest_bodyfat_and_bodymass(latest_user_activity):
     if latest_user_activity:
         body_fat_percentage = latest_user_activity["body_fat_percentage"]
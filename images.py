@@ -0,0 +1,223 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+from flask import send_from_directory, url_for
+from werkzeug.security import safe_join
+
+from assets import IMMUTABLE_CACHE_CONTROL
+from db import db
+from models import Article, Workout
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Derivative widths in pixels; widths at or above the original's are skipped rather than upscaled
+IMAGE_WIDTHS = (200, 400, 800, 1200)
+
+# (file extension, Pillow format, mimetype, save options), in order of preference for <picture>
+DERIVATIVE_FORMATS = [
+    ("webp", "WEBP", "image/webp", {"quality": 80, "method": 4}),
+    ("jpg", "JPEG", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+]
+
+# Derivatives are written under static/derivatives/ unless IMAGE_DERIVATIVE_DIR says otherwise
+DERIVATIVES_DIR = "derivatives"
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as source_file:
+        for block in iter(lambda: source_file.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()[:20]
+
+
+def derivative_name(digest, width, extension):
+    return f"{digest[:2]}/{digest}-{width}.{extension}"
+
+
+def save_atomically(image, path, image_format, options):
+    """Write to a temporary file first so a concurrent reader (or another worker) never sees a partial image."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    handle, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(handle, "wb") as output_file:
+            image.save(output_file, image_format, **options)
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+
+
+def generate_derivatives(source_path, output_dir, widths=IMAGE_WIDTHS):
+    """
+    Write the resized derivatives of one image that do not exist yet.
+
+    Derivatives are named after a hash of the source file's content, so an unchanged image is
+    never processed twice and identical images share their derivatives.
+
+    Returns ({extension: [(width, name)]}, number of files written).
+    """
+    digest = file_digest(source_path)
+    sources = {extension: [] for extension, _, _, _ in DERIVATIVE_FORMATS}
+    written = 0
+
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)
+        targets = [width for width in widths if width < image.width] or [image.width]
+
+        for width in targets:
+            resized = None
+            for extension, image_format, _, options in DERIVATIVE_FORMATS:
+                name = derivative_name(digest, width, extension)
+                sources[extension].append((width, name))
+                path = os.path.join(output_dir, name)
+                if os.path.exists(path):
+                    continue
+
+                if resized is None:
+                    height = max(round(image.height * width / image.width), 1)
+                    resized = image.resize((width, height), Image.LANCZOS)
+                converted = resized
+                if image_format == "JPEG" and resized.mode != "RGB":
+                    converted = resized.convert("RGB")
+                save_atomically(converted, path, image_format, options)
+                written += 1
+
+    return sources, written
+
+
+class ImagePipeline:
+    """
+    Serve responsive image sources, generating missing derivatives on a background pool.
+
+    Lookups never block a request: an image whose derivatives are not known yet is queued and
+    rendered with its original file until the background job finishes.
+    """
+
+    def __init__(self, static_folder, output_dir, widths=IMAGE_WIDTHS, workers=2):
+        self.static_folder = static_folder
+        self.output_dir = output_dir
+        self.widths = widths
+        # Pillow releases the GIL while resizing and encoding, so threads give real parallelism
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="images")
+        self._ready = {}
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def sources(self, image_path):
+        """Return {extension: [(width, name)]} for an image under static/, or None until it is ready."""
+        if Image is None or not image_path:
+            return None
+        source_path = safe_join(self.static_folder, image_path)
+        if source_path is None:
+            return None
+        try:
+            stat = os.stat(source_path)
+        except OSError:
+            return None
+
+        # Keyed on mtime and size so a replaced file is reprocessed
+        key = (source_path, stat.st_mtime_ns, stat.st_size)
+        try:
+            return self._ready[key]
+        except KeyError:
+            pass
+
+        with self._lock:
+            if key not in self._pending:
+                self._pending.add(key)
+                self.executor.submit(self._generate, key)
+        return None
+
+    def _generate(self, key):
+        source_path = key[0]
+        try:
+            sources, written = generate_derivatives(source_path, self.output_dir, self.widths)
+        except Exception:
+            logger.exception("Could not generate derivatives for %s", source_path)
+            # Remember the failure so the image is not retried on every request
+            sources, written = {}, 0
+        if written:
+            logger.info("Generated %d derivatives for %s", written, source_path)
+        self._ready[key] = sources
+        with self._lock:
+            self._pending.discard(key)
+
+
+def picture_sources(pipeline, image_path):
+    """[(mimetype, srcset)] for a <picture> element, empty while derivatives are unavailable."""
+    sources = pipeline.sources(image_path)
+    if not sources:
+        return []
+    return [
+        (mimetype, ", ".join(
+            f"{url_for('image_derivative', filename=name)} {width}w" for width, name in sources[extension]
+        ))
+        for extension, _, mimetype, _ in DERIVATIVE_FORMATS
+        if sources.get(extension)
+    ]
+
+
+def catalog_image_paths():
+    paths = {path for (path,) in db.session.query(Workout.image_path).distinct()}
+    paths.update(path for (path,) in db.session.query(Article.image_path).distinct())
+    return sorted(paths)
+
+
+def init_images(app):
+    app.config.setdefault("IMAGE_DERIVATIVE_DIR", os.path.join(app.static_folder, DERIVATIVES_DIR))
+    app.config.setdefault("IMAGE_WIDTHS", IMAGE_WIDTHS)
+    app.config.setdefault("IMAGE_WORKERS", 2)
+
+    pipeline = ImagePipeline(
+        app.static_folder,
+        app.config["IMAGE_DERIVATIVE_DIR"],
+        widths=app.config["IMAGE_WIDTHS"],
+        workers=app.config["IMAGE_WORKERS"]
+    )
+    app.extensions["image_pipeline"] = pipeline
+
+    @app.template_global()
+    def image_sources(image_path):
+        return picture_sources(pipeline, image_path)
+
+    @app.route(f"/static/{DERIVATIVES_DIR}/<path:filename>")
+    def image_derivative(filename):
+        response = send_from_directory(pipeline.output_dir, filename)
+        # Names are content hashes, so a derivative never changes
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+    @app.cli.command("backfill-images")
+    def backfill_images_command():
+        """Generate derivatives for every workout and article image."""
+        if Image is None:
+            raise click.ClickException("Pillow is not installed.")
+
+        def backfill(image_path):
+            source_path = safe_join(app.static_folder, image_path)
+            if source_path is None or not os.path.exists(source_path):
+                return image_path, "missing"
+            try:
+                return image_path, generate_derivatives(source_path, pipeline.output_dir, pipeline.widths)[1]
+            except Exception as error:
+                return image_path, f"failed ({error})"
+
+        total = 0
+        for image_path, written in pipeline.executor.map(backfill, catalog_image_paths()):
+            if isinstance(written, str):
+                click.echo(f"{image_path}: {written}")
+            else:
+                total += written
+                click.echo(f"{image_path}: {written} written")
+        click.echo(f"{total} derivatives written to {pipeline.output_dir}")
@@ -0,0 +1,367 @@
+"""
+Write-behind ingestion for activity submissions.
+
+With ACTIVITY_WRITE_BEHIND enabled, /activity validates a submission as usual and then hands the
+row to an in-process buffer instead of committing it itself. A background thread inserts the
+buffered rows in batches of up to ACTIVITY_BATCH_SIZE, at least every ACTIVITY_FLUSH_INTERVAL
+seconds, so one transaction (and one fsync on the database server) covers many submissions.
+
+Rows are appended to a per-process journal before they are acknowledged. A process that dies
+with rows still buffered leaves its journal behind, and the next process to start replays it.
+Replay is at-least-once: a crash between a batch commit and its journal checkpoint inserts that
+batch again.
+"""
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DisconnectionError, InterfaceError, OperationalError, TimeoutError as PoolTimeoutError
+
+from background import BackgroundWorker, lock_file, start_in_worker
+from db import db
+from models import Activity
+from request_metrics import registry
+from user_profiles import save_profiles, split_profile
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_PATTERN = "activity-*.journal"
+DEAD_LETTER_FILE = "activity-dead.jsonl"
+# The database or the connection is unavailable: worth retrying the whole batch later
+TRANSIENT_ERRORS = (OperationalError, InterfaceError, DisconnectionError, PoolTimeoutError)
+
+
+class BufferFull(Exception):
+    """The buffer stayed full for longer than the enqueue timeout."""
+
+
+def encode_row(row):
+    return {key: value.isoformat() if isinstance(value, datetime) else value for key, value in row.items()}
+
+
+def decode_row(row):
+    row = dict(row)
+    row["registered_at"] = datetime.fromisoformat(row["registered_at"])
+    return row
+
+
+class ActivityJournal:
+    """
+    Append-only JSON-lines journal of buffered rows, one file per process.
+
+    Each row line carries its sequence number; a checkpoint line records the highest sequence
+    number committed to the database. The file stays locked while the process is alive.
+    """
+
+    def __init__(self, directory, fsync=False):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"activity-{os.getpid()}.journal")
+        self.fsync = fsync
+        # Unbuffered, so every acknowledged row has reached the OS even if the process is killed
+        self._file = open(self.path, "ab", buffering=0)
+        lock_file(self._file)
+
+    def _write(self, entry):
+        self._file.write(json.dumps(entry, separators=(",", ":")).encode() + b"\n")
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def append(self, sequence, row):
+        self._write({"seq": sequence, "row": encode_row(row)})
+
+    def checkpoint(self, sequence, empty):
+        """Record that rows up to `sequence` are committed; start over when nothing is left buffered."""
+        if empty:
+            self._file.truncate(0)
+        else:
+            self._write({"flushed": sequence})
+
+    def close(self):
+        self._file.close()
+        os.unlink(self.path)
+
+
+def read_journal(journal_file):
+    """Return the rows of a journal that were never checkpointed."""
+    rows = []
+    flushed = 0
+    for line in journal_file:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            # A torn final line from a crash mid-write
+            continue
+        if "flushed" in entry:
+            flushed = max(flushed, entry["flushed"])
+        else:
+            rows.append((entry["seq"], decode_row(entry["row"])))
+    return [row for sequence, row in rows if sequence > flushed]
+
+
+def replay_journals(directory, insert_rows):
+    """Insert the outstanding rows of every journal not held by a live process. Returns the row count."""
+    replayed = 0
+    for path in sorted(glob.glob(os.path.join(directory, JOURNAL_PATTERN))):
+        with open(path, "rb") as journal_file:
+            if not lock_file(journal_file):
+                continue
+            rows = read_journal(journal_file)
+            if rows:
+                insert_rows(rows)
+                replayed += len(rows)
+            os.unlink(path)
+    return replayed
+
+
+class ActivityIngestor(BackgroundWorker):
+    """
+    Bounded buffer of validated Activity rows, flushed by a background thread.
+
+    `submit` blocks for up to `enqueue_timeout` seconds while the buffer holds `capacity` rows,
+    then raises BufferFull so the caller can shed the request instead of queueing without limit.
+    """
+
+    thread_name = "activity-ingestor"
+
+    def __init__(self, app, batch_size=200, flush_interval=0.5, capacity=5000, enqueue_timeout=1.0,
+                 journal_dir=None, fsync=False):
+        super().__init__()
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.capacity = capacity
+        self.enqueue_timeout = enqueue_timeout
+        self.journal_dir = journal_dir
+        self.fsync = fsync
+
+        self._condition = threading.Condition()
+        self._buffer = []
+        self._sequence = 0
+        self._flushed = 0
+        self._flush_requested = False
+        self._journal = None
+
+    def on_start(self, forked):
+        """Replay leftover journals in a new process; a restarted thread carries on with the rows still buffered."""
+        if not forked:
+            return
+        with self._condition:
+            # The buffer inherited over fork belongs to the parent, which flushes it itself
+            self._buffer = []
+            self._sequence = self._flushed = 0
+        if self.journal_dir:
+            replayed = replay_journals(self.journal_dir, self.insert_rows)
+            if replayed:
+                logger.warning("Replayed %d buffered activities from unfinished journals", replayed)
+            self._journal = ActivityJournal(self.journal_dir, self.fsync)
+
+    def submit(self, user_id, values):
+        """Buffer one validated row and return a ticket that `wait_for_ticket` accepts."""
+        self.ensure_started()
+
+        # The row is inserted later, so take its timestamp now rather than at flush time
+        row = dict(values, user_id=user_id, registered_at=datetime.now())
+        deadline = time.monotonic() + self.enqueue_timeout
+        with self._condition:
+            while len(self._buffer) >= self.capacity:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    registry.increment("fitfam_activity_ingest_total", (("result", "rejected"),))
+                    raise BufferFull()
+                self._condition.wait(remaining)
+
+            self._sequence += 1
+            if self._journal is not None:
+                self._journal.append(self._sequence, row)
+            self._buffer.append((self._sequence, row))
+            if len(self._buffer) >= self.batch_size:
+                self._condition.notify_all()
+
+            sequence = self._sequence
+
+        registry.increment("fitfam_activity_ingest_total", (("result", "buffered"),))
+        return [os.getpid(), sequence, time.time()]
+
+    def wait_for(self, sequence, timeout):
+        """Ask for an immediate flush and wait until `sequence` is committed. Returns whether it was."""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            if self._flushed >= sequence:
+                return True
+            self._flush_requested = True
+            self._condition.notify_all()
+            while self._flushed < sequence:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            return True
+
+    def wait_for_ticket(self, ticket, timeout):
+        """
+        Wait until the row behind a ticket from `submit` is committed, for read-your-writes.
+
+        Sequence numbers are per process, so for a row buffered by another worker the best we can
+        do is wait out that worker's flush interval.
+        """
+        pid, sequence, submitted_at = ticket
+        if pid == os.getpid():
+            return self.wait_for(sequence, timeout)
+        delay = min(submitted_at + self.flush_interval - time.time(), timeout)
+        if delay > 0:
+            time.sleep(delay)
+        return False
+
+    def _insert(self, rows):
+        activity_rows = []
+        profiles = {}
+        for row in rows:
+            activity_values, profile_values = split_profile(row)
+            activity_rows.append(activity_values)
+            # The newest submission in the batch wins
+            profiles[row["user_id"]] = profile_values
+        db.session.execute(insert(Activity), activity_rows)
+        save_profiles(profiles)
+        db.session.commit()
+
+    def insert_rows(self, rows):
+        """
+        Insert rows as one multi-row INSERT. When that fails for any reason other than the database
+        being unavailable, the rows are retried one by one and the ones that still fail are dead-lettered.
+        """
+        with self.app.app_context():
+            try:
+                self._insert(rows)
+                return len(rows)
+            except TRANSIENT_ERRORS:
+                db.session.rollback()
+                raise
+            except Exception:
+                db.session.rollback()
+
+            inserted = 0
+            for row in rows:
+                try:
+                    self._insert([row])
+                    inserted += 1
+                except TRANSIENT_ERRORS:
+                    db.session.rollback()
+                    raise
+                except Exception:
+                    db.session.rollback()
+                    logger.exception("Dropping buffered activity for user %s", row.get("user_id"))
+                    self._dead_letter(row)
+                    registry.increment("fitfam_activity_ingest_total", (("result", "dropped"),))
+            return inserted
+
+    def _dead_letter(self, row):
+        """Keep a row the database rejected next to the journals, for inspection or a manual re-insert."""
+        if not self.journal_dir:
+            return
+        try:
+            with open(os.path.join(self.journal_dir, DEAD_LETTER_FILE), "a") as dead_letter_file:
+                dead_letter_file.write(json.dumps(encode_row(row), separators=(",", ":"), default=str) + "\n")
+        except OSError:
+            logger.exception("Could not write dead-lettered activity")
+
+    def _take_batch(self):
+        """Wait until a batch is due and return it (still buffered, so it counts against capacity)."""
+        with self._condition:
+            oldest = time.monotonic()
+            while not self._stopping.is_set():
+                if self._buffer and (
+                    len(self._buffer) >= self.batch_size or self._flush_requested
+                    or time.monotonic() - oldest >= self.flush_interval
+                ):
+                    break
+                if not self._buffer:
+                    oldest = time.monotonic()
+                self._condition.wait(self.flush_interval)
+            self._flush_requested = False
+            return self._buffer[:self.batch_size]
+
+    def _run(self):
+        backoff = self.flush_interval
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return
+
+            start = time.perf_counter()
+            try:
+                inserted = self.insert_rows([row for _, row in batch])
+            except Exception:
+                # Keep the rows buffered (and journaled) and retry once the database is back; poison rows
+                # never get here, insert_rows dead-letters them
+                logger.exception("Could not flush %d buffered activities; retrying", len(batch))
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+                continue
+            backoff = self.flush_interval
+
+            registry.observe("fitfam_span_duration_seconds", (("span", "activity_flush"),), time.perf_counter() - start)
+            registry.increment("fitfam_activity_ingest_total", (("result", "flushed"),), inserted)
+
+            with self._condition:
+                del self._buffer[:len(batch)]
+                self._flushed = batch[-1][0]
+                if self._journal is not None:
+                    self._journal.checkpoint(self._flushed, empty=not self._buffer)
+                self._condition.notify_all()
+
+    def wake(self):
+        with self._condition:
+            self._condition.notify_all()
+
+    def stop(self, timeout=10):
+        """Flush what is buffered and stop the thread; the journal is removed once it is empty."""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        # The thread drains the buffer batch by batch before it sees an empty one and exits
+        super().stop(timeout)
+        with self._condition:
+            if self._journal is not None and not self._buffer:
+                self._journal.close()
+                self._journal = None
+
+    def snapshot(self):
+        with self._condition:
+            return {
+                "buffered": len(self._buffer),
+                "capacity": self.capacity,
+                "last_sequence": self._sequence,
+                "flushed_sequence": self._flushed,
+            }
+
+
+def init_ingestion(app):
+    app.config.setdefault("ACTIVITY_WRITE_BEHIND", False)
+    app.config.setdefault("ACTIVITY_BATCH_SIZE", 200)
+    app.config.setdefault("ACTIVITY_FLUSH_INTERVAL", 0.5)
+    app.config.setdefault("ACTIVITY_BUFFER_SIZE", 5000)
+    app.config.setdefault("ACTIVITY_ENQUEUE_TIMEOUT", 1.0)
+    app.config.setdefault("ACTIVITY_JOURNAL_DIR", os.path.join(app.instance_path, "journal"))
+    app.config.setdefault("ACTIVITY_JOURNAL_FSYNC", False)
+    app.config.setdefault("ACTIVITY_READ_WAIT", 2.0)
+
+    if not app.config["ACTIVITY_WRITE_BEHIND"]:
+        return None
+
+    ingestor = ActivityIngestor(
+        app,
+        batch_size=app.config["ACTIVITY_BATCH_SIZE"],
+        flush_interval=app.config["ACTIVITY_FLUSH_INTERVAL"],
+        capacity=app.config["ACTIVITY_BUFFER_SIZE"],
+        enqueue_timeout=app.config["ACTIVITY_ENQUEUE_TIMEOUT"],
+        journal_dir=app.config["ACTIVITY_JOURNAL_DIR"] or None,
+        fsync=app.config["ACTIVITY_JOURNAL_FSYNC"]
+    )
+    app.extensions["activity_ingestor"] = ingestor
+    start_in_worker(app, ingestor)
+
+    return ingestor
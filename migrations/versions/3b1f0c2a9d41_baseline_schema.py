@@ -0,0 +1,100 @@
+"""Baseline schema: users, workouts, articles, activities and contact messages
+
+Databases created with db.create_all() before migrations existed are at this revision:
+`flask db stamp 3b1f0c2a9d41`, then `flask db upgrade`.
+
+Revision ID: 3b1f0c2a9d41
+Revises:
+Create Date: 2024-07-01 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b1f0c2a9d41'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'user',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(length=64), nullable=False),
+        sa.Column('email', sa.String(length=120), nullable=False),
+        sa.Column('password_hash', sa.String(length=600), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email'),
+        sa.UniqueConstraint('username')
+    )
+    op.create_table(
+        'workout',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('description', sa.Text(), nullable=False),
+        sa.Column('image_path', sa.String(length=100), nullable=False),
+        sa.Column('category', sa.String(length=50), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_workout_category', 'workout', ['category'])
+    op.create_index('idx_workouts_category', 'workout', ['category'])
+    op.create_table(
+        'article',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=100), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('category', sa.String(length=50), nullable=False),
+        sa.Column('image_path', sa.String(length=100), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_article_category', 'article', ['category'])
+    op.create_index('idx_articles_category', 'article', ['category'])
+    op.create_table(
+        'activity',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('age', sa.Integer(), nullable=False),
+        sa.Column('gender', sa.String(length=10), nullable=False),
+        sa.Column('weight', sa.Float(), nullable=False),
+        sa.Column('height', sa.Float(), nullable=False),
+        sa.Column('activity_type', sa.String(length=50), nullable=False),
+        sa.Column('duration', sa.Integer(), nullable=False),
+        sa.Column('intensity', sa.String(length=10), nullable=False),
+        sa.Column('resting_heart_rate', sa.Integer(), nullable=False),
+        sa.Column('exercise_heart_rate', sa.Integer(), nullable=False),
+        sa.Column('body_fat_percentage', sa.Float(), nullable=False),
+        sa.Column('muscle_mass', sa.Float(), nullable=False),
+        sa.Column('water_intake', sa.Float(), nullable=False),
+        sa.Column('registered_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_user_id', 'activity', ['user_id'])
+    op.create_table(
+        'contact',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('email', sa.String(length=100), nullable=False),
+        sa.Column('subject', sa.String(length=200), nullable=False),
+        sa.Column('phone', sa.String(length=20), nullable=False),
+        sa.Column('message', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('contact')
+    op.drop_index('idx_user_id', table_name='activity')
+    op.drop_table('activity')
+    op.drop_index('idx_articles_category', table_name='article')
+    op.drop_index('ix_article_category', table_name='article')
+    op.drop_table('article')
+    op.drop_index('idx_workouts_category', table_name='workout')
+    op.drop_index('ix_workout_category', table_name='workout')
+    op.drop_table('workout')
+    op.drop_table('user')
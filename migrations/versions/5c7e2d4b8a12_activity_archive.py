@@ -0,0 +1,58 @@
+"""Add the compressed activity_archive table
+
+Revision ID: 5c7e2d4b8a12
+Revises: 3b1f0c2a9d41
+Create Date: 2024-07-08 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c7e2d4b8a12'
+down_revision = '3b1f0c2a9d41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'activity_archive',
+        # Keeps the id the row had in the activity table
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('age', sa.Integer(), nullable=False),
+        sa.Column('gender', sa.String(length=10), nullable=False),
+        sa.Column('weight', sa.Float(), nullable=False),
+        sa.Column('height', sa.Float(), nullable=False),
+        sa.Column('activity_type', sa.String(length=50), nullable=False),
+        sa.Column('duration', sa.Integer(), nullable=False),
+        sa.Column('intensity', sa.String(length=10), nullable=False),
+        sa.Column('resting_heart_rate', sa.Integer(), nullable=False),
+        sa.Column('exercise_heart_rate', sa.Integer(), nullable=False),
+        sa.Column('body_fat_percentage', sa.Float(), nullable=False),
+        sa.Column('muscle_mass', sa.Float(), nullable=False),
+        sa.Column('water_intake', sa.Float(), nullable=False),
+        sa.Column('registered_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        # InnoDB compressed pages; ignored by other databases
+        mysql_row_format='COMPRESSED',
+        mysql_key_block_size='8'
+    )
+    op.create_index(
+        'idx_activity_archive_user_registered', 'activity_archive', ['user_id', 'registered_at']
+    )
+
+
+def downgrade():
+    # Archived rows go back to the hot table first, so downgrading loses no history
+    op.execute(
+        'INSERT INTO activity (id, user_id, age, gender, weight, height, activity_type, duration, intensity, '
+        'resting_heart_rate, exercise_heart_rate, body_fat_percentage, muscle_mass, water_intake, registered_at) '
+        'SELECT id, user_id, age, gender, weight, height, activity_type, duration, intensity, '
+        'resting_heart_rate, exercise_heart_rate, body_fat_percentage, muscle_mass, water_intake, registered_at '
+        'FROM activity_archive'
+    )
+    op.drop_index('idx_activity_archive_user_registered', table_name='activity_archive')
+    op.drop_table('activity_archive')
@@ -0,0 +1,109 @@
+"""Move age and gender from activity rows into user_profile
+
+Each user's profile is filled from their latest activity (hot table first, then the archive),
+then the columns are dropped from activity and activity_archive. Height stays on every row, so
+BMI history keeps the height measured with each weight. Downgrading copies each user's age and
+gender back onto all of their rows.
+
+Revision ID: 8d3a6f1e2b57
+Revises: 5c7e2d4b8a12
+Create Date: 2024-07-15 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d3a6f1e2b57'
+down_revision = '5c7e2d4b8a12'
+branch_labels = None
+depends_on = None
+
+ACTIVITY_TABLES = ('activity', 'activity_archive')
+PROFILE_COLUMNS = (
+    ('age', sa.Integer()),
+    ('gender', sa.String(length=10)),
+)
+
+
+def activity_table(name):
+    return sa.table(
+        name,
+        sa.column('id', sa.Integer()),
+        sa.column('user_id', sa.Integer()),
+        sa.column('registered_at', sa.DateTime()),
+        *(sa.column(column, column_type) for column, column_type in PROFILE_COLUMNS)
+    )
+
+
+profile = sa.table(
+    'user_profile',
+    sa.column('user_id', sa.Integer()),
+    sa.column('updated_at', sa.DateTime()),
+    *(sa.column(column, column_type) for column, column_type in PROFILE_COLUMNS)
+)
+
+
+def copy_latest_profiles(table):
+    """Insert a profile for every user without one, from their latest row in `table`."""
+    latest = (
+        sa.select(table.c.user_id, sa.func.max(table.c.id).label('id'))
+        .group_by(table.c.user_id)
+        .subquery()
+    )
+    rows = (
+        sa.select(table.c.user_id, table.c.age, table.c.gender, table.c.registered_at)
+        .join(latest, table.c.id == latest.c.id)
+        .where(table.c.user_id.not_in(sa.select(profile.c.user_id)))
+    )
+    op.execute(profile.insert().from_select(['user_id', 'age', 'gender', 'updated_at'], rows))
+
+
+def upgrade():
+    op.create_table(
+        'user_profile',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('age', sa.Integer(), nullable=False),
+        sa.Column('gender', sa.String(length=10), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+
+    # Hot rows first: they are newer, so the archive only fills in users with no recent activity
+    for name in ACTIVITY_TABLES:
+        copy_latest_profiles(activity_table(name))
+
+    for name in ACTIVITY_TABLES:
+        if op.get_bind().dialect.name == 'mysql':
+            # One ALTER rebuilds the table once
+            op.execute(f'ALTER TABLE {name} ' + ', '.join(f'DROP COLUMN {column}' for column, _ in PROFILE_COLUMNS))
+        else:
+            with op.batch_alter_table(name) as batch_op:
+                for column, _ in PROFILE_COLUMNS:
+                    batch_op.drop_column(column)
+
+
+def downgrade():
+    for name in ACTIVITY_TABLES:
+        with op.batch_alter_table(name) as batch_op:
+            for column, column_type in PROFILE_COLUMNS:
+                batch_op.add_column(sa.Column(column, column_type, nullable=True))
+
+        table = activity_table(name)
+        op.execute(table.update().values({
+            column: sa.select(profile.c[column]).where(profile.c.user_id == table.c.user_id).scalar_subquery()
+            for column, _ in PROFILE_COLUMNS
+        }))
+        missing = op.get_bind().execute(
+            sa.select(sa.func.count()).select_from(table).where(table.c.age.is_(None))
+        ).scalar()
+        if missing:
+            raise RuntimeError(f'{missing} rows in {name} belong to users without a profile; cannot restore NOT NULL')
+
+        with op.batch_alter_table(name) as batch_op:
+            for column, column_type in PROFILE_COLUMNS:
+                batch_op.alter_column(column, existing_type=column_type, nullable=False)
+
+    op.drop_table('user_profile')
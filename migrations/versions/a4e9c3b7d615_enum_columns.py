@@ -0,0 +1,76 @@
+"""Normalize gender, activity_type and intensity and store them as enum columns
+
+Stored values are lowercased and trimmed; the upgrade stops if any value is outside its enum.
+On MySQL the columns become native ENUMs (one byte per row); on SQLite they become VARCHARs as
+long as the longest value. Downgrading restores the original VARCHAR types; the normalization
+itself is kept.
+
+Revision ID: a4e9c3b7d615
+Revises: 8d3a6f1e2b57
+Create Date: 2024-07-22 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4e9c3b7d615'
+down_revision = '8d3a6f1e2b57'
+branch_labels = None
+depends_on = None
+
+GENDERS = ('male', 'female', 'other')
+ACTIVITY_TYPES = ('running', 'cycling', 'swimming', 'yoga', 'step', 'combat', 'bodybuilding')
+INTENSITIES = ('low', 'moderate', 'high')
+
+# table -> [(column, enum name, values, type before this revision)]
+ENUM_COLUMNS = {
+    'activity': [
+        ('activity_type', 'activity_type', ACTIVITY_TYPES, sa.String(length=50)),
+        ('intensity', 'intensity', INTENSITIES, sa.String(length=10)),
+    ],
+    'activity_archive': [
+        ('activity_type', 'activity_type', ACTIVITY_TYPES, sa.String(length=50)),
+        ('intensity', 'intensity', INTENSITIES, sa.String(length=10)),
+    ],
+    'user_profile': [
+        ('gender', 'gender', GENDERS, sa.String(length=10)),
+    ],
+}
+
+
+def upgrade():
+    connection = op.get_bind()
+    for table, columns in ENUM_COLUMNS.items():
+        for column, _, _, _ in columns:
+            op.execute(f'UPDATE {table} SET {column} = LOWER(TRIM({column})) WHERE {column} <> LOWER(TRIM({column}))')
+
+    unknown = {}
+    for table, columns in ENUM_COLUMNS.items():
+        for column, _, values, _ in columns:
+            quoted = ', '.join(f"'{value}'" for value in values)
+            rows = connection.execute(sa.text(
+                f'SELECT {column}, COUNT(*) FROM {table} WHERE {column} NOT IN ({quoted}) GROUP BY {column}'
+            )).all()
+            if rows:
+                unknown[f'{table}.{column}'] = dict(rows)
+    if unknown:
+        details = '; '.join(f'{name}: {values}' for name, values in unknown.items())
+        raise RuntimeError(f'Values outside their enum, fix them first: {details}')
+
+    for table, columns in ENUM_COLUMNS.items():
+        with op.batch_alter_table(table) as batch_op:
+            for column, enum_name, values, old_type in columns:
+                batch_op.alter_column(
+                    column, existing_type=old_type, type_=sa.Enum(*values, name=enum_name), existing_nullable=False
+                )
+
+
+def downgrade():
+    for table, columns in ENUM_COLUMNS.items():
+        with op.batch_alter_table(table) as batch_op:
+            for column, enum_name, values, old_type in columns:
+                batch_op.alter_column(
+                    column, existing_type=sa.Enum(*values, name=enum_name), type_=old_type, existing_nullable=False
+                )
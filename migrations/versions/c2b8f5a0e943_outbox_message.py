@@ -0,0 +1,40 @@
+"""Add the outbox_message table for contact-form notification emails
+
+Revision ID: c2b8f5a0e943
+Revises: a4e9c3b7d615
+Create Date: 2024-07-29 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2b8f5a0e943'
+down_revision = 'a4e9c3b7d615'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'outbox_message',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('recipient', sa.String(length=120), nullable=False),
+        sa.Column('subject', sa.String(length=200), nullable=False),
+        sa.Column('body', sa.Text(), nullable=False),
+        sa.Column('reply_to', sa.String(length=120), nullable=True),
+        sa.Column('status', sa.Enum('pending', 'sent', 'dead', name='outbox_status'), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_outbox_status_next_attempt', 'outbox_message', ['status', 'next_attempt_at'])
+
+
+def downgrade():
+    op.drop_index('idx_outbox_status_next_attempt', table_name='outbox_message')
+    op.drop_table('outbox_message')
@@ -0,0 +1,23 @@
+"""Index activity.registered_at for archiving
+
+Revision ID: e1d6b9f4c820
+Revises: c2b8f5a0e943
+Create Date: 2024-08-05 09:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1d6b9f4c820'
+down_revision = 'c2b8f5a0e943'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('idx_activity_registered_at', 'activity', ['registered_at', 'id'])
+
+
+def downgrade():
+    op.drop_index('idx_activity_registered_at', table_name='activity')
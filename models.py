@@ -4,6 +4,12 @@ from sqlalchemy import func, ForeignKey
 from datetime import datetime
 
 from db import db
+from enums import ActivityType, Gender, Intensity, OutboxStatus
+
+
+def choice_column(choice, name):
+    """A native ENUM on MySQL (one byte per row) holding the enum's lowercase values."""
+    return db.Enum(choice, name=name, values_callable=lambda members: [member.value for member in members])
 
 
 class User(db.Model):
@@ -25,6 +31,19 @@ class User(db.Model):
         return check_password_hash(self.password_hash, password)
     
 
+class UserProfile(db.Model):
+    """Slowly changing personal attributes, one row per user, updated by each activity submission."""
+    __tablename__ = 'user_profile'
+
+    user_id = db.Column(db.Integer, ForeignKey('user.id'), primary_key=True)
+    age = db.Column(db.Integer, nullable=False)
+    gender = db.Column(choice_column(Gender, 'gender'), nullable=False)
+    updated_at = db.Column(db.DateTime, default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<UserProfile of User {self.user_id}>"
+
+
 class Workout(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -57,13 +76,12 @@ Index('idx_articles_category', Article.category)
 class Activity(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, ForeignKey('user.id'), nullable=False)
-    age = db.Column(db.Integer, nullable=False)
-    gender = db.Column(db.String(10), nullable=False)
     weight = db.Column(db.Float, nullable=False)
+    # Measured with the weight, so each BMI point uses the height at that time
     height = db.Column(db.Float, nullable=False)
-    activity_type = db.Column(db.String(50), nullable=False)
+    activity_type = db.Column(choice_column(ActivityType, 'activity_type'), nullable=False)
     duration = db.Column(db.Integer, nullable=False)
-    intensity = db.Column(db.String(10), nullable=False)
+    intensity = db.Column(choice_column(Intensity, 'intensity'), nullable=False)
     resting_heart_rate = db.Column(db.Integer, nullable=False)
     exercise_heart_rate = db.Column(db.Integer, nullable=False)
     body_fat_percentage = db.Column(db.Float, nullable=False)
@@ -76,6 +94,35 @@ class Activity(db.Model):
 
 # Define the index
 Index('idx_user_id', Activity.user_id)
+# Finds the rows past the archive horizon without scanning the table
+Index('idx_activity_registered_at', Activity.registered_at, Activity.id)
+
+
+class ActivityArchive(db.Model):
+    """Activities older than the archive horizon, moved out of the hot table by `flask archive-activities`."""
+    __tablename__ = 'activity_archive'
+    # InnoDB compressed pages; ignored by other databases
+    __table_args__ = {'mysql_row_format': 'COMPRESSED', 'mysql_key_block_size': '8'}
+
+    # Keeps the id the row had in the activity table
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    weight = db.Column(db.Float, nullable=False)
+    height = db.Column(db.Float, nullable=False)
+    activity_type = db.Column(choice_column(ActivityType, 'activity_type'), nullable=False)
+    duration = db.Column(db.Integer, nullable=False)
+    intensity = db.Column(choice_column(Intensity, 'intensity'), nullable=False)
+    resting_heart_rate = db.Column(db.Integer, nullable=False)
+    exercise_heart_rate = db.Column(db.Integer, nullable=False)
+    body_fat_percentage = db.Column(db.Float, nullable=False)
+    muscle_mass = db.Column(db.Float, nullable=False)
+    water_intake = db.Column(db.Float, nullable=False)
+    registered_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f"<ActivityArchive {self.activity_type} by User {self.user_id}>"
+
+Index('idx_activity_archive_user_registered', ActivityArchive.user_id, ActivityArchive.registered_at)
 
 
 class Contact(db.Model):
@@ -88,4 +135,27 @@ class Contact(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     def __repr__(self):
-        return f"<Contact {self.name} - {self.email}>"
\ No newline at end of file
+        return f"<Contact {self.name} - {self.email}>"
+
+
+class OutboxMessage(db.Model):
+    """An email queued in the same transaction as the row it is about, sent later by outbox.OutboxDispatcher."""
+    __tablename__ = 'outbox_message'
+
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    reply_to = db.Column(db.String(120))
+    status = db.Column(choice_column(OutboxStatus, 'outbox_status'), nullable=False, default=OutboxStatus.PENDING)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    # Also pushed forward while a dispatcher holds the message, so no other dispatcher picks it up
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f"<OutboxMessage {self.id} to {self.recipient} ({self.status})>"
+
+Index('idx_outbox_status_next_attempt', OutboxMessage.status, OutboxMessage.next_attempt_at)
@@ -0,0 +1,286 @@
+"""
+Transactional outbox for notification emails.
+
+Views add an OutboxMessage in the same transaction as the row the email is about, so a message
+is queued exactly when that row is committed and SMTP is never on the request path.
+OutboxDispatcher sends queued messages in batches over one persistent SMTP connection.
+
+A claimed message is leased by pushing next_attempt_at forward, so several worker processes
+can dispatch side by side. A failed send is retried with exponential backoff; after
+OUTBOX_MAX_ATTEMPTS the message is dead-lettered (status "dead") until `flask outbox requeue`.
+Delivery is at-least-once: a process that dies mid-batch leaves its messages to be sent again
+once their lease expires.
+"""
+import logging
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask_mail import Mail, Message
+from sqlalchemy import func, update
+
+from background import BackgroundWorker, start_in_worker
+from db import db
+from enums import OutboxStatus
+from models import OutboxMessage
+from request_metrics import registry
+
+logger = logging.getLogger(__name__)
+
+mail = Mail()
+
+# Errors after which the SMTP connection cannot be reused
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError)
+
+
+def queue_contact_notification(contact, recipient):
+    """Add the notification email for a new Contact to the current session; the caller commits."""
+    message = OutboxMessage(
+        recipient=recipient,
+        subject=f"New contact message: {contact.subject}",
+        body=(
+            f"From: {contact.name} <{contact.email}>\n"
+            f"Phone: {contact.phone}\n\n"
+            f"{contact.message}\n"
+        ),
+        reply_to=contact.email
+    )
+    db.session.add(message)
+    return message
+
+
+class OutboxDispatcher(BackgroundWorker):
+    """Drain the outbox in batches from a background thread."""
+
+    thread_name = "outbox-dispatcher"
+
+    def __init__(self, app, batch_size=50, poll_interval=2.0, max_attempts=8, retry_backoff=30.0,
+                 lease=300.0, idle_timeout=30.0):
+        super().__init__()
+        self.app = app
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.lease = lease
+        self.idle_timeout = idle_timeout
+
+        self._wake = threading.Event()
+        self._connection = None
+        self._last_used = 0.0
+        self._backlog = {"pending": 0, "dead": 0, "oldest_pending_age_seconds": 0.0}
+
+
+    def on_start(self, forked):
+        if forked:
+            # A connection inherited over fork shares its socket with the parent
+            self._connection = None
+
+    def notify(self):
+        """Wake the dispatcher after queueing a message instead of waiting for the next poll."""
+        self._wake.set()
+
+    def wake(self):
+        self._wake.set()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                with self.app.app_context():
+                    processed = self.dispatch_batch()
+                    # Keep draining while full batches come back; refresh the backlog gauges once caught up
+                    if processed < self.batch_size:
+                        self._backlog = self.backlog()
+            except Exception:
+                logger.exception("Outbox dispatch failed")
+                processed = 0
+
+            if processed < self.batch_size:
+                if self._connection is not None and time.monotonic() - self._last_used > self.idle_timeout:
+                    self._close_connection()
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+        self._close_connection()
+
+    def due_messages(self, now):
+        """Up to batch_size pending messages due at `now`, locked for this transaction."""
+        return (
+            db.session.query(OutboxMessage)
+            .filter(OutboxMessage.status == OutboxStatus.PENDING, OutboxMessage.next_attempt_at <= now)
+            .order_by(OutboxMessage.next_attempt_at)
+            .limit(self.batch_size)
+            # Other dispatchers skip rows locked here instead of waiting for them
+            .with_for_update(skip_locked=True)
+        )
+
+    def claim(self):
+        """Lease up to batch_size due messages. Returns plain tuples, safe to use after the commit."""
+        now = datetime.utcnow()
+        messages = self.due_messages(now).all()
+        claimed = [
+            (message.id, message.recipient, message.subject, message.body, message.reply_to,
+             message.attempts, message.created_at)
+            for message in messages
+        ]
+        for message in messages:
+            message.next_attempt_at = now + timedelta(seconds=self.lease)
+        db.session.commit()
+        return claimed
+
+    def dispatch_batch(self):
+        """Send one batch of due messages and record the outcomes. Returns the number of messages handled."""
+        claimed = self.claim()
+        if not claimed:
+            return 0
+
+        sent = []
+        failed = []
+        for message_id, recipient, subject, body, reply_to, attempts, created_at in claimed:
+            message = Message(subject, recipients=[recipient], body=body, reply_to=reply_to)
+            try:
+                self._send(message)
+            except Exception as error:
+                failed.append((message_id, attempts + 1, repr(error)))
+                continue
+            sent.append(message_id)
+            registry.observe("fitfam_outbox_lag_seconds", (), (datetime.utcnow() - created_at).total_seconds())
+
+        self._record(sent, failed)
+        return len(claimed)
+
+    def _send(self, message):
+        """Send over the persistent connection, reconnecting once if the server has dropped it."""
+        for attempt in (1, 2):
+            if self._connection is None:
+                self._connection = mail.connect().__enter__()
+            try:
+                self._connection.send(message)
+                self._last_used = time.monotonic()
+                return
+            except CONNECTION_ERRORS:
+                self._connection = None
+                if attempt == 2:
+                    raise
+
+    def _close_connection(self):
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            try:
+                connection.__exit__(None, None, None)
+            except CONNECTION_ERRORS + (smtplib.SMTPException,):
+                pass
+
+    def _record(self, sent, failed):
+        now = datetime.utcnow()
+        if sent:
+            db.session.execute(
+                update(OutboxMessage)
+                .where(OutboxMessage.id.in_(sent))
+                .values(status=OutboxStatus.SENT, sent_at=now, attempts=OutboxMessage.attempts + 1, last_error=None)
+            )
+            registry.increment("fitfam_outbox_messages_total", (("result", "sent"),), len(sent))
+
+        for message_id, attempts, error in failed:
+            if attempts >= self.max_attempts:
+                values = {"status": OutboxStatus.DEAD}
+                result = "dead"
+                logger.error("Outbox message %s dead-lettered after %d attempts: %s", message_id, attempts, error)
+            else:
+                delay = min(self.retry_backoff * 2 ** (attempts - 1), 3600)
+                values = {"next_attempt_at": now + timedelta(seconds=delay)}
+                result = "retried"
+            db.session.execute(
+                update(OutboxMessage)
+                .where(OutboxMessage.id == message_id)
+                .values(attempts=attempts, last_error=error, **values)
+            )
+            registry.increment("fitfam_outbox_messages_total", (("result", result),))
+        db.session.commit()
+
+    def backlog(self):
+        """Pending and dead-lettered message counts, and the age of the oldest pending message."""
+        counts = dict(
+            db.session.query(OutboxMessage.status, func.count())
+            .filter(OutboxMessage.status != OutboxStatus.SENT)
+            .group_by(OutboxMessage.status)
+            .all()
+        )
+        oldest = (
+            db.session.query(func.min(OutboxMessage.created_at))
+            .filter(OutboxMessage.status == OutboxStatus.PENDING)
+            .scalar()
+        )
+        db.session.commit()
+        return {
+            "pending": counts.get(OutboxStatus.PENDING, 0),
+            "dead": counts.get(OutboxStatus.DEAD, 0),
+            "oldest_pending_age_seconds": round((datetime.utcnow() - oldest).total_seconds(), 3) if oldest else 0.0,
+        }
+
+    def snapshot(self):
+        """The backlog as of the dispatcher's last pass, without querying the database."""
+        return dict(self._backlog)
+
+
+def init_outbox(app):
+    app.config.setdefault("CONTACT_NOTIFICATION_RECIPIENT", None)
+    app.config.setdefault("OUTBOX_DISPATCH_IN_APP", True)
+    app.config.setdefault("OUTBOX_BATCH_SIZE", 50)
+    app.config.setdefault("OUTBOX_POLL_INTERVAL", 2.0)
+    app.config.setdefault("OUTBOX_MAX_ATTEMPTS", 8)
+    app.config.setdefault("OUTBOX_RETRY_BACKOFF", 30.0)
+
+    mail.init_app(app)
+    dispatcher = OutboxDispatcher(
+        app,
+        batch_size=app.config["OUTBOX_BATCH_SIZE"],
+        poll_interval=app.config["OUTBOX_POLL_INTERVAL"],
+        max_attempts=app.config["OUTBOX_MAX_ATTEMPTS"],
+        retry_backoff=app.config["OUTBOX_RETRY_BACKOFF"]
+    )
+    app.extensions["outbox_dispatcher"] = dispatcher
+
+    if app.config["CONTACT_NOTIFICATION_RECIPIENT"] and app.config["OUTBOX_DISPATCH_IN_APP"]:
+        start_in_worker(app, dispatcher)
+
+    @app.cli.group("outbox")
+    def outbox():
+        """Inspect and drain the notification email outbox."""
+
+    @outbox.command("dispatch")
+    @click.option("--once", is_flag=True, help="Send what is due and exit instead of polling.")
+    def dispatch_command(once):
+        """Send queued messages from this process (e.g. when OUTBOX_DISPATCH_IN_APP is off)."""
+        total = 0
+        try:
+            while True:
+                processed = dispatcher.dispatch_batch()
+                total += processed
+                if processed < dispatcher.batch_size:
+                    if once:
+                        break
+                    time.sleep(dispatcher.poll_interval)
+        finally:
+            dispatcher._close_connection()
+        click.echo(f"Handled {total} messages.")
+
+    @outbox.command("status")
+    def status_command():
+        """Show the outbox backlog."""
+        for key, value in dispatcher.backlog().items():
+            click.echo(f"{key}: {value}")
+
+    @outbox.command("requeue")
+    def requeue_command():
+        """Move dead-lettered messages back to pending with a fresh attempt count."""
+        result = db.session.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.status == OutboxStatus.DEAD)
+            .values(status=OutboxStatus.PENDING, attempts=0, next_attempt_at=datetime.utcnow())
+        )
+        db.session.commit()
+        click.echo(f"Requeued {result.rowcount} messages.")
+
+    return dispatcher
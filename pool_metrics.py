@@ -0,0 +1,113 @@
+import threading
+import time
+
+from sqlalchemy import event
+
+
+class PoolMetrics:
+    """Connection pool counters collected from SQLAlchemy pool events."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.engine = None
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.in_use = 0
+        self.max_in_use = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self.wait_total += seconds
+            if seconds > self.wait_max:
+                self.wait_max = seconds
+
+    def on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            if self.in_use > self.max_in_use:
+                self.max_in_use = self.in_use
+
+    def on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.checkins += 1
+            self.in_use = max(self.in_use - 1, 0)
+
+    def on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+    def snapshot(self):
+        """Return the current counters as a plain dictionary."""
+        with self._lock:
+            data = {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "in_use": self.in_use,
+                "max_in_use": self.max_in_use,
+                "wait_seconds_total": round(self.wait_total, 6),
+                "wait_seconds_max": round(self.wait_max, 6),
+                "wait_seconds_avg": round(self.wait_total / self.checkouts, 6) if self.checkouts else 0.0,
+            }
+
+        # Read the pool now: engine.dispose() (e.g. after a fork) replaces it.
+        # Only QueuePool (the MySQL default) reports its size and overflow
+        pool = self.engine.pool
+        data["size"] = pool.size() if hasattr(pool, "size") else None
+        data["overflow"] = max(pool.overflow(), 0) if hasattr(pool, "overflow") else None
+        return data
+
+
+def time_checkouts(pool, metrics):
+    """
+    Wrap the pool's acquire step so time spent waiting for a free connection is recorded.
+
+    Pool events only fire once a connection has been handed out, so there is no public hook for
+    the wait itself; the wrapper is reapplied to every pool the engine creates (see instrument_engine).
+    """
+    do_get = pool._do_get
+
+    def timed_do_get():
+        start = time.perf_counter()
+        try:
+            return do_get()
+        finally:
+            metrics.record_wait(time.perf_counter() - start)
+
+    pool._do_get = timed_do_get
+
+
+def instrument_engine(engine, metrics=None):
+    """Attach pool event listeners to an engine and return the metrics object."""
+    if metrics is None:
+        metrics = PoolMetrics()
+
+    metrics.engine = engine
+    time_checkouts(engine.pool, metrics)
+
+    # dispose() swaps in a new pool; the pool listeners below carry over to it, the wrapper does not
+    event.listen(engine, "engine_disposed", lambda disposed: time_checkouts(disposed.pool, metrics))
+    event.listen(engine, "connect", metrics.on_connect)
+    event.listen(engine, "checkout", metrics.on_checkout)
+    event.listen(engine, "checkin", metrics.on_checkin)
+    event.listen(engine, "invalidate", metrics.on_invalidate)
+    return metrics
+
+
+def init_pool_metrics(app, db):
+    """Instrument the app's engine and store the metrics on app.extensions."""
+    with app.app_context():
+        metrics = instrument_engine(db.engine)
+
+    app.extensions["pool_metrics"] = metrics
+    return metrics
@@ -0,0 +1,202 @@
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+import click
+from flask import abort, current_app, render_template, request, send_from_directory
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from werkzeug.wrappers import Request
+
+logger = logging.getLogger(__name__)
+
+# Profile file names: <timestamp>-<path>-<milliseconds>ms.collapsed
+PROFILE_NAME_PATTERN = re.compile(r"^[0-9T_-]+-[A-Za-z0-9_.-]*-\d+ms\.collapsed$")
+
+
+class StackSampler:
+    """Sample one thread's Python stack at a fixed interval and count collapsed stacks."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.counts[";".join(reversed(stack))] += 1
+
+    def collapsed(self):
+        """Return the samples in the collapsed-stack format read by flamegraph tools."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+
+class ProfileStore:
+    """Keep at most `max_files` profiles in a directory, deleting the oldest first."""
+
+    def __init__(self, directory, max_files):
+        self.directory = directory
+        self.max_files = max_files
+        self._lock = threading.Lock()
+
+    def save(self, path, elapsed, collapsed):
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", path.strip("/")) or "index"
+        timestamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S_%f")
+        name = f"{timestamp}-{slug}-{int(elapsed * 1000)}ms.collapsed"
+
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, name), "w") as profile_file:
+                profile_file.write(collapsed)
+
+            # Timestamps sort lexically, so the oldest profiles come first
+            names = self.names()
+            for old_name in names[:max(len(names) - self.max_files, 0)]:
+                try:
+                    os.remove(os.path.join(self.directory, old_name))
+                except FileNotFoundError:
+                    # Workers sharing the directory prune it concurrently; the lock is per process
+                    pass
+        return name
+
+    def names(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name for name in os.listdir(self.directory) if PROFILE_NAME_PATTERN.match(name))
+
+    def entries(self):
+        entries = []
+        for name in reversed(self.names()):
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append({
+                "name": name,
+                "size": stat.st_size,
+                "created_at": datetime.fromtimestamp(stat.st_mtime).strftime("%Y-%m-%d %H:%M:%S")
+            })
+        return entries
+
+
+class ProfilingMiddleware:
+    """
+    WSGI middleware that samples the stack of selected requests.
+
+    A request is profiled when a random draw falls under PROFILE_SAMPLE_RATE, or when it carries
+    a valid signed token in the `profile` query parameter (see `flask profile-token`).
+    """
+
+    def __init__(self, wsgi_app, app, store):
+        self.wsgi_app = wsgi_app
+        self.app = app
+        self.store = store
+
+    def should_profile(self, environ):
+        sample_rate = self.app.config["PROFILE_SAMPLE_RATE"]
+        if sample_rate and random.random() < sample_rate:
+            return True
+
+        token = Request(environ).args.get("profile")
+        return bool(token) and verify_profile_token(self.app, token)
+
+    def __call__(self, environ, start_response):
+        if not self.should_profile(environ):
+            return self.wsgi_app(environ, start_response)
+
+        sampler = StackSampler(threading.get_ident(), self.app.config["PROFILE_INTERVAL"])
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            # Consume the body while sampling so streamed responses are profiled too
+            response = self.wsgi_app(environ, start_response)
+            try:
+                body = list(response)
+            finally:
+                if hasattr(response, "close"):
+                    response.close()
+        finally:
+            sampler.stop()
+            elapsed = time.perf_counter() - start
+            try:
+                self.store.save(environ.get("PATH_INFO", ""), elapsed, sampler.collapsed())
+            except Exception:
+                # A profile is never worth failing the request it describes
+                logger.exception("Could not save the request profile")
+        return body
+
+
+def token_serializer(app):
+    return URLSafeTimedSerializer(app.config["SECRET_KEY"], salt="profile")
+
+
+def make_profile_token(app):
+    return token_serializer(app).dumps("profile")
+
+
+def verify_profile_token(app, token):
+    try:
+        token_serializer(app).loads(token, max_age=app.config["PROFILE_TOKEN_MAX_AGE"])
+    except BadSignature:
+        return False
+    return True
+
+
+def require_profile_token():
+    token = request.args.get("token")
+    if not token or not verify_profile_token(current_app, token):
+        abort(403)
+    return token
+
+
+def init_profiling(app):
+    """Wrap the app with the profiling middleware and register the profile admin routes."""
+    app.config.setdefault("PROFILE_SAMPLE_RATE", 0.0)
+    app.config.setdefault("PROFILE_INTERVAL", 0.005)
+    app.config.setdefault("PROFILE_MAX_FILES", 50)
+    app.config.setdefault("PROFILE_TOKEN_MAX_AGE", 24 * 60 * 60)
+    app.config.setdefault("PROFILE_DIR", os.path.join(app.instance_path, "profiles"))
+
+    store = ProfileStore(app.config["PROFILE_DIR"], app.config["PROFILE_MAX_FILES"])
+    app.wsgi_app = ProfilingMiddleware(app.wsgi_app, app, store)
+    app.extensions["profile_store"] = store
+
+    @app.route("/admin/profiles")
+    def list_profiles():
+        token = require_profile_token()
+        return render_template("profiles.html", profiles=store.entries(), token=token)
+
+    @app.route("/admin/profiles/<name>")
+    def download_profile(name):
+        require_profile_token()
+        if not PROFILE_NAME_PATTERN.match(name):
+            abort(404)
+        return send_from_directory(store.directory, name, as_attachment=True, mimetype="text/plain")
+
+    @app.cli.command("profile-token")
+    def profile_token():
+        """Print a signed token for ?profile=<token> and the /admin/profiles pages."""
+        click.echo(make_profile_token(app))
@@ -0,0 +1,163 @@
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import g, has_request_context, render_template, request
+from sqlalchemy import event
+
+from db import db
+
+
+class QueryStats:
+    """SQL statements issued while handling a single request."""
+
+    def __init__(self, slow_query_count):
+        self.slow_query_count = slow_query_count
+        self.count = 0
+        self.total_time = 0.0
+        self.slowest = []
+        self.statements = Counter()
+
+    def record(self, statement, seconds):
+        self.count += 1
+        self.total_time += seconds
+        self.statements[statement] += 1
+
+        # Keep only the N slowest statements, sorted slowest first
+        self.slowest.append((seconds, statement))
+        self.slowest.sort(key=lambda item: item[0], reverse=True)
+        del self.slowest[self.slow_query_count:]
+
+    def repeated(self, threshold):
+        """Return statements executed at least `threshold` times (likely N+1 queries)."""
+        return [
+            (statement, count)
+            for statement, count in self.statements.most_common()
+            if count >= threshold
+        ]
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start_times = conn.info.get("query_start_time")
+    if not start_times:
+        return
+    elapsed = time.perf_counter() - start_times.pop()
+
+    # Statements run outside a request (CLI commands, migrations) are not tracked
+    if not has_request_context():
+        return
+
+    stats = g.get("query_stats")
+    if stats is None:
+        return
+    stats.record(statement, elapsed)
+
+
+def init_query_metrics(app, db):
+    """Record per-request query counts and timings and report them on each response."""
+    app.config.setdefault("SQL_SERVER_TIMING", True)
+    app.config.setdefault("SQL_DEBUG_PANEL", False)
+    app.config.setdefault("SQL_SLOW_QUERY_COUNT", 5)
+    app.config.setdefault("SQL_N_PLUS_ONE_THRESHOLD", 5)
+
+    with app.app_context():
+        # Every bind, so statements sent to read replicas are counted too
+        for engine in db.engines.values():
+            event.listen(engine, "before_cursor_execute", before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+    @app.before_request
+    def start_query_stats():
+        g.query_stats = QueryStats(app.config["SQL_SLOW_QUERY_COUNT"])
+
+    @app.after_request
+    def report_query_stats(response):
+        stats = g.get("query_stats")
+        if stats is None:
+            return response
+
+        repeated = stats.repeated(app.config["SQL_N_PLUS_ONE_THRESHOLD"])
+        for statement, count in repeated:
+            app.logger.warning(
+                "Possible N+1 query on %s: statement ran %d times: %s",
+                request_endpoint(), count, statement
+            )
+
+        if app.config["SQL_SERVER_TIMING"]:
+            response.headers.add(
+                "Server-Timing",
+                f'db;dur={stats.total_time * 1000:.2f};desc="{stats.count} queries"'
+            )
+
+        if app.config["SQL_DEBUG_PANEL"]:
+            inject_debug_panel(response, stats, repeated)
+
+        return response
+
+
+def request_endpoint():
+    return request.endpoint or request.path
+
+
+def inject_debug_panel(response, stats, repeated):
+    """Append the query panel to complete (non-streamed) HTML responses."""
+    if response.mimetype != "text/html" or response.is_streamed or response.direct_passthrough:
+        return
+
+    panel = render_template(
+        "query_panel.html",
+        count=stats.count,
+        total_ms=stats.total_time * 1000,
+        slowest=[(seconds * 1000, statement) for seconds, statement in stats.slowest],
+        repeated=repeated
+    )
+
+    html = response.get_data(as_text=True)
+    if "</body>" in html:
+        html = html.replace("</body>", panel + "</body>", 1)
+    else:
+        html += panel
+    response.set_data(html)
+
+
+@contextmanager
+def count_queries(*engines):
+    """Collect every statement executed on any of `engines` inside the block."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", record)
+
+
+def assert_query_budget(client, path, max_queries, method="get", **kwargs):
+    """
+    Request `path` with a Flask test client and fail if it issues more than `max_queries` statements.
+
+    Example:
+        assert_query_budget(app.test_client(), "/workouts", 3)
+    """
+    # Every bind, so reads routed to a replica count against the budget too
+    with client.application.app_context():
+        engines = set(db.engines.values())
+
+    with count_queries(*engines) as statements:
+        response = getattr(client, method)(path, **kwargs)
+
+    if len(statements) > max_queries:
+        raise AssertionError(
+            f"{method.upper()} {path} issued {len(statements)} queries "
+            f"(budget {max_queries}):\n" + "\n".join(statements)
+        )
+    return response
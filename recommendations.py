@@ -0,0 +1,395 @@
+"""
+Workout recommendations from each user's recent activity.
+
+Every workout gets a feature vector: its category (one-hot) followed by TF-IDF weights of the
+words in its name and description. A user's vector is built in the same space from their
+activities of the last RECOMMENDATION_HISTORY_DAYS, newer ones weighing more: each activity
+contributes its category affinities and a short query document made from its activity type,
+logged intensity and heart-rate zone.
+
+An activity's vector depends only on (activity type, intensity, heart-rate zone), so the
+batch build counts weighted activities per user over those few combinations and turns the
+counts into cosine scores against every workout with matrix products. The top
+RECOMMENDATION_TOP_K workouts per user are kept in memory, so serving is a dict lookup.
+
+A background thread rebuilds the index every RECOMMENDATION_REFRESH_INTERVAL seconds (default
+nightly), or loads the snapshot that `flask recommendations build` writes when it is newer. Only
+the process holding the snapshot's lock file builds; the other workers wait for its snapshot.
+"""
+import logging
+import math
+import os
+import re
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+import click
+import numpy as np
+from sqlalchemy import String, select, type_coerce
+
+from background import BackgroundWorker, lock_file, start_in_worker
+from db import db
+from enums import ActivityType, Intensity
+from models import Activity, UserProfile, Workout
+from request_metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# How often a worker checks for the snapshot while another process builds it
+SNAPSHOT_POLL_INTERVAL = 5.0
+
+# Words each activity type and intensity adds to a user's query document
+ACTIVITY_TERMS = {
+    ActivityType.RUNNING: "running run jogging cardio endurance",
+    ActivityType.CYCLING: "cycling bike cardio endurance legs",
+    ActivityType.SWIMMING: "swimming swim cardio endurance full body",
+    ActivityType.YOGA: "yoga stretching flexibility balance mobility",
+    ActivityType.STEP: "step aerobics cardio",
+    ActivityType.COMBAT: "combat boxing kickboxing martial arts cardio",
+    ActivityType.BODYBUILDING: "bodybuilding strength muscle weights",
+}
+INTENSITY_TERMS = {
+    Intensity.LOW: "low impact gentle beginner recovery",
+    Intensity.MODERATE: "moderate intermediate",
+    Intensity.HIGH: "high intensity hiit advanced intense",
+}
+# Workout categories each activity type leans towards
+ACTIVITY_CATEGORIES = {
+    ActivityType.RUNNING: ("cardio",),
+    ActivityType.CYCLING: ("cardio",),
+    ActivityType.SWIMMING: ("cardio",),
+    ActivityType.YOGA: ("flexibility", "balance"),
+    ActivityType.STEP: ("cardio",),
+    ActivityType.COMBAT: ("cardio", "strength"),
+    ActivityType.BODYBUILDING: ("strength",),
+}
+# Share of the vector given to the category, the rest goes to the text
+CATEGORY_WEIGHT = 0.5
+
+ACTIVITY_TYPES = list(ActivityType)
+INTENSITIES = list(Intensity)
+TYPE_INDEX = {activity_type.value: index for index, activity_type in enumerate(ACTIVITY_TYPES)}
+INTENSITY_INDEX = {intensity.value: index for index, intensity in enumerate(INTENSITIES)}
+# Exercise heart rate as a share of the age-predicted maximum (220 - age), mapped to an intensity
+ZONE_BOUNDS = (0.6, 0.8)
+COMBINATIONS = len(ACTIVITY_TYPES) * len(INTENSITIES) * len(INTENSITIES)
+
+STOP_WORDS = frozenset(
+    "the and for with your you this that are from into will can all its per our out has have".split()
+)
+TOKEN_PATTERN = re.compile(r"[a-z]{3,}")
+
+
+def tokenize(text):
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOP_WORDS]
+
+
+def normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def combination_index(type_index, intensity_index, zone_index):
+    return (type_index * len(INTENSITIES) + intensity_index) * len(INTENSITIES) + zone_index
+
+
+class WorkoutFeatures:
+    """Category one-hot plus TF-IDF over name and description, one L2-normalized row per workout."""
+
+    def __init__(self, workouts):
+        self.workout_ids = np.array([workout.id for workout in workouts], dtype=np.int64)
+        self.categories = sorted({workout.category.lower() for workout in workouts})
+        self.category_index = {category: index for index, category in enumerate(self.categories)}
+
+        documents = [Counter(tokenize(f"{workout.name} {workout.description}")) for workout in workouts]
+        document_frequency = Counter(term for document in documents for term in document)
+        self.vocabulary = {term: index for index, term in enumerate(sorted(document_frequency))}
+        # Smoothed IDF, as in scikit-learn
+        self.idf = np.array([
+            math.log((1 + len(documents)) / (1 + document_frequency[term])) + 1 for term in sorted(document_frequency)
+        ])
+
+        categories = np.zeros((len(workouts), len(self.categories)))
+        for row, workout in enumerate(workouts):
+            categories[row, self.category_index[workout.category.lower()]] = 1
+        self.matrix = self.combine(categories, self.tfidf(documents))
+
+    def tfidf(self, documents):
+        matrix = np.zeros((len(documents), len(self.vocabulary)))
+        for row, document in enumerate(documents):
+            for term, count in document.items():
+                column = self.vocabulary.get(term)
+                if column is not None:
+                    matrix[row, column] = count
+        return normalize_rows(matrix * self.idf)
+
+    def combine(self, categories, text):
+        return normalize_rows(np.hstack([
+            normalize_rows(categories) * math.sqrt(CATEGORY_WEIGHT),
+            text * math.sqrt(1 - CATEGORY_WEIGHT),
+        ]))
+
+    def combination_vectors(self):
+        """The vector of every (activity type, intensity, heart-rate zone) combination, one row each."""
+        categories = np.zeros((COMBINATIONS, len(self.categories)))
+        documents = []
+        for type_index, activity_type in enumerate(ACTIVITY_TYPES):
+            for intensity_index, intensity in enumerate(INTENSITIES):
+                for zone_index, zone in enumerate(INTENSITIES):
+                    row = combination_index(type_index, intensity_index, zone_index)
+                    for category in ACTIVITY_CATEGORIES[activity_type]:
+                        if category in self.category_index:
+                            categories[row, self.category_index[category]] = 1
+                    documents.append(Counter(tokenize(
+                        f"{ACTIVITY_TERMS[activity_type]} {INTENSITY_TERMS[intensity]} {INTENSITY_TERMS[zone]}"
+                    )))
+        return self.combine(categories, self.tfidf(documents))
+
+
+def heart_rate_zone(exercise_heart_rate, age):
+    """0, 1 or 2 for low, moderate or high effort relative to the age-predicted maximum heart rate."""
+    share = exercise_heart_rate / np.maximum(220 - age, 1)
+    return np.searchsorted(ZONE_BOUNDS, share, side="right")
+
+
+def recent_activities(since):
+    return (
+        select(
+            Activity.user_id,
+            type_coerce(Activity.activity_type, String),
+            type_coerce(Activity.intensity, String),
+            Activity.exercise_heart_rate,
+            UserProfile.age,
+            Activity.registered_at,
+        )
+        .join(UserProfile, UserProfile.user_id == Activity.user_id)
+        .where(Activity.registered_at >= since)
+    )
+
+
+def build_recommendations(workouts, rows, now, top_k, half_life_days, chunk_size=10_000):
+    """{user_id: workout ids, best first} for the users in `rows` (see `recent_activities`)."""
+    if not workouts or not rows:
+        return {}
+    features = WorkoutFeatures(workouts)
+    combination_vectors = features.combination_vectors()
+    # Dot product of every combination with every workout
+    combination_scores = combination_vectors @ features.matrix.T
+
+    user_ids, activity_types, intensities, heart_rates, ages, dates = zip(*rows)
+    type_index = np.fromiter((TYPE_INDEX.get(value, -1) for value in activity_types), np.int64, len(rows))
+    intensity_index = np.fromiter((INTENSITY_INDEX.get(value, -1) for value in intensities), np.int64, len(rows))
+    zone = heart_rate_zone(np.array(heart_rates, dtype=np.float64), np.array(ages, dtype=np.float64))
+    days_ago = np.array([(now - registered_at).total_seconds() / 86400 for registered_at in dates])
+    weight = 0.5 ** (days_ago / half_life_days)
+
+    valid = (type_index >= 0) & (intensity_index >= 0)
+    distinct_users, user_rows = np.unique(np.array(user_ids, dtype=np.int64)[valid], return_inverse=True)
+    combination = combination_index(type_index, intensity_index, zone)[valid]
+    # Weighted activity counts per user and combination
+    counts = np.bincount(
+        user_rows * COMBINATIONS + combination, weights=weight[valid],
+        minlength=len(distinct_users) * COMBINATIONS
+    ).reshape(len(distinct_users), COMBINATIONS)
+
+    top_k = min(top_k, len(workouts))
+    recommendations = {}
+    for start in range(0, len(distinct_users), chunk_size):
+        chunk = counts[start:start + chunk_size]
+        # The user vector is the weighted sum of combination vectors; divide by its norm for cosine
+        norms = np.linalg.norm(chunk @ combination_vectors, axis=1)
+        norms[norms == 0] = 1
+        scores = (chunk @ combination_scores) / norms[:, None]
+        best = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+        order = np.take_along_axis(scores, best, axis=1).argsort(axis=1)[:, ::-1]
+        ranked = features.workout_ids[np.take_along_axis(best, order, axis=1)]
+        for user_id, workout_ids in zip(distinct_users[start:start + chunk_size].tolist(), ranked.tolist()):
+            recommendations[user_id] = tuple(workout_ids)
+    return recommendations
+
+
+def workout_card(workout):
+    return {
+        "id": workout.id,
+        "name": workout.name,
+        "description": workout.description,
+        "image_path": workout.image_path,
+        "category": workout.category,
+    }
+
+
+class RecommendationIndex(BackgroundWorker):
+    """Precomputed top-K workouts per user, rebuilt in the background and served from memory."""
+
+    thread_name = "workout-recommendations"
+
+    def __init__(self, app, top_k=20, history_days=90, half_life_days=14.0, refresh_interval=86400.0,
+                 snapshot_path=None):
+        super().__init__()
+        self.app = app
+        self.top_k = top_k
+        self.history_days = history_days
+        self.half_life_days = half_life_days
+        self.refresh_interval = refresh_interval
+        self.snapshot_path = snapshot_path
+
+        # Replaced whole on every build, so readers never see a half-built index
+        self._recommendations = {}
+        self._workouts = {}
+        self.built_at = None
+        self._loaded_mtime = None
+
+    def _run(self):
+        """Load or build the index, then keep it fresh."""
+        while True:
+            refreshed = True
+            try:
+                with self.app.app_context():
+                    refreshed = self.refresh()
+            except Exception:
+                logger.exception("Could not refresh workout recommendations")
+            if self._stopping.wait(self._until_stale() if refreshed else SNAPSHOT_POLL_INTERVAL):
+                return
+
+    def refresh(self):
+        """
+        Load a newer snapshot, or build and save one while holding the snapshot's lock file.
+
+        Returns False when another process holds the lock, i.e. is building the snapshot this
+        process should wait for.
+        """
+        # A snapshot newer than what is loaded (e.g. from the nightly CLI run) saves a rebuild
+        if self.load():
+            return True
+        if not self.snapshot_path:
+            self.build()
+            return True
+        os.makedirs(os.path.dirname(self.snapshot_path), exist_ok=True)
+        with open(self.snapshot_path + ".lock", "a") as lock:
+            if not lock_file(lock):
+                return False
+            # The previous holder may have saved a snapshot while this process waited
+            if not self.load():
+                self.build()
+                self.save()
+        return True
+
+    def _until_stale(self):
+        if self.built_at is None:
+            return self.refresh_interval
+        return max(self.refresh_interval - (time.time() - self.built_at), 1.0)
+
+    def build(self):
+        """Recompute every user's recommendations. Returns the number of users covered."""
+        start = time.perf_counter()
+        now = datetime.now()
+        workouts = db.session.query(Workout).all()
+        with db.engine.connect() as connection:
+            rows = connection.execute(recent_activities(now - timedelta(days=self.history_days))).all()
+        recommendations = build_recommendations(workouts, rows, now, self.top_k, self.half_life_days)
+
+        self._workouts = {workout.id: workout_card(workout) for workout in workouts}
+        self._recommendations = recommendations
+        self.built_at = time.time()
+        db.session.commit()
+        registry.observe(
+            "fitfam_span_duration_seconds", (("span", "recommendations_build"),), time.perf_counter() - start
+        )
+        return len(recommendations)
+
+    def recommend(self, user_id, category=None, limit=4):
+        """Cached workout cards for a user, best first; empty when the user has no recent activity."""
+        workouts = self._workouts
+        cards = []
+        for workout_id in self._recommendations.get(user_id, ()):
+            card = workouts.get(workout_id)
+            if card is None or (category and card["category"] != category):
+                continue
+            cards.append(card)
+            if len(cards) == limit:
+                break
+        return cards
+
+    def save(self):
+        """Write the index to the snapshot file, replacing it atomically."""
+        directory = os.path.dirname(self.snapshot_path)
+        os.makedirs(directory, exist_ok=True)
+        user_ids = np.array(list(self._recommendations), dtype=np.int64)
+        ranked = np.full((len(user_ids), self.top_k), -1, dtype=np.int64)
+        for row, workout_ids in enumerate(self._recommendations.values()):
+            ranked[row, :len(workout_ids)] = workout_ids
+        handle, temporary_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as snapshot_file:
+                np.savez(snapshot_file, user_ids=user_ids, ranked=ranked)
+            os.replace(temporary_path, self.snapshot_path)
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+        self._loaded_mtime = os.path.getmtime(self.snapshot_path)
+
+    def load(self):
+        """Load the snapshot if it is newer than the current index. Returns whether it was loaded."""
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return False
+        mtime = os.path.getmtime(self.snapshot_path)
+        if mtime == self._loaded_mtime or (self.built_at is not None and mtime <= self.built_at):
+            return False
+        with np.load(self.snapshot_path) as snapshot:
+            recommendations = {
+                user_id: tuple(workout_id for workout_id in workout_ids if workout_id >= 0)
+                for user_id, workout_ids in zip(snapshot["user_ids"].tolist(), snapshot["ranked"].tolist())
+            }
+        # The catalog is small; cards come from the database so they reflect current names and images
+        self._workouts = {workout.id: workout_card(workout) for workout in db.session.query(Workout)}
+        db.session.commit()
+        self._recommendations = recommendations
+        self._loaded_mtime = mtime
+        self.built_at = mtime
+        return True
+
+    def snapshot(self):
+        return {
+            "users": len(self._recommendations),
+            "age_seconds": round(time.time() - self.built_at, 3) if self.built_at else 0.0,
+        }
+
+
+def init_recommendations(app):
+    app.config.setdefault("RECOMMENDATIONS_ENABLED", True)
+    app.config.setdefault("RECOMMENDATION_TOP_K", 20)
+    app.config.setdefault("RECOMMENDATION_HISTORY_DAYS", 90)
+    app.config.setdefault("RECOMMENDATION_HALF_LIFE_DAYS", 14.0)
+    app.config.setdefault("RECOMMENDATION_REFRESH_INTERVAL", 86400.0)
+    app.config.setdefault("RECOMMENDATION_SNAPSHOT_PATH", os.path.join(app.instance_path, "recommendations.npz"))
+
+    index = RecommendationIndex(
+        app,
+        top_k=app.config["RECOMMENDATION_TOP_K"],
+        history_days=app.config["RECOMMENDATION_HISTORY_DAYS"],
+        half_life_days=app.config["RECOMMENDATION_HALF_LIFE_DAYS"],
+        refresh_interval=app.config["RECOMMENDATION_REFRESH_INTERVAL"],
+        snapshot_path=app.config["RECOMMENDATION_SNAPSHOT_PATH"]
+    )
+
+    @app.cli.group("recommendations")
+    def recommendations():
+        """Build the workout recommendation index."""
+
+    @recommendations.command("build")
+    def build_command():
+        """Rebuild every user's recommendations and save the snapshot workers load (run nightly, e.g. from cron)."""
+        start = time.perf_counter()
+        users = index.build()
+        index.save()
+        click.echo(f"Built recommendations for {users} users in {time.perf_counter() - start:.1f} s.")
+
+    if not app.config["RECOMMENDATIONS_ENABLED"]:
+        return None
+    app.extensions["recommendations"] = index
+    start_in_worker(app, index)
+
+    return index
@@ -0,0 +1,184 @@
+"""
+Read-replica routing.
+
+Replica URLs from DATABASE_REPLICA_URLS become SQLAlchemy binds named replica_0, replica_1, ...
+RoutingSession (db.py) asks the ReplicaRouter for an engine whenever it runs a plain SELECT.
+The router hands out a replica only when all of these hold:
+
+- the request is a GET or HEAD;
+- the request has not written anything yet;
+- the user has not made a write request in the last REPLICA_STICKY_SECONDS, so the page shown
+  after a write (e.g. /stats after /activity) reads its own writes from the primary;
+- the replica passed its last health check with at most REPLICA_MAX_LAG seconds of replication lag.
+
+Everything else, including work outside a request such as CLI commands and the background
+ingestion and outbox threads, uses the primary. When no replica qualifies, reads fall back to it.
+"""
+import itertools
+import logging
+import time
+
+import click
+from flask import g, has_request_context, request, session
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError, SQLAlchemyError
+
+from background import BackgroundWorker, start_in_worker
+from db import db
+
+logger = logging.getLogger(__name__)
+
+REPLICA_BIND_PREFIX = "replica_"
+SAFE_METHODS = ("GET", "HEAD")
+
+
+def replication_lag(connection):
+    """Seconds the server behind `connection` is behind its source; 0 when it is not replicating."""
+    if connection.dialect.name == "mysql":
+        # SHOW REPLICA STATUS is MySQL 8.0.22+; older servers only know the SLAVE spelling
+        for statement in ("SHOW REPLICA STATUS", "SHOW SLAVE STATUS"):
+            try:
+                row = connection.execute(text(statement)).mappings().first()
+            except DBAPIError:
+                continue
+            if row is None:
+                return 0.0
+            lag = row.get("Seconds_Behind_Source", row.get("Seconds_Behind_Master"))
+            # NULL means the replication threads are stopped
+            return float("inf") if lag is None else float(lag)
+    connection.execute(text("SELECT 1"))
+    return 0.0
+
+
+class ReplicaRouter(BackgroundWorker):
+    """Track replica health and lag from a background thread and pick the replica for each read."""
+
+    thread_name = "replica-health"
+
+    def __init__(self, app, engines, max_lag=5.0, check_interval=5.0, sticky_seconds=None):
+        super().__init__()
+        self.app = app
+        self.engines = engines
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        # A read after a write must not reach a replica that may not have caught up yet
+        self.sticky_seconds = max_lag + check_interval if sticky_seconds is None else sticky_seconds
+
+        self._status = {name: {"healthy": False, "lag": None} for name in engines}
+        self._available = []
+        self._next = itertools.count()
+
+        for name, engine in engines.items():
+            event.listen(engine, "handle_error", self._on_error(name))
+
+    def _on_error(self, name):
+        def on_error(context):
+            # A lost connection takes the replica out of rotation until the next health check
+            if context.is_disconnect:
+                self._mark(name, healthy=False, lag=None)
+        return on_error
+
+    def on_start(self, forked):
+        # Know which replicas are usable before the first read rather than one interval later
+        self.check()
+
+    def _run(self):
+        while not self._stopping.wait(self.check_interval):
+            self.check()
+
+    def check(self):
+        """Probe every replica and update the set that reads may use."""
+        for name, engine in self.engines.items():
+            try:
+                with engine.connect() as connection:
+                    lag = replication_lag(connection)
+            except SQLAlchemyError as error:
+                if self._status[name]["healthy"]:
+                    logger.warning("Replica %s failed its health check: %s", name, error)
+                self._mark(name, healthy=False, lag=None)
+                continue
+            if lag > self.max_lag and self._status[name]["healthy"]:
+                logger.warning("Replica %s is %.1f s behind; reading from the primary instead", name, lag)
+            self._mark(name, healthy=True, lag=lag)
+
+    def _mark(self, name, healthy, lag):
+        self._status[name] = {"healthy": healthy, "lag": lag}
+        # Rebuilt as a new list so read_engine never sees it half-updated
+        self._available = [
+            self.engines[key] for key, status in self._status.items()
+            if status["healthy"] and status["lag"] <= self.max_lag
+        ]
+
+    def read_engine(self):
+        """The replica engine for a read in the current request, or None to use the primary."""
+        if not has_request_context() or not g.get("read_from_replica") or g.get("wrote_to_primary"):
+            return None
+        available = self._available
+        if not available:
+            return None
+        return available[next(self._next) % len(available)]
+
+    def mark_write(self):
+        """Send the rest of the current request's reads to the primary."""
+        if has_request_context():
+            g.wrote_to_primary = True
+
+    def snapshot(self):
+        status = dict(self._status)
+        lags = [item["lag"] for item in status.values() if item["healthy"]]
+        return {
+            "configured": len(status),
+            "healthy": sum(1 for item in status.values() if item["healthy"]),
+            "available": len(self._available),
+            "max_lag_seconds": max(lags) if lags else 0.0,
+        }
+
+    def status(self):
+        return {name: dict(item) for name, item in self._status.items()}
+
+
+def init_replicas(app):
+    app.config.setdefault("REPLICA_MAX_LAG", 5.0)
+    app.config.setdefault("REPLICA_CHECK_INTERVAL", 5.0)
+    app.config.setdefault("REPLICA_STICKY_SECONDS", None)
+
+    with app.app_context():
+        engines = {
+            name: engine for name, engine in db.engines.items()
+            if name is not None and name.startswith(REPLICA_BIND_PREFIX)
+        }
+    if not engines:
+        return None
+
+    router = ReplicaRouter(
+        app, engines,
+        max_lag=app.config["REPLICA_MAX_LAG"],
+        check_interval=app.config["REPLICA_CHECK_INTERVAL"],
+        sticky_seconds=app.config["REPLICA_STICKY_SECONDS"]
+    )
+    app.extensions["replica_router"] = router
+    start_in_worker(app, router)
+
+    @app.before_request
+    def choose_read_database():
+        g.read_from_replica = (
+            request.method in SAFE_METHODS and session.get("read_primary_until", 0) <= time.time()
+        )
+
+    @app.after_request
+    def stick_to_primary_after_write(response):
+        if request.method not in SAFE_METHODS:
+            session["read_primary_until"] = time.time() + router.sticky_seconds
+        return response
+
+    @app.cli.command("replica-status")
+    def replica_status_command():
+        """Check every replica once and show its health and lag."""
+        router.check()
+        for name, status in router.status().items():
+            state = "healthy" if status["healthy"] else "unreachable"
+            lag = "-" if status["lag"] is None else f"{status['lag']:.1f} s"
+            usable = "in rotation" if router.engines[name] in router._available else "not used"
+            click.echo(f"{name}: {state}, lag {lag}, {usable}")
+
+    return router
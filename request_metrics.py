@@ -0,0 +1,235 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import Response, g, request
+from flask.signals import before_render_template, template_rendered
+
+# Histogram bucket upper bounds in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRIC_HELP = {
+    "fitfam_requests_total": ("counter", "Requests handled, by endpoint, method and status."),
+    "fitfam_request_duration_seconds": ("histogram", "Request latency, by endpoint and method."),
+    "fitfam_span_duration_seconds": ("histogram", "Time spent in instrumented sections (db, templates, charts)."),
+    "fitfam_outbox_messages_total": ("counter", "Outbox emails handled, by result (sent, retried, dead)."),
+    "fitfam_outbox_lag_seconds": ("histogram", "Time from queueing an outbox email to sending it."),
+    "fitfam_admission_total": ("counter", "Requests to limited endpoints, by result (admitted, queued, stale, shed)."),
+    "fitfam_admission_wait_seconds": ("histogram", "Time queued requests waited for a slot, by cost class."),
+    "fitfam_rate_limited_total": ("counter", "POSTs rejected by the rate limits, by endpoint and scope (account, address, user)."),
+    "fitfam_activity_ingest_total": ("counter", "Write-behind activity rows, by result (buffered, flushed, rejected, dropped)."),
+}
+
+
+class MetricsRegistry:
+    """
+    Counters and histograms recorded into per-thread stores without locking.
+
+    Each thread writes only to its own store; the stores are merged when /metrics is scraped.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stores = []
+        # Totals folded in from threads that have exited
+        self._retired = {}
+
+    def _store(self):
+        store = getattr(self._local, "store", None)
+        if store is None:
+            store = {}
+            self._local.store = store
+            with self._lock:
+                self._stores.append((threading.current_thread(), store))
+        return store
+
+    def increment(self, name, labels, amount=1):
+        store = self._store()
+        key = (name, labels)
+        store[key] = store.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        store = self._store()
+        key = (name, labels)
+        histogram = store.get(key)
+        if histogram is None:
+            # One count per bucket plus +Inf, then sum and count
+            histogram = store[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        histogram[bisect_left(self.buckets, value)] += 1
+        histogram[-2] += value
+        histogram[-1] += 1
+
+    def _merge_into(self, merged, store):
+        for key, value in store.copy().items():
+            if isinstance(value, list):
+                current = merged.get(key)
+                if current is None:
+                    merged[key] = list(value)
+                else:
+                    for index, item in enumerate(value):
+                        current[index] += item
+            else:
+                merged[key] = merged.get(key, 0) + value
+
+    def collect(self):
+        """Merge every thread's store into one {(name, labels): value} dictionary."""
+        with self._lock:
+            live = []
+            for thread, store in self._stores:
+                if thread.is_alive():
+                    live.append((thread, store))
+                else:
+                    self._merge_into(self._retired, store)
+            self._stores = live
+
+            merged = {}
+            self._merge_into(merged, self._retired)
+        for thread, store in live:
+            self._merge_into(merged, store)
+        return merged
+
+    def render(self):
+        """Render all metrics in the Prometheus text exposition format."""
+        merged = self.collect()
+        lines = []
+        for name in sorted({key[0] for key in merged}):
+            metric_type, help_text = METRIC_HELP.get(name, ("untyped", name))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+
+            for (metric_name, labels), value in sorted(merged.items()):
+                if metric_name != name:
+                    continue
+                if isinstance(value, list):
+                    lines.extend(self._render_histogram(name, labels, value))
+                else:
+                    lines.append(f"{name}{format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def _render_histogram(self, name, labels, histogram):
+        cumulative = 0
+        bounds = [str(bound) for bound in self.buckets] + ["+Inf"]
+        for bound, count in zip(bounds, histogram):
+            cumulative += count
+            yield f"{name}_bucket{format_labels(labels + (('le', bound),))} {cumulative}"
+        yield f"{name}_sum{format_labels(labels)} {histogram[-2]:.6f}"
+        yield f"{name}_count{format_labels(labels)} {histogram[-1]}"
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for key, value in labels
+    )
+    return "{" + pairs + "}"
+
+
+def format_gauges(prefix, values):
+    """Render a dictionary of numbers as Prometheus gauges, skipping unset values."""
+    lines = []
+    for key, value in sorted(values.items()):
+        if value is None:
+            continue
+        name = f"{prefix}_{key}"
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+registry = MetricsRegistry()
+
+
+@contextmanager
+def timed(span):
+    """Record the duration of a block (or decorated function) in the span histogram."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe("fitfam_span_duration_seconds", (("span", span),), time.perf_counter() - start)
+
+
+def init_request_metrics(app):
+    """Register latency hooks, template timing and the /metrics endpoint."""
+
+    @app.before_request
+    def start_request_timer():
+        g.request_start_time = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        start = g.get("request_start_time")
+        if start is None:
+            return response
+
+        endpoint = request.endpoint or "unmatched"
+        registry.observe(
+            "fitfam_request_duration_seconds",
+            (("endpoint", endpoint), ("method", request.method)),
+            time.perf_counter() - start
+        )
+        registry.increment(
+            "fitfam_requests_total",
+            (("endpoint", endpoint), ("method", request.method), ("status", str(response.status_code)))
+        )
+
+        # Database time for the request, as collected by query_metrics
+        query_stats = g.get("query_stats")
+        if query_stats is not None and query_stats.count:
+            registry.observe("fitfam_span_duration_seconds", (("span", "db"),), query_stats.total_time)
+
+        return response
+
+    def start_template_timer(sender, template, context, **extra):
+        g.setdefault("template_start_times", []).append(time.perf_counter())
+
+    def record_template_time(sender, template, context, **extra):
+        start_times = g.get("template_start_times")
+        if start_times:
+            registry.observe(
+                "fitfam_span_duration_seconds",
+                (("span", f"template:{template.name}"),),
+                time.perf_counter() - start_times.pop()
+            )
+
+    before_render_template.connect(start_template_timer, app, weak=False)
+    template_rendered.connect(record_template_time, app, weak=False)
+
+    @app.route("/metrics")
+    def metrics():
+        body = registry.render()
+
+        pool_metrics = app.extensions.get("pool_metrics")
+        if pool_metrics is not None:
+            body += format_gauges("fitfam_db_pool", pool_metrics.snapshot())
+
+        ingestor = app.extensions.get("activity_ingestor")
+        if ingestor is not None:
+            body += format_gauges("fitfam_activity_buffer", ingestor.snapshot())
+
+        router = app.extensions.get("replica_router")
+        if router is not None:
+            body += format_gauges("fitfam_db_replicas", router.snapshot())
+
+        community = app.extensions.get("community_aggregates")
+        if community is not None and community.ready:
+            body += format_gauges("fitfam_community", community.snapshot())
+
+        recommendations = app.extensions.get("recommendations")
+        if recommendations is not None and recommendations.built_at is not None:
+            body += format_gauges("fitfam_recommendations", recommendations.snapshot())
+
+        admission = app.extensions.get("admission")
+        if admission is not None:
+            body += format_gauges("fitfam_admission", admission.snapshot())
+
+        dispatcher = app.extensions.get("outbox_dispatcher")
+        if dispatcher is not None and dispatcher.running:
+            body += format_gauges("fitfam_outbox", dispatcher.snapshot())
+
+        return Response(body, mimetype="text/plain; version=0.0.4")
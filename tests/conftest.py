@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+
+def create_test_app(directory, seeded=True, **overrides):
+    """The app on a SQLite database in `directory`, seeded with a few users unless `seeded` is false."""
+    from app import create_app
+    from benchmarks.seed import seed
+    from config import Config
+
+    class TestConfig(Config):
+        TESTING = True
+        SECRET_KEY = "test-secret-key"
+        SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(directory, "test.db")
+        SQLALCHEMY_BINDS = {}
+        ACTIVITY_JOURNAL_DIR = os.path.join(directory, "journal")
+        # Background refreshes query the same engine, which would blur per-request query counts
+        COMMUNITY_AGGREGATES = False
+        RECOMMENDATIONS_ENABLED = False
+        RATE_LIMITS_ENABLED = False
+
+    for name, value in overrides.items():
+        setattr(TestConfig, name, value)
+
+    app = create_app(TestConfig)
+    if seeded:
+        with app.app_context():
+            seed(users=3, activities_per_user=20, articles=12, workouts=16)
+    return app
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    """The app on a seeded SQLite database, shared by the whole test session."""
+    return create_test_app(tmp_path_factory.mktemp("app"))
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Build apps with config overrides on their own database; their background threads stop afterwards."""
+    apps = []
+
+    def make_app(**overrides):
+        app = create_test_app(tmp_path, **overrides)
+        apps.append(app)
+        return app
+
+    yield make_app
+    for app in apps:
+        for worker in app.extensions["background_workers"]:
+            worker.stop()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def login(client):
+    from benchmarks.seed import BENCH_PASSWORD, bench_username
+
+    response = client.post("/login", data={"username": bench_username(0), "password": BENCH_PASSWORD})
+    assert response.status_code == 302
+    return client
+
+
+@pytest.fixture
+def logged_in_client(client):
+    return login(client)
@@ -0,0 +1,69 @@
+import pytest
+
+from activity_validations import ACTIVITY_FIELDS, validate_activity, validate_activity_batch
+
+
+def valid_form(**overrides):
+    form = {
+        "age": "30",
+        "gender": "male",
+        "weight": "72.5",
+        "height": "180",
+        "activityType": "running",
+        "duration": "45",
+        "intensity": "moderate",
+        "restingHeartRate": "60",
+        "exerciseHeartRate": "150",
+        "bodyFatPercentage": "18.5",
+        "muscleMass": "35",
+        "waterIntake": "2.5",
+    }
+    form.update(overrides)
+    return form
+
+
+def as_columns(forms):
+    return {field.name: [form.get(field.form_key) for form in forms] for field in ACTIVITY_FIELDS}
+
+
+def test_valid_form_passes():
+    values, errors = validate_activity(valid_form())
+    assert errors == {}
+    assert values["duration"] == 45
+    assert values["weight"] == 72.5
+
+
+@pytest.mark.parametrize("form_key, raw, message", [
+    ("duration", "9" * 30, "Duration must be between 1 and 1440."),
+    ("duration", "1441", "Duration must be between 1 and 1440."),
+    ("weight", "1e308", "Weight must be between 20 and 400."),
+    ("height", "500", "Height must be between 50 and 250."),
+    ("bodyFatPercentage", "95", "Body Fat Percentage must be between 2 and 70."),
+    ("muscleMass", "1000", "Muscle Mass must be between 5 and 150."),
+    ("waterIntake", "50", "Water Intake must be between 0.1 and 20."),
+    ("duration", "5.0", "Duration must be a whole number."),
+    ("weight", "nan", "Weight must be a number."),
+    ("weight", "-70", "Weight must be positive."),
+])
+def test_out_of_bounds_values_are_rejected(form_key, raw, message):
+    field = next(field for field in ACTIVITY_FIELDS if field.form_key == form_key)
+    _, errors = validate_activity(valid_form(**{form_key: raw}))
+    assert errors == {field.name: message}
+
+
+def test_every_numeric_field_has_an_upper_bound():
+    for field in ACTIVITY_FIELDS:
+        if field.kind is not str:
+            assert field.maximum is not None, field.name
+
+
+@pytest.mark.parametrize("raw", ["5.0", "1e2", "9" * 30, "abc", "", "-5", "1441", "+5", " 45 "])
+def test_batch_matches_single_record(raw):
+    forms = [valid_form(), valid_form(duration=raw)]
+    _, batch_errors, valid = validate_activity_batch(as_columns(forms))
+
+    for row, form in enumerate(forms):
+        _, errors = validate_activity(form)
+        row_errors = {name: messages[row] for name, messages in batch_errors.items() if row in messages}
+        assert row_errors == errors
+        assert valid[row] == (not errors)
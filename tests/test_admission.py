@@ -0,0 +1,68 @@
+from admission import RATE_LIMIT_KEYS, RateLimiter, StaleCache
+
+
+def login_attempts(app, limiters, username, address):
+    """Whether a /login POST from `address` for `username` passes every bucket."""
+    with app.test_request_context("/login", method="POST", data={"username": username},
+                                  environ_base={"REMOTE_ADDR": address}):
+        return all(not limiter.hit(RATE_LIMIT_KEYS[scope]()) for scope, limiter in limiters)
+
+
+def test_login_limits_are_per_account_and_address(app):
+    limiters = [("account", RateLimiter(2, 60)), ("address", RateLimiter(5, 60))]
+
+    assert login_attempts(app, limiters, "Alice", "10.0.0.1")
+    assert login_attempts(app, limiters, "alice", "10.0.0.1")
+    assert not login_attempts(app, limiters, "alice", "10.0.0.1")
+    # Someone else guessing at the same account does not lock its owner out
+    assert login_attempts(app, limiters, "alice", "10.0.0.2")
+
+
+def test_login_limits_stop_one_address_spraying_usernames(app):
+    limiters = [("account", RateLimiter(2, 60)), ("address", RateLimiter(5, 60))]
+
+    assert all(login_attempts(app, limiters, f"user{index}", "10.0.0.3") for index in range(5))
+    assert not login_attempts(app, limiters, "user5", "10.0.0.3")
+    assert login_attempts(app, limiters, "user5", "10.0.0.4")
+
+
+def test_stale_cache_is_capped_by_bytes():
+    cache = StaleCache(max_bytes=10)
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    cache.put("a", b"aaa")
+    cache.put("c", b"cccc")
+
+    assert cache.get("b") is None
+    assert cache.get("a")[0] == b"aaa"
+    assert cache.bytes == 7
+
+    # A page larger than the whole cache replaces nothing and is not kept
+    cache.put("a", b"x" * 11)
+    assert cache.get("a") is None
+    assert cache.get("c")[0] == b"cccc"
+    assert cache.bytes == 4
+
+
+def test_shed_stats_serves_the_cached_page_as_stale(app, logged_in_client):
+    with logged_in_client.session_transaction() as session:
+        session["_flashes"] = [("message", ("success", "Activity successfully added."))]
+    fresh = logged_in_client.get("/stats")
+    assert fresh.status_code == 200
+    assert b"We're very busy" not in fresh.data
+    assert b"Activity successfully added." in fresh.data
+
+    limiter = app.extensions["admission"].endpoints["stats"]
+    limit, queue = limiter.limit, limiter.queue
+    limiter.limit = limiter.queue = 0
+    try:
+        stale = logged_in_client.get("/stats")
+    finally:
+        limiter.limit, limiter.queue = limit, queue
+
+    assert stale.status_code == 200
+    assert stale.headers["Warning"] == '110 - "Response is Stale"'
+    assert b"We're very busy" in stale.data
+    # The message was shown once with the fresh page; the cached copy must not repeat it
+    assert b"Activity successfully added." not in stale.data
+    assert b"<!-- flashes -->" not in stale.data
@@ -0,0 +1,57 @@
+import threading
+
+from flask import Flask
+
+from background import BackgroundWorker, init_background, start_in_worker
+
+
+class CountingWorker(BackgroundWorker):
+    thread_name = "counting-worker"
+
+    def __init__(self, fail=False):
+        super().__init__()
+        self.fail = fail
+        self.starts = []
+        self.ran = threading.Event()
+
+    def on_start(self, forked):
+        self.starts.append(forked)
+
+    def _run(self):
+        self.ran.set()
+        # A failing thread ends without being asked to stop
+        if not self.fail:
+            self._stopping.wait()
+
+
+def test_registered_workers_start_once_per_process():
+    app = Flask(__name__)
+    init_background(app)
+    worker = start_in_worker(app, CountingWorker())
+    app.add_url_rule("/", "index", lambda: "ok")
+
+    try:
+        client = app.test_client()
+        client.get("/")
+        client.get("/")
+        assert worker.ran.wait(1)
+        assert worker.running
+        assert worker.starts == [True]
+    finally:
+        worker.stop()
+    assert not worker.running
+
+
+def test_ensure_started_restarts_a_dead_thread_without_resetting_state():
+    worker = CountingWorker(fail=True)
+    worker.ensure_started()
+    worker._thread.join(1)
+    assert not worker.running
+
+    worker.fail = False
+    worker.ensure_started()
+    try:
+        assert worker.running
+        assert worker.starts == [True, False]
+    finally:
+        worker.stop()
@@ -0,0 +1,22 @@
+from datetime import datetime
+
+from archival import archive_activities
+from community import CommunityAggregates
+from db import db
+from models import Activity, ActivityArchive
+
+
+def test_full_build_counts_archived_activities(make_app):
+    app = make_app()
+    aggregates = CommunityAggregates(app)
+    with app.app_context():
+        total = db.session.query(Activity).count()
+        # The seeded activities are one a day from 2024-01-01
+        assert archive_activities(datetime(2024, 1, 11)) > 0
+        assert db.session.query(ActivityArchive).count() + db.session.query(Activity).count() == total
+
+        assert aggregates.refresh() == total
+        assert aggregates.samples == total
+        # Increments read only the hot table, so nothing is counted twice
+        assert aggregates.refresh() == 0
+        assert aggregates.samples == total
@@ -0,0 +1,61 @@
+import gzip
+
+import pytest
+from flask import Flask, Response, request
+
+from compression import CompressionMiddleware
+
+LINES = [f"<p>line {number}</p>\n" for number in range(200)]
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+
+    @app.route("/stream")
+    def stream():
+        response = Response((line for line in LINES), mimetype="text/html")
+        response.set_etag("lines")
+        response.headers["Accept-Ranges"] = "bytes"
+        return response
+
+    @app.route("/page")
+    def page():
+        response = Response("".join(LINES), mimetype="text/html")
+        response.set_etag("lines")
+        return response.make_conditional(request)
+
+    app.wsgi_app = CompressionMiddleware(app.wsgi_app)
+    return app.test_client()
+
+
+def test_streamed_response_is_compressed_with_its_own_etag(client):
+    response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert response.headers["ETag"] == '"lines-gzip"'
+    assert "Accept-Ranges" not in response.headers
+    assert "Content-Length" not in response.headers
+    assert gzip.decompress(response.data).decode() == "".join(LINES)
+
+
+def test_uncompressed_response_keeps_its_etag(client):
+    response = client.get("/stream", headers={"Accept-Encoding": "identity"})
+
+    assert "Content-Encoding" not in response.headers
+    assert response.headers["ETag"] == '"lines"'
+    assert response.data.decode() == "".join(LINES)
+
+
+def test_revalidating_the_compressed_etag_returns_not_modified(client):
+    etag = client.get("/page", headers={"Accept-Encoding": "gzip"}).headers["ETag"]
+    assert etag == '"lines-gzip"'
+
+    response = client.get("/page", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+    # A stale validator still gets the full response
+    response = client.get("/page", headers={"Accept-Encoding": "gzip", "If-None-Match": '"other"'})
+    assert response.status_code == 200
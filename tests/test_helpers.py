@@ -0,0 +1,9 @@
+from types import SimpleNamespace
+
+from helpers import calculate_bmi_by_activity
+
+
+def test_bmi_history_uses_each_activity_height():
+    activities = [SimpleNamespace(weight=80, height=200), SimpleNamespace(weight=80, height=160)]
+
+    assert calculate_bmi_by_activity(activities) == [20.0, 31.2]
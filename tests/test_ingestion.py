@@ -0,0 +1,104 @@
+import json
+import os
+import random
+from datetime import datetime
+
+import pytest
+
+from activity_validations import validate_activity
+from benchmarks.run import activity_form
+from ingestion import DEAD_LETTER_FILE, BufferFull, encode_row
+
+# Nothing is flushed until a test asks for it, so the buffer's contents are predictable
+NEVER = 3600.0
+REGISTERED_AT = datetime(2024, 6, 1, 12, 0)
+
+
+@pytest.fixture
+def ingestion_app(make_app):
+    return make_app(ACTIVITY_WRITE_BEHIND=True, ACTIVITY_FLUSH_INTERVAL=NEVER, ACTIVITY_BATCH_SIZE=1000)
+
+
+def activity_values(seed=0):
+    values, errors = validate_activity(activity_form(random.Random(seed)))
+    assert not errors
+    return values
+
+
+def activity_count(app):
+    from db import db
+    from models import Activity
+
+    with app.app_context():
+        return db.session.query(Activity).count()
+
+
+def test_stop_drains_the_buffer_and_removes_the_journal(ingestion_app):
+    ingestor = ingestion_app.extensions["activity_ingestor"]
+    before = activity_count(ingestion_app)
+
+    for seed in range(3):
+        ingestor.submit(1, activity_values(seed))
+    journal_path = ingestor._journal.path
+    assert ingestor.snapshot()["buffered"] == 3
+    assert activity_count(ingestion_app) == before
+
+    ingestor.stop()
+
+    assert activity_count(ingestion_app) == before + 3
+    assert not os.path.exists(journal_path)
+
+
+def test_start_replays_a_dead_workers_journal(ingestion_app):
+    ingestor = ingestion_app.extensions["activity_ingestor"]
+    directory = ingestion_app.config["ACTIVITY_JOURNAL_DIR"]
+    os.makedirs(directory)
+    rows = [dict(activity_values(seed), user_id=1, registered_at=REGISTERED_AT) for seed in range(3)]
+    dead_journal = os.path.join(directory, "activity-999999.journal")
+    with open(dead_journal, "w") as journal_file:
+        for sequence, row in enumerate(rows, 1):
+            journal_file.write(json.dumps({"seq": sequence, "row": encode_row(row)}) + "\n")
+        # The first row was committed before the worker died; the last line was torn mid-write
+        journal_file.write(json.dumps({"flushed": 1}) + "\n")
+        journal_file.write('{"seq": 4, "row": {"user_')
+    before = activity_count(ingestion_app)
+
+    ingestor.ensure_started()
+
+    assert activity_count(ingestion_app) == before + 2
+    assert not os.path.exists(dead_journal)
+
+
+def test_poison_rows_are_dead_lettered_and_the_rest_inserted(ingestion_app):
+    ingestor = ingestion_app.extensions["activity_ingestor"]
+    ingestor.ensure_started()
+    good = dict(activity_values(1), user_id=1, registered_at=REGISTERED_AT)
+    poison = dict(activity_values(2), user_id=1, registered_at=REGISTERED_AT, weight=None)
+    before = activity_count(ingestion_app)
+
+    assert ingestor.insert_rows([good, poison, dict(good)]) == 2
+
+    assert activity_count(ingestion_app) == before + 2
+    with open(os.path.join(ingestion_app.config["ACTIVITY_JOURNAL_DIR"], DEAD_LETTER_FILE)) as dead_letters:
+        dead = [json.loads(line) for line in dead_letters]
+    assert len(dead) == 1
+    assert dead[0]["weight"] is None
+
+
+def test_full_buffer_sheds_submissions_with_503(make_app):
+    from benchmarks.seed import BENCH_PASSWORD, bench_username
+
+    app = make_app(
+        ACTIVITY_WRITE_BEHIND=True, ACTIVITY_FLUSH_INTERVAL=NEVER, ACTIVITY_BATCH_SIZE=1000,
+        ACTIVITY_BUFFER_SIZE=1, ACTIVITY_ENQUEUE_TIMEOUT=0.05
+    )
+    client = app.test_client()
+    client.post("/login", data={"username": bench_username(0), "password": BENCH_PASSWORD})
+
+    assert client.post("/activity", data=activity_form(random.Random(1))).status_code == 302
+    response = client.post("/activity", data=activity_form(random.Random(2)))
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+    with pytest.raises(BufferFull):
+        app.extensions["activity_ingestor"].submit(1, activity_values())
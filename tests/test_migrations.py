@@ -0,0 +1,99 @@
+import os
+
+import pytest
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from flask_migrate import downgrade, upgrade
+from sqlalchemy import inspect, text
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(__file__)), "migrations")
+BASELINE = "3b1f0c2a9d41"
+
+
+@pytest.fixture
+def migration_app(tmp_path):
+    from app import create_app
+    from config import Config
+
+    class MigrationConfig(Config):
+        TESTING = True
+        SECRET_KEY = "test-secret-key"
+        SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(tmp_path, "migrations.db")
+        SQLALCHEMY_BINDS = {}
+        COMMUNITY_AGGREGATES = False
+        RECOMMENDATIONS_ENABLED = False
+
+    return create_app(MigrationConfig)
+
+
+def columns(table):
+    from db import db
+
+    return {column["name"] for column in inspect(db.engine).get_columns(table)}
+
+
+def test_upgrade_matches_models(migration_app):
+    from db import db
+
+    with migration_app.app_context():
+        upgrade(directory=MIGRATIONS)
+        with db.engine.connect() as connection:
+            differences = compare_metadata(MigrationContext.configure(connection), db.metadata)
+    assert differences == []
+
+
+def test_profile_and_enum_migrations_round_trip(migration_app):
+    from db import db
+
+    with migration_app.app_context():
+        upgrade(directory=MIGRATIONS, revision=BASELINE)
+        with db.engine.begin() as connection:
+            connection.execute(text(
+                "INSERT INTO user (id, username, email, password_hash) VALUES (1, 'ann', 'ann@example.com', '-')"
+            ))
+            for activity_id, age, height, activity_type in ((1, 30, 170, "Running "), (2, 31, 172, "YOGA")):
+                connection.execute(text(
+                    "INSERT INTO activity (id, user_id, age, gender, weight, height, activity_type, duration, "
+                    "intensity, resting_heart_rate, exercise_heart_rate, body_fat_percentage, muscle_mass, "
+                    "water_intake, registered_at) VALUES (:id, 1, :age, 'Female', 60, :height, :activity_type, 30, "
+                    "'High', 60, 150, 20, 30, 2, '2024-01-01')"
+                ), {"id": activity_id, "age": age, "height": height, "activity_type": activity_type})
+
+        upgrade(directory=MIGRATIONS)
+        assert not {"age", "gender"} & columns("activity")
+        with db.engine.connect() as connection:
+            assert connection.execute(text("SELECT age, gender FROM user_profile")).one() == (31, "female")
+            # Each activity keeps the height it was measured with
+            assert connection.execute(text("SELECT height FROM activity ORDER BY id")).scalars().all() == [170, 172]
+            assert connection.execute(text("SELECT activity_type FROM activity ORDER BY id")).scalars().all() == [
+                "running", "yoga"
+            ]
+
+        downgrade(directory=MIGRATIONS, revision=BASELINE)
+        assert {"age", "gender", "height"} <= columns("activity")
+        assert not inspect(db.engine).has_table("user_profile")
+        with db.engine.connect() as connection:
+            assert connection.execute(text("SELECT age, gender FROM activity")).all() == [(31, "female")] * 2
+
+        # And forward again from the restored schema
+        upgrade(directory=MIGRATIONS)
+        assert inspect(db.engine).has_table("user_profile")
+
+
+def test_enum_migration_rejects_unknown_values(migration_app):
+    from db import db
+
+    with migration_app.app_context():
+        upgrade(directory=MIGRATIONS, revision="8d3a6f1e2b57")
+        with db.engine.begin() as connection:
+            connection.execute(text(
+                "INSERT INTO user (id, username, email, password_hash) VALUES (1, 'ann', 'ann@example.com', '-')"
+            ))
+            connection.execute(text(
+                "INSERT INTO user_profile (user_id, age, gender) VALUES (1, 30, 'robot')"
+            ))
+        # Flask-Migrate reports the error and exits
+        with pytest.raises(SystemExit):
+            upgrade(directory=MIGRATIONS)
+        with db.engine.connect() as connection:
+            assert connection.execute(text("SELECT version_num FROM alembic_version")).scalar() == "8d3a6f1e2b57"
@@ -0,0 +1,123 @@
+import smtplib
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.dialects import mysql
+
+from enums import OutboxStatus
+
+RETRY_BACKOFF = 30.0
+
+
+@pytest.fixture
+def outbox_app(make_app):
+    return make_app(OUTBOX_RETRY_BACKOFF=RETRY_BACKOFF, OUTBOX_MAX_ATTEMPTS=3)
+
+
+@pytest.fixture
+def dispatcher(outbox_app):
+    with outbox_app.app_context():
+        yield outbox_app.extensions["outbox_dispatcher"]
+
+
+class Sender:
+    """Stands in for the SMTP connection; fails while `error` is set."""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.sent = []
+
+    def __call__(self, message):
+        if self.error is not None:
+            raise self.error
+        self.sent.append(message)
+
+
+def queue(count=1):
+    from db import db
+    from models import OutboxMessage
+
+    messages = [
+        OutboxMessage(recipient="team@example.com", subject=f"Message {index}", body="Hello")
+        for index in range(count)
+    ]
+    db.session.add_all(messages)
+    db.session.commit()
+    return [message.id for message in messages]
+
+
+def message(message_id):
+    from db import db
+    from models import OutboxMessage
+
+    db.session.expire_all()
+    return db.session.get(OutboxMessage, message_id)
+
+
+def make_due(message_id):
+    from db import db
+
+    message(message_id).next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+
+
+def test_claim_leases_messages_and_skips_locked_rows(dispatcher):
+    first, second = queue(2)
+    dispatcher.batch_size = 1
+
+    assert [claimed[0] for claimed in dispatcher.claim()] == [first]
+    leased_until = message(first).next_attempt_at
+    assert leased_until >= datetime.utcnow() + timedelta(seconds=dispatcher.lease - 5)
+    # While leased, the message is not due again; the next claim moves on
+    assert [claimed[0] for claimed in dispatcher.claim()] == [second]
+    assert dispatcher.claim() == []
+
+    statement = str(dispatcher.due_messages(datetime.utcnow()).statement.compile(dialect=mysql.dialect()))
+    assert "FOR UPDATE SKIP LOCKED" in statement
+
+
+def test_failed_sends_back_off_exponentially(dispatcher, monkeypatch):
+    sender = Sender(smtplib.SMTPRecipientsRefused({}))
+    monkeypatch.setattr(dispatcher, "_send", sender)
+    (message_id,) = queue()
+
+    for attempt, delay in ((1, RETRY_BACKOFF), (2, RETRY_BACKOFF * 2)):
+        before = datetime.utcnow()
+        assert dispatcher.dispatch_batch() == 1
+        failed = message(message_id)
+        assert failed.status == OutboxStatus.PENDING
+        assert failed.attempts == attempt
+        assert "SMTPRecipientsRefused" in failed.last_error
+        assert before + timedelta(seconds=delay) <= failed.next_attempt_at <= datetime.utcnow() + timedelta(seconds=delay)
+        # Not due again until the backoff has passed
+        assert dispatcher.dispatch_batch() == 0
+        make_due(message_id)
+
+    sender.error = None
+    assert dispatcher.dispatch_batch() == 1
+    sent = message(message_id)
+    assert sent.status == OutboxStatus.SENT
+    assert sent.attempts == 3
+    assert sent.last_error is None
+    assert [sent_message.subject for sent_message in sender.sent] == ["Message 0"]
+
+
+def test_messages_are_dead_lettered_after_max_attempts_and_requeued(outbox_app, dispatcher, monkeypatch):
+    monkeypatch.setattr(dispatcher, "_send", Sender(smtplib.SMTPDataError(554, b"rejected")))
+    (message_id,) = queue()
+
+    for _ in range(dispatcher.max_attempts):
+        make_due(message_id)
+        dispatcher.dispatch_batch()
+
+    dead = message(message_id)
+    assert dead.status == OutboxStatus.DEAD
+    assert dead.attempts == dispatcher.max_attempts
+    make_due(message_id)
+    assert dispatcher.dispatch_batch() == 0
+    assert dispatcher.backlog()["dead"] == 1
+
+    result = outbox_app.test_cli_runner().invoke(args=["outbox", "requeue"])
+    assert "Requeued 1 messages." in result.output
+    requeued = message(message_id)
+    assert (requeued.status, requeued.attempts) == (OutboxStatus.PENDING, 0)
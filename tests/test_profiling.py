@@ -0,0 +1,34 @@
+from flask import Flask
+from werkzeug.test import Client
+
+from profiling import ProfileStore, ProfilingMiddleware
+
+
+def hello(environ, start_response):
+    start_response("200 OK", [("Content-Type", "text/plain")])
+    return [b"hello"]
+
+
+def test_prune_tolerates_profiles_removed_by_another_worker(tmp_path, monkeypatch):
+    store = ProfileStore(str(tmp_path), max_files=1)
+    names = store.names
+    # Another worker sharing the directory already pruned this one
+    monkeypatch.setattr(store, "names", lambda: ["20240101T000000_000000-gone-1ms.collapsed"] + names())
+
+    name = store.save("/stats", 0.01, "main;stats 1\n")
+
+    assert names() == [name]
+
+
+def test_failed_profile_save_does_not_fail_the_request(tmp_path):
+    app = Flask(__name__)
+    app.config["PROFILE_SAMPLE_RATE"] = 1.0
+    app.config["PROFILE_INTERVAL"] = 0.001
+    not_a_directory = tmp_path / "profiles"
+    not_a_directory.write_text("")
+
+    client = Client(ProfilingMiddleware(hello, app, ProfileStore(str(not_a_directory), max_files=5)))
+    response = client.get("/")
+
+    assert response.status_code == 200
+    assert response.data == b"hello"
@@ -0,0 +1,44 @@
+import random
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from benchmarks.run import activity_form
+from query_metrics import assert_query_budget, count_queries
+
+
+@pytest.mark.parametrize("path, budget", [
+    ("/workouts", 3),
+    ("/workouts?page=2&category=Strength", 3),
+    ("/articles", 2),
+])
+def test_public_page_budgets(client, path, budget):
+    response = assert_query_budget(client, path, budget)
+    assert response.status_code == 200
+
+
+def test_stats_budget(logged_in_client):
+    response = assert_query_budget(logged_in_client, "/stats", 3)
+    assert response.status_code == 200
+
+
+def test_activity_post_budget(logged_in_client):
+    response = assert_query_budget(
+        logged_in_client, "/activity", 3, method="post", data=activity_form(random.Random(42))
+    )
+    assert response.status_code == 302
+
+
+def test_over_budget_fails(client):
+    with pytest.raises(AssertionError, match="budget 1"):
+        assert_query_budget(client, "/workouts", 1)
+
+
+def test_count_queries_covers_every_engine():
+    primary = create_engine("sqlite://")
+    replica = create_engine("sqlite://")
+    with count_queries(primary, replica) as statements:
+        for engine in (primary, replica):
+            with engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+    assert len(statements) == 2
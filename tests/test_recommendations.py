@@ -0,0 +1,38 @@
+import os
+
+import pytest
+
+from background import lock_file
+from recommendations import RecommendationIndex
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+def make_index(app, tmp_path):
+    # The seeded activities are from 2024
+    return RecommendationIndex(app, history_days=100_000, snapshot_path=os.path.join(tmp_path, "recommendations.npz"))
+
+
+def test_only_the_lock_holder_builds_and_the_others_load_its_snapshot(app, tmp_path, monkeypatch):
+    builder, waiter = make_index(app, tmp_path), make_index(app, tmp_path)
+
+    with app.app_context():
+        # Another process is building: wait instead of running a second build
+        with open(builder.snapshot_path + ".lock", "a") as lock:
+            assert lock_file(lock)
+            assert waiter.refresh() is False
+            assert waiter.built_at is None
+
+        assert builder.refresh() is True
+        assert os.path.exists(builder.snapshot_path)
+        assert builder.snapshot()["users"] > 0
+
+        def build():
+            raise AssertionError("the snapshot should have been loaded")
+
+        monkeypatch.setattr(waiter, "build", build)
+        assert waiter.refresh() is True
+        assert waiter._recommendations == builder._recommendations
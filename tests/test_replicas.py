@@ -0,0 +1,98 @@
+import os
+import shutil
+import sqlite3
+
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.exc import OperationalError
+
+import replicas
+
+REPLICA_MARKER = b"Replica copy of"
+
+
+@pytest.fixture
+def replica_app(make_app, tmp_path):
+    """A seeded primary and a copy of it as replica_0, whose article titles say they came from the replica."""
+    replica_path = os.path.join(tmp_path, "replica.db")
+    app = make_app(
+        SQLALCHEMY_BINDS={"replica_0": "sqlite:///" + replica_path},
+        # Health checks run when a test asks for them
+        REPLICA_CHECK_INTERVAL=3600.0
+    )
+    shutil.copy(os.path.join(tmp_path, "test.db"), replica_path)
+    with sqlite3.connect(replica_path) as connection:
+        connection.execute("UPDATE article SET title = 'Replica copy of ' || title")
+    return app
+
+
+def articles_page(client):
+    response = client.get("/articles")
+    assert response.status_code == 200
+    return response.data
+
+
+def test_get_requests_read_from_a_healthy_replica(replica_app):
+    assert REPLICA_MARKER in articles_page(replica_app.test_client())
+    assert replica_app.extensions["replica_router"].status()["replica_0"] == {"healthy": True, "lag": 0.0}
+
+
+def test_lagging_replica_falls_back_to_the_primary(replica_app, monkeypatch):
+    client = replica_app.test_client()
+    router = replica_app.extensions["replica_router"]
+    articles_page(client)
+
+    monkeypatch.setattr(replicas, "replication_lag", lambda connection: router.max_lag + 1)
+    router.check()
+    assert REPLICA_MARKER not in articles_page(client)
+
+    monkeypatch.setattr(replicas, "replication_lag", lambda connection: 0.0)
+    router.check()
+    assert REPLICA_MARKER in articles_page(client)
+
+
+def test_unreachable_replica_falls_back_to_the_primary(replica_app, monkeypatch):
+    client = replica_app.test_client()
+    router = replica_app.extensions["replica_router"]
+    articles_page(client)
+
+    def unreachable(connection):
+        raise OperationalError("SELECT 1", {}, Exception("connection refused"))
+
+    monkeypatch.setattr(replicas, "replication_lag", unreachable)
+    router.check()
+
+    assert router.status()["replica_0"]["healthy"] is False
+    assert REPLICA_MARKER not in articles_page(client)
+
+
+def test_reads_stick_to_the_primary_after_a_write(replica_app):
+    from benchmarks.seed import BENCH_PASSWORD, bench_username
+
+    client = replica_app.test_client()
+    client.post("/login", data={"username": bench_username(0), "password": BENCH_PASSWORD})
+    assert REPLICA_MARKER not in articles_page(client)
+
+    # Once the sticky window has passed, reads go back to the replica
+    with client.session_transaction() as session:
+        session["read_primary_until"] = 0
+    assert REPLICA_MARKER in articles_page(client)
+
+
+def test_reads_after_a_write_in_the_same_request_use_the_primary(replica_app):
+    from flask import g
+
+    from db import db
+    from models import Article
+
+    router = replica_app.extensions["replica_router"]
+    router.check()
+    with replica_app.test_request_context("/articles"):
+        primary, replica = db.engines[None], router.engines["replica_0"]
+        g.read_from_replica = True
+        assert db.session.get_bind(clause=select(Article)) is replica
+        # Locking reads always go to the primary
+        assert db.session.get_bind(clause=select(Article).with_for_update()) is primary
+
+        assert db.session.get_bind(clause=update(Article).values(title="x")) is primary
+        assert db.session.get_bind(clause=select(Article)) is primary
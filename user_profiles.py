@@ -0,0 +1,38 @@
+"""
+Per-user attributes (age, gender) kept in user_profile instead of on every activity.
+
+Height stays on each activity next to the weight it was measured with, so BMI history keeps the
+height in effect at the time.
+
+The activity form still asks for them; each submission updates the user's profile row.
+Existing databases are moved over by the 8d3a6f1e2b57 migration (`flask db upgrade`).
+"""
+from db import db
+from models import UserProfile
+
+PROFILE_FIELDS = ("age", "gender")
+
+
+def split_profile(values):
+    """Split validated activity form values into (activity columns, profile columns)."""
+    activity_values = {key: value for key, value in values.items() if key not in PROFILE_FIELDS}
+    profile_values = {key: values[key] for key in PROFILE_FIELDS if key in values}
+    return activity_values, profile_values
+
+
+def save_profiles(profiles):
+    """Create or update profiles from {user_id: profile values}; the caller commits."""
+    if not profiles:
+        return
+    existing = {
+        profile.user_id: profile
+        for profile in db.session.query(UserProfile).filter(UserProfile.user_id.in_(list(profiles)))
+    }
+    for user_id, values in profiles.items():
+        profile = existing.get(user_id)
+        if profile is None:
+            profile = UserProfile(user_id=user_id)
+            db.session.add(profile)
+        # Unchanged attributes do not produce an UPDATE
+        for key, value in values.items():
+            setattr(profile, key, value)
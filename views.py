@@ -0,0 +1,652 @@
+from flask import(
+    render_template, current_app,
+    request, redirect, 
+    session, flash, url_for, jsonify
+)
+from helpers import(
+    calculate_bmi_and_category, calculate_healthy_weight_range, 
+    render_charts, calculate_weight_difference,
+    calculate_daily_water_intake, login_required, 
+    calculate_healthy_weight_range, validate_confirmation_password, 
+    validate_contact_inputs, validate_email, 
+    validate_password, validate_username
+)
+from activity_validations import validate_activity, error_messages
+from ingestion import BufferFull
+from archival import activity_history
+from user_profiles import save_profiles, split_profile
+from outbox import queue_contact_notification
+
+from models import User, UserProfile, Workout, Article, Activity, Contact
+from sqlalchemy.exc import SQLAlchemyError
+from datetime import datetime
+
+from db import db
+from request_metrics import timed
+
+# Where stale_stats puts its notice into a cached stats page
+STALE_NOTICE_MARKER = b"<!-- stale-notice -->"
+# Where each response from a cached stats page gets the messages flashed for it
+FLASHES_MARKER = b"<!-- flashes -->"
+
+
+# Number of articles to display per page
+ARTICLES_PER_PAGE = 6
+
+# Number of workouts to display per page
+WORKOUTS_PER_PAGE = 8
+
+
+def index():
+    return render_template('index.html')
+
+
+def db_health():
+    # Report connection pool usage for the database engine
+    return jsonify(current_app.extensions["pool_metrics"].snapshot())
+
+
+def login():
+    """Log user in"""
+    if request.method == "POST":
+        # Get login form input data
+        username_or_email = request.form.get("username").lower()
+        password = request.form.get("password")
+
+        # List to store error messages
+        messages = []
+
+        # Ensure username was submitted
+        if not username_or_email:
+            messages.append(("danger", "Username or email is required"))
+
+        # Ensure password was submitted
+        elif not password:
+            messages.append(("danger", "Password is required"))
+
+        if not messages:
+            # Check if the username or email exists in the database
+            user = User.query.filter(
+                (User.username == username_or_email) | (User.email == username_or_email)
+            ).first()
+            
+            # Check if the query returned a valid user and valid password
+            if not user or not user.check_password(password):
+                messages.append(("danger", "Invalid username, email, and/or password"))
+
+        if messages:
+            # Flash the error messages
+            for error in messages:
+                flash(error)
+            return render_template("login.html", messages=messages, username_or_email=username_or_email)
+
+        # Remember which user has logged in
+        session["user_id"] = user.id
+        session["user_username"] = user.username
+
+        # Check if the "Remember Me" checkbox is checked
+        remember_me = request.form.get("remember")
+
+        # Set the permanent session cookie to True if "Remember Me" is checked
+        if remember_me:
+            session.permanent = True
+
+        # Redirect user to the home page
+        return redirect("/")
+
+    # User reached route via GET (as by clicking a link or via redirect)
+    else:
+        return render_template("login.html")
+
+
+def logout():
+    """Log user out"""
+
+    # Forget any user_id
+    session.clear()
+
+    # Redirect user to login form
+    return redirect("/")
+
+
+def register():
+    """Register user"""
+    if request.method == "POST":
+        # Get the register form input data
+        username = request.form.get("username").lower()
+        email = request.form.get("email").lower()
+        password = request.form.get("password")
+        confirmation = request.form.get("confirmation")
+
+        # List to store error messages
+        messages = []
+
+        # Check if username already exists
+        existing_username = User.query.filter_by(username=username).first()
+
+        if existing_username:
+            messages.append(("danger", "Username already taken."))
+
+        # Username validation
+        validate_username(username, messages)
+
+        # Check if email already exists
+        existing_email = User.query.filter_by(email=email).first()
+        if existing_email:
+            messages.append(("danger", "Email already registered."))
+
+        # Email validation
+        validate_email(email, messages)
+
+        # Password validation
+        validate_password(password, messages)
+
+        # Confirmation password validation
+        validate_confirmation_password(password, confirmation, messages)
+
+        if messages:
+            # Flash the error messages
+            for error in messages:
+                flash(error)
+            return render_template(
+                "register.html", messages=messages, 
+                username=username, email=email
+            )
+        else:
+            # Create and insert the new user into the database
+            new_user = User(username=username, email=email)
+            new_user.set_password(password)
+            db.session.add(new_user)
+            db.session.commit()
+
+            # Get the newly registered user's ID
+            new_user = User.query.filter_by(username=username).first()
+
+            if new_user:
+                # Store the ID of the newly registered user in the session for automatic login
+                session["user_id"] = new_user.id
+                session["user_username"] = new_user.username
+
+                messages.append(("success", "Account successfully created."))
+                flash(messages[-1])
+
+                # Redirect the user to the home page
+                return redirect("/")
+            else:
+                messages.append(
+                    ("danger", "An error occurred while creating your account. Please try again.")
+                )
+
+                flash(messages[-1])
+
+                return render_template(
+                    "register.html", messages=messages, 
+                    username=username, email=email
+                )
+    else:
+        return render_template("register.html")
+
+
+@login_required
+def account():
+    # Get the logged-in user from the session
+    user_id = session.get("user_id")
+
+    # Fetch the user from the database using the ORM
+    user = User.query.get(user_id)
+
+    if not user:
+        return flash("danger", "User not found")
+
+    return render_template('account.html', user=user)
+
+
+
+@login_required
+def change_password():
+    # Get the change password form input data
+    user_id = session.get("user_id")
+
+    # List to store error messages
+    messages = []
+
+    if not user_id:
+        messages.append(("danger", "User not found."))
+        flash(messages[-1])
+        return redirect("/")
+
+    if request.method == 'POST':
+        # Handle the password change form submission
+        current_password = request.form.get('current_password')
+        new_password = request.form.get('new_password')
+        confirmation = request.form.get('confirmation')
+
+        # Fetch the user from the database using the ORM
+        user = User.query.get(user_id)
+
+        if not user:
+            messages.append(("danger", "User not found."))
+        elif not user.check_password(current_password):
+            messages.append(("danger", "Current password is incorrect."))
+        else:
+            # Check if new password and confirmation are valid
+            if not new_password:
+                messages.append(("danger", "New Password is required."))
+            else:
+                validate_password(new_password, messages)
+                if new_password == current_password:
+                    messages.append(("danger", "New password must be different from the current password."))
+
+            # Ensure the new password and confirmation match
+            validate_confirmation_password(new_password, confirmation, messages)
+
+            if not messages:
+                # Update the user's password
+                user.set_password(new_password)
+                db.session.commit()
+                messages.append(("success", "Password successfully changed."))
+
+                # Flash the success message
+                flash(messages[-1])
+
+                # Redirect the user to the home page
+                return redirect("/")
+
+        # Flash the error messages
+        for error in messages:
+            flash(error)
+
+    return render_template('change_password.html')
+
+
+
+def workouts():
+    # Get the current page number from the query string, defaulting to 1
+    page = int(request.args.get('page', 1))
+    # Get the selected category from the query string
+    selected_category = request.args.get('category')
+
+    # Define the query for retrieving workouts
+    query = Workout.query
+    if selected_category:
+        query = query.filter_by(category=selected_category)
+
+    # Get the workouts for the current page
+    pagination = query.paginate(page=page, per_page=WORKOUTS_PER_PAGE, error_out=False)
+    workouts = pagination.items
+
+    # Get the total number of workouts based on the selected category (counted by paginate)
+    total_workouts = pagination.total
+    # Calculate the total number of pages
+    total_pages = (total_workouts + WORKOUTS_PER_PAGE - 1) // WORKOUTS_PER_PAGE
+
+    # Get all distinct workout categories from the database
+    all_categories = db.session.query(Workout.category).distinct().all()
+    categories = [category[0] for category in all_categories]
+
+    # Convert workouts to a list of dictionaries
+    workout_data = [{
+        'name': workout.name,
+        'description': workout.description,
+        'image_path': workout.image_path,
+        'category': workout.category
+    } for workout in workouts]
+
+    # Personal picks come precomputed from the recommendation index (see recommendations.py)
+    recommended = []
+    index = current_app.extensions.get("recommendations")
+    user_id = session.get("user_id")
+    if index is not None and user_id and page == 1:
+        category = selected_category if selected_category and selected_category != 'all' else None
+        recommended = index.recommend(user_id, category=category)
+
+    return render_template(
+        'workouts.html',
+        workout_data=workout_data,
+        recommended=recommended,
+        categories=categories,
+        pagination=page,
+        total_pages=total_pages,
+        total_workouts=total_workouts
+    )
+
+
+def articles():
+    # Get the page number from the URL query parameters, defaulting to 1
+    page = request.args.get('page', 1, type=int)
+
+    # Query the articles from the database, ordered by created_at in descending order, and paginate the results
+    pagination = Article.query.order_by(
+        Article.created_at.desc()).paginate(page=page, per_page=ARTICLES_PER_PAGE, error_out=False
+    )
+    articles = pagination.items
+
+    # Get the total number of articles in the database
+    total_articles = pagination.total
+
+    return render_template(
+        'articles.html',
+        articles=articles,
+        pagination=page,
+        total_articles=total_articles,
+        ARTICLES_PER_PAGE=ARTICLES_PER_PAGE
+    )
+
+
+def show_article(article_id):
+    # Fetch the article by its ID using SQLAlchemy ORM
+    article = Article.query.get(article_id)
+
+    # If the article is not found, flash a message and render the details page with an error
+    if not article:
+        flash("Article not found", "danger")
+        return render_template('article_details.html')
+    
+    # Split the content into paragraphs using '|' as the delimiter
+    paragraphs = article.content.split('|')
+
+    # Format the created_at attribute to a string representing the date
+    created_at = article.created_at.strftime("%Y-%m-%d")
+
+    return render_template(
+        'article_details.html', article=article, 
+        paragraphs=paragraphs, created_at=created_at
+    )
+
+
+@login_required
+def activity():
+    # Get the logged-in user from the session
+    user_id = session.get("user_id")
+
+    # List to store error messages
+    messages = []
+
+    if not user_id:
+        messages.append(("danger", "User not found."))
+
+    if request.method == 'POST':
+        # Validate and convert all activity form inputs
+        values, errors = validate_activity(request.form)
+        messages.extend(error_messages(errors))
+
+        ingestor = current_app.extensions.get("activity_ingestor")
+        if not messages and ingestor is not None:
+            # Write-behind mode: buffer the row and let the background thread insert it in a batch
+            try:
+                session["activity_ticket"] = ingestor.submit(user_id, values)
+            except BufferFull:
+                flash(("danger", "We are receiving a lot of activities right now. Please try again in a moment."))
+                response = current_app.make_response(
+                    (render_template('user_activity.html', messages=messages, **values), 503)
+                )
+                response.headers["Retry-After"] = "5"
+                return response
+
+            flash(("success", "Activity successfully added."))
+            return redirect(url_for('stats'))
+
+        if not messages:
+            try:
+                # Age and gender update the user's profile; the rest is the activity itself
+                activity_values, profile_values = split_profile(values)
+                new_activity = Activity(user_id=user_id, **activity_values)
+                save_profiles({user_id: profile_values})
+
+                # Add the new activity to the session and commit
+                db.session.add(new_activity)
+                db.session.commit()
+
+                messages.append(("success", "Activity successfully added."))
+
+                # Flash the success message
+                flash(messages[-1])
+
+                # Redirect to the /stats route
+                return redirect(url_for('stats'))
+
+            except SQLAlchemyError as e:
+                db.session.rollback()
+                messages.append(("danger", "An error occurred while adding the activity. Please try again."))
+
+        # Flash the error messages
+        for error in messages:
+            flash(error)
+
+        return render_template('user_activity.html', messages=messages, **values)
+    else:
+        # Prefill the slowly changing fields from the user's profile and latest height
+        profile = db.session.get(UserProfile, user_id) if user_id else None
+        if profile is None:
+            return render_template('user_activity.html')
+        height = db.session.query(Activity.height).filter_by(user_id=user_id).order_by(Activity.id.desc()).limit(1).scalar()
+        return render_template('user_activity.html', age=profile.age, gender=profile.gender, height=height)
+
+
+@login_required
+def stats():
+    # Get the logged-in user's ID
+    user_id = session.get("user_id")
+    stats_data = []
+
+    if not user_id:
+        stats_data = None
+        return render_template('stats.html', stats=stats_data)
+
+    # After a buffered /activity submission, wait for the row to be committed so the new entry shows up
+    ticket = session.pop("activity_ticket", None)
+    ingestor = current_app.extensions.get("activity_ingestor")
+    if ticket is not None and ingestor is not None:
+        with timed("activity_read_wait"):
+            ingestor.wait_for_ticket(ticket, current_app.config["ACTIVITY_READ_WAIT"])
+
+    # Time the ORM reads separately from chart rendering
+    with timed("stats_queries"):
+        # Age and gender are a primary-key read of the user's profile
+        profile = db.session.get(UserProfile, user_id)
+
+        # Fetch the user's full history, hot and archived, newest first
+        user_activities_sorted = activity_history(user_id)
+
+        # Oldest first for the charts
+        user_activities = user_activities_sorted[::-1]
+
+        # The latest user activity
+        latest_user_activity = user_activities_sorted[0] if user_activities_sorted else None
+
+    if (
+        not profile or 
+        not latest_user_activity or 
+        not user_activities or 
+        not user_activities_sorted
+    ):
+        stats_data = None
+        return render_template('stats.html', stats=stats_data)
+
+    age = profile.age
+    gender = profile.gender
+    body_fat_percentage = latest_user_activity.body_fat_percentage if latest_user_activity else None
+    muscle_mass = latest_user_activity.muscle_mass if latest_user_activity else None
+    weight_kg = latest_user_activity.weight if latest_user_activity else None
+    height_cm = latest_user_activity.height if latest_user_activity else None
+
+    # Calculate healthy weight range
+    if height_cm is not None:
+        healthy_weight_range_result = calculate_healthy_weight_range(height_cm)
+    else:
+        healthy_weight_range_result = None
+
+    if healthy_weight_range_result:
+        healthy_weight_range_str = "{:.1f}kg - {:.1f}kg".format(*healthy_weight_range_result)
+    else:
+        healthy_weight_range_str = None
+        stats_data = None
+
+    daily_water_intake = calculate_daily_water_intake(latest_user_activity)
+    user_water_intake = latest_user_activity.water_intake if latest_user_activity else None
+    weight_difference = calculate_weight_difference(user_activities_sorted)
+    weight_plot_data, bmi_plot_data = render_charts(user_activities)
+    bmi, bmi_category_result = calculate_bmi_and_category(weight_kg, height_cm)
+
+    if not weight_plot_data or not bmi_plot_data:
+        return render_template('stats.html', stats=None)
+
+    stats_data.append({'index': 0, 'graph_data': weight_plot_data})
+    stats_data.append({'index': 1, 'graph_data': bmi_plot_data})
+
+    # Convert activities to a list of dictionaries
+    activities = []
+    for activity in user_activities_sorted:
+        activity_data = {
+            "activity_type": activity.activity_type.capitalize(),
+            "duration": activity.duration,
+            "intensity": activity.intensity.capitalize(),
+            "resting_heart_rate": activity.resting_heart_rate,
+            "exercise_heart_rate": activity.exercise_heart_rate,
+            "registered_at": activity.registered_at.strftime("%Y-%m-%d %H:%M:%S")
+        }
+        activities.append(activity_data)
+
+    # Peer percentiles and the weekly leaderboard come from in-memory aggregates (see community.py)
+    community = current_app.extensions.get("community_aggregates")
+    if community is not None:
+        peer_comparison = community.compare(profile, latest_user_activity)
+        leaderboard = community.leaderboard()
+    else:
+        peer_comparison = None
+        leaderboard = []
+
+    context = dict(
+        stats=stats_data, 
+        age=age, gender=gender, 
+        body_fat_percentage=body_fat_percentage, 
+        muscle_mass=muscle_mass, weight=weight_kg, 
+        height=height_cm, bmi=bmi, 
+        bmi_category=bmi_category_result, 
+        healthy_weight_range=healthy_weight_range_str, 
+        weight_difference=weight_difference, 
+        daily_water_intake=daily_water_intake, 
+        user_water_intake=user_water_intake, activities=activities,
+        peer_comparison=peer_comparison, leaderboard=leaderboard
+    )
+
+    body = render_template('stats.html', defer_flashes=True, **context).encode()
+
+    # Kept so that, when /stats is shedding load, the user still gets their last page
+    admission = current_app.extensions.get("admission")
+    if admission is not None:
+        admission.stale.put(("stats", user_id), body)
+
+    return fill_flashes(body)
+
+
+def fill_flashes(body):
+    """A stats page rendered with defer_flashes, with the messages flashed for this response."""
+    return body.replace(FLASHES_MARKER, render_template('flashes.html').encode(), 1)
+
+
+def stale_stats():
+    """The user's last stats page, marked as stale; used by admission control when /stats is overloaded."""
+    user_id = session.get("user_id")
+    cached = current_app.extensions["admission"].stale.get(("stats", user_id)) if user_id else None
+    if cached is None:
+        return None
+
+    body, cached_at = cached
+    notice = render_template(
+        'stale_notice.html', stale_since=datetime.fromtimestamp(cached_at).strftime("%Y-%m-%d %H:%M:%S")
+    )
+    response = current_app.make_response(fill_flashes(body.replace(STALE_NOTICE_MARKER, notice.encode(), 1)))
+    response.headers["Warning"] = '110 - "Response is Stale"'
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
+def contact():
+    if request.method == 'POST':
+        name = request.form['name'].capitalize()
+        email = request.form['email']
+        subject = request.form['subject'].capitalize()
+        phone = request.form['phone']
+        message = request.form['message'].capitalize()
+
+        messages = []
+
+        # Assuming these functions validate the inputs and add error messages if needed
+        validate_contact_inputs(name, "Name", messages)
+        validate_email(email, messages)
+        validate_contact_inputs(subject, "Subject", messages)
+        validate_contact_inputs(phone, "Phone", messages)
+        validate_contact_inputs(message, "Message", messages)
+
+        if not messages:
+            try:
+                # Create a new Contact instance
+                new_contact = Contact(
+                    name=name,
+                    email=email,
+                    subject=subject,
+                    phone=phone,
+                    message=message
+                )
+                
+                # Add the new contact to the session and commit to the database
+                db.session.add(new_contact)
+
+                # Queue the staff notification in the same transaction; it is sent in the background
+                recipient = current_app.config["CONTACT_NOTIFICATION_RECIPIENT"]
+                if recipient:
+                    queue_contact_notification(new_contact, recipient)
+                db.session.commit()
+                if recipient:
+                    current_app.extensions["outbox_dispatcher"].notify()
+
+                messages.append(("success", "Thank you for your message!"))
+                flash(messages[-1])
+
+                # Redirect the user to the home page
+                return redirect("/")
+
+            except Exception as e:
+                # Handle any errors that occur during the database transaction
+                db.session.rollback()
+                messages.append(("danger", "There was a problem submitting your message. Please try again!"))
+                flash(messages[-1])
+                return render_template(
+                    'contact.html', messages=messages, name=name, 
+                    email=email, subject=subject, 
+                    phone=phone, message=message
+                )
+
+        else:
+            # Flash the error messages
+            for error in messages:
+                flash(error)
+            return render_template(
+                'contact.html', messages=messages, name=name, 
+                email=email, subject=subject, 
+                phone=phone, message=message
+            )
+
+    return render_template('contact.html')
+
+
+def register_views(app):
+    """Register every page route on the app, keeping the view function names as endpoints."""
+    app.add_url_rule('/', view_func=index)
+    app.add_url_rule('/health/db', view_func=db_health)
+    app.add_url_rule("/login", view_func=login, methods=["GET", "POST"])
+    app.add_url_rule("/logout", view_func=logout)
+    app.add_url_rule("/register", view_func=register, methods=["GET", "POST"])
+    app.add_url_rule("/account", view_func=account)
+    app.add_url_rule('/change_password', view_func=change_password, methods=['GET', 'POST'])
+    app.add_url_rule('/workouts', view_func=workouts)
+    app.add_url_rule('/articles', view_func=articles)
+    app.add_url_rule('/article/<int:article_id>', view_func=show_article)
+    app.add_url_rule('/activity', view_func=activity, methods=['GET', 'POST'])
+    app.add_url_rule('/stats', view_func=stats, methods=['GET'])
+    app.add_url_rule('/contact', view_func=contact, methods=['GET', 'POST'])
+
+    admission = app.extensions.get("admission")
+    if admission is not None:
+        admission.fallbacks["stats"] = stale_stats
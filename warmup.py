@@ -0,0 +1,67 @@
+import io
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from matplotlib import font_manager
+from sqlalchemy import text
+
+from db import db
+
+
+def compile_templates(app):
+    """Load every template in templates/ into the Jinja cache so no request pays for compilation."""
+    names = app.jinja_env.list_templates()
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+def prime_matplotlib():
+    """Load the font cache and draw one throwaway chart so the first /stats request starts warm."""
+    font_manager.findfont(font_manager.FontProperties(family="sans-serif", weight="bold"))
+    plt.figure(figsize=(1, 1))
+    plt.plot([0, 1], [0, 1])
+    plt.title("warmup", fontweight="bold")
+    plt.savefig(io.BytesIO(), format="png")
+    plt.close()
+
+
+def open_db_pool(app):
+    """Open the pool's connections up front (one when the pool does not report a size)."""
+    with app.app_context():
+        engine = db.engine
+        size = engine.pool.size() if hasattr(engine.pool, "size") else 1
+        connections = [engine.connect() for _ in range(size)]
+        try:
+            for connection in connections:
+                connection.execute(text("SELECT 1"))
+        finally:
+            for connection in connections:
+                connection.close()
+    return size
+
+
+def warm_up(app, database=True):
+    """Run every warm-up step and log how long each took."""
+    timings = {}
+
+    start = time.perf_counter()
+    template_count = compile_templates(app)
+    timings["templates"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    prime_matplotlib()
+    timings["matplotlib"] = time.perf_counter() - start
+
+    if database:
+        start = time.perf_counter()
+        open_db_pool(app)
+        timings["database"] = time.perf_counter() - start
+
+    app.logger.info(
+        "Warm-up finished: %d templates compiled; %s",
+        template_count, ", ".join(f"{step} {seconds * 1000:.0f} ms" for step, seconds in timings.items())
+    )
+    return timings
@@ -0,0 +1,17 @@
+"""
+Production WSGI entry point.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The app is created and warmed up once at import, so with preload_app the templates and
+matplotlib caches are built in the master process and shared by every forked worker.
+"""
+import os
+
+from app import create_app
+from warmup import warm_up
+
+app = create_app()
+
+# Forked workers must not inherit database connections, so gunicorn opens the pool in post_fork
+warm_up(app, database=os.getenv("WARMUP_DATABASE", "true").lower() in ("1", "true", "yes", "on"))